@@ -1,15 +1,14 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
 
 from chat.bot import Chatbot
 from chat.database_client.database_client import DatabaseClient
-from chat.database_client.vector_database import VectorDatabase
-from chat.database_client.graph_database import GraphDatabase
 
 from mongodb.DocumentStore import DocumentStore
 from mongodb.ChatStore import ChatStore
 from project.ProjectManager import ProjectManager
 from upload.DocumentUploader import DocumentUploader
+from upload.TranscriptCache import TranscriptCache
 from editor.DocumentRetriever import DocumentRetriever
 from editor.DocumentEditor import DocumentEditor
 from editor.DocumentRemover import DocumentRemover
@@ -17,6 +16,14 @@ from editor.DocumentRemover import DocumentRemover
 from chat_history.ChatRemover import ChatRemover
 from chat_history.ChatRetriever import ChatRetriever
 
+from outbox.GraphOutbox import GraphOutbox
+from outbox.OutboxApplier import OutboxApplier
+from outbox.OutboxDatabaseClient import OutboxDatabaseClient
+
+from startup.ComponentRegistry import ComponentRegistry
+
+from config.config import SERVER_HOST, SERVER_PORT, FLASK_DEBUG, STARTUP_WARM_UP, OUTBOX_ENABLED
+
 
 def initialise_collection() -> tuple[DocumentStore.Collection, DocumentStore.Database]:
     ds: DocumentStore = DocumentStore()
@@ -26,9 +33,17 @@ def initialise_collection() -> tuple[DocumentStore.Collection, DocumentStore.Dat
 
 
 def initialise_database() -> DatabaseClient:
+    # Imported here as it loads spaCy, torch and sentence-transformers
+    from chat.database_client.vector_database import VectorDatabase
     return VectorDatabase()
 
 
+def initialise_transcriber(transcript_cache: TranscriptCache = None):
+    # Imported here as it loads whisper
+    from upload.AudioTranscriber import AudioTranscriber
+    return AudioTranscriber(transcript_cache)
+
+
 def initialise_chat_history():
     ds: ChatStore = ChatStore()
     db: ChatStore.Database = ds.create_database("Chat_History")
@@ -36,16 +51,35 @@ def initialise_chat_history():
     return collection, db
 
 
-def register_upload_routes(app: Flask) -> None:
-    _, mongo_database = initialise_collection()
-    chat_collection, chat_mongodb = initialise_chat_history()
-    db = initialise_database()
+def register_components() -> ComponentRegistry:
+    """
+    Registers the application's components, in the order they are warmed up.
+    Cheap database connections are loaded first, followed by the models.
+    """
+    components = ComponentRegistry()
+    components.register("document_database", lambda: initialise_collection()[1])
+    components.register("graph_outbox", lambda: GraphOutbox(components.get("document_database")))
+    components.register("chat_collection", lambda: initialise_chat_history()[0])
+    components.register("vector_database", initialise_database)
+    components.register("transcript_cache", TranscriptCache)
+    components.register("audio_transcriber", lambda: initialise_transcriber(components.get("transcript_cache")))
+    return components
+
+
+def register_upload_routes(app: Flask, components: ComponentRegistry, use_outbox: bool = OUTBOX_ENABLED) -> None:
+    mongo_database = components.lazy("document_database")
+    chat_collection = components.lazy("chat_collection")
+    db = components.lazy("vector_database")
+    audio_transcriber = components.lazy("audio_transcriber")
+
+    # Uploads, edits and removals write to the graph database through the outbox, so they only wait on MongoDB
+    graph_writer = OutboxDatabaseClient(components.lazy("graph_outbox"), db) if use_outbox else db
 
     chat_bot = Chatbot(db, chat_collection)
-    document_uploader = DocumentUploader(mongo_database, db)
+    document_uploader = DocumentUploader(mongo_database, graph_writer, audio_transcriber)
     document_retriever = DocumentRetriever(mongo_database)
-    document_editor = DocumentEditor(mongo_database, db)
-    document_remover = DocumentRemover(mongo_database, db)
+    document_editor = DocumentEditor(mongo_database, graph_writer)
+    document_remover = DocumentRemover(mongo_database, graph_writer)
     project_manager = ProjectManager(mongo_database)
 
     chat_retriever = ChatRetriever(chat_collection)
@@ -61,16 +95,70 @@ def register_upload_routes(app: Flask) -> None:
     chat_remover.register_routes(app)
 
 
-def start_app() -> None:
+def create_app(warm_up: bool = STARTUP_WARM_UP, use_outbox: bool = OUTBOX_ENABLED) -> Flask:
+    """
+    Creates the Flask application with all routes registered.
+
+    Used directly by WSGI servers (see wsgi.py and gunicorn.conf.py) and by start_app for local development.
+    Components are built lazily, on first use or by a background warm-up thread, so the app starts serving
+    immediately; /ready reports when every component has loaded. When the outbox is used, graph database writes are
+    applied by a background applier, and /outbox/status reports how far behind it is.
+    """
     app = Flask(__name__)
     CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}})
 
+    components = register_components()
+    app.extensions["components"] = components
+
     @app.route('/health', methods=['GET'])
     def health():
         return "OK", 200
 
-    register_upload_routes(app)
-    app.run(host="0.0.0.0", port=5001, debug=True)
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        """
+        Reports the state and load duration of each component.
+
+        :return: 200 when every component has loaded, otherwise 503
+        """
+        is_ready = components.is_ready()
+        return jsonify({"ready": is_ready, "components": components.get_status()}), 200 if is_ready else 503
+
+    @app.route('/metrics/neo4j', methods=['GET'])
+    def neo4j_metrics():
+        """
+        Reports the number of calls and failures, and the timings, of each Neo4j query run by this process.
+        """
+        # Imported here as the neo4j driver is otherwise only loaded with the database components
+        from chat.database_client.neo4j_data_access import Neo4jDataAccess
+        return jsonify(Neo4jDataAccess.shared().get_metrics()), 200
+
+    @app.route('/transcripts/cache', methods=['GET'])
+    def transcript_cache_report():
+        """
+        Reports the transcripts stored in the transcript cache, and the transcription time saved by its hits.
+        """
+        return jsonify(components.get("transcript_cache").get_report()), 200
+
+    register_upload_routes(app, components, use_outbox)
+
+    if use_outbox:
+        outbox_applier = OutboxApplier(components.lazy("graph_outbox"), components.lazy("vector_database"))
+        outbox_applier.register_routes(app)
+        app.extensions["outbox_applier"] = outbox_applier
+        outbox_applier.start()
+
+    if warm_up:
+        components.start_warm_up()
+    return app
+
+
+def start_app() -> None:
+    """
+    Runs the application on the Werkzeug development server. Use Gunicorn for production serving.
+    """
+    app = create_app()
+    app.run(host=SERVER_HOST, port=SERVER_PORT, debug=FLASK_DEBUG, threaded=True)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from chat.triple_extractor_components.classsifier import Classifier
+from chat.triple_extractor_components.grouping_engine import GroupingEngine
 
 
 class BasicTripleExtractor:
@@ -23,22 +23,49 @@ class BasicTripleExtractor:
         get_information = self._get_question_response_pair(text)
         triples_list = []
 
-        for question in get_information.keys():
-            response = get_information.get(question)
+        questions = list(get_information.keys())
+        responses = [get_information.get(question) for question in questions]
+        response_subjects = self._get_subjects_batch(responses, interviewer_id)
+
+        for question, response, subjects in zip(questions, responses, response_subjects):
             triples_list.append((interviewee_id, "answered", question))
             triples_list.append((question, "hasResponse", response))
             triples_list.append((response, "answeredBy", interviewee_id))
 
-            for subject in self._get_subjects(response):
+            for subject in subjects:
                 triples_list.append((response, "mentions", subject))
         
         return triples_list
 
-    def _get_subjects(self, response):
+    def _get_subjects(self, response, interviewer_id="Interviewer"):
+        """
+        Draws the subjects mentioned in a single response.
+
+        :param response: the response text
+        :param interviewer_id: the name substituted for second-person pronouns
+        :return: the distinct subjects in the order they are first mentioned
+        """
+        return self._get_subjects_batch([response], interviewer_id)[0]
+
+    def _get_subjects_batch(self, responses, interviewer_id="Interviewer"):
         """
-        Yet to be implemented, will be used to draw themes and subjects from responses.
+        Draws the subjects mentioned in each of the responses of a transcript.
+
+        All non-empty responses are tagged together in a single tagging pass, rather than invoking the tagger once
+        per response.
+
+        :param responses: the response texts
+        :param interviewer_id: the name substituted for second-person pronouns
+        :return: the distinct subjects of each response, in the same order as the provided responses
         """
-        return []
+        engine = GroupingEngine(interviewer_id)
+        to_tag = [index for index, response in enumerate(responses) if response and response.strip()]
+        tagged_subjects = engine.get_subjects_batch([responses[index] for index in to_tag])
+
+        subjects = [[] for _ in responses]
+        for index, response_subjects in zip(to_tag, tagged_subjects):
+            subjects[index] = list(dict.fromkeys(response_subjects))
+        return subjects
 
     def _get_question_response_pair(self, text):
         """
@@ -2,14 +2,12 @@ import traceback
 
 from chat.database_client.database_client import DatabaseClient
 from mongodb.ChatStore import ChatStore
-from chat.text_transformer.text_vectoriser import TextVectoriser
 import time
 
 from flask import Flask
 
 from flask import request, jsonify
 
-from chat.llm_client.gemini_client import GeminiClient
 from chat.llm_client.deepseek_client import DeepSeekClient
 import logging
 
@@ -79,7 +77,8 @@ class Chatbot:
         def chat():
             """
             API endpoint for handling chat messages.
-            Expects a JSON payload with a 'message' key.
+            Expects a JSON payload with a 'message' key, and optionally the 'project' and user 'session' the chat
+            belongs to, which scope the chat history.
 
             :return: A JSON response containing either the model's reply or an error message.
             """
@@ -95,7 +94,9 @@ class Chatbot:
                 messageTime = data.get('key')
                 content = {
                     "question" : message,
-                    "response" : response
+                    "response" : response,
+                    "project" : data.get('project'),
+                    "session" : data.get('session')
                 }
 
                 self.collection.add_document(messageTime, content)
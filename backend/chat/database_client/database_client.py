@@ -1,4 +1,18 @@
 from abc import ABC, abstractmethod 
+from dataclasses import dataclass
+
+
+@dataclass
+class RemovalReport:
+    """
+    The number of nodes and relationships deleted when removing the entries of one or more files.
+    """
+    nodes_deleted: int = 0
+    relationships_deleted: int = 0
+
+    def __add__(self, other: "RemovalReport") -> "RemovalReport":
+        return RemovalReport(self.nodes_deleted + other.nodes_deleted,
+                             self.relationships_deleted + other.relationships_deleted)
 
 
 class DatabaseClient(ABC):
@@ -8,6 +22,12 @@ class DatabaseClient(ABC):
     
     :author: Felix Chung
     """
+
+    # The maximum number of files removed or rekeyed per transaction by the bulk operations
+    BATCH_SIZE = 1000
+    # The number of matched rows deleted per inner transaction by the batched deletes
+    DELETE_BATCH_SIZE = 10000
+
     @abstractmethod
     def store_entries(self, entries: list, file_id):
         """
@@ -30,11 +50,12 @@ class DatabaseClient(ABC):
         pass 
     
     @abstractmethod
-    def remove_node_by_file_id(self, file_id):
+    def remove_node_by_file_id(self, file_id) -> RemovalReport:
         """
             Searches the NEO4J database for any nodes matching the provided file_id, and removes them.
 
                 :param str file_id: the file_id to be matched and removed
+                :return RemovalReport: the number of nodes and relationships removed
         """
         pass
     
@@ -46,4 +67,38 @@ class DatabaseClient(ABC):
         :param file_id: the id of the file to be rekeyed
         :param new_id: the new id of the file
         """
-        pass
\ No newline at end of file
+        pass
+
+    def replace_entries(self, entries, file_id) -> None:
+        """
+        Replaces the entries stored for a file. Implementations which can replace them in a single write should
+        override this; by default the file's nodes are removed, then the entries stored.
+
+        :param entries: the new content of the file
+        :param file_id: the id of the file
+        """
+        self.remove_node_by_file_id(file_id)
+        self.store_entries(entries, file_id)
+
+    def remove_nodes_by_file_ids(self, file_ids: list[str]) -> RemovalReport:
+        """
+        Removes the nodes of many files. Implementations should override this to remove them in bulk; by default
+        the files are removed one at a time.
+
+        :param file_ids: the file ids to be matched and removed
+        :return: the number of nodes and relationships removed
+        """
+        report = RemovalReport()
+        for file_id in file_ids:
+            report += self.remove_node_by_file_id(file_id) or RemovalReport()
+        return report
+
+    def rekey_nodes(self, rekeys: list[tuple[str, str]]) -> None:
+        """
+        Rekeys the nodes of many files. Implementations should override this to rekey them in bulk; by default the
+        files are rekeyed one at a time.
+
+        :param rekeys: the (file id, new id) pairs of the files to be rekeyed
+        """
+        for file_id, new_id in rekeys:
+            self.rekey_node(file_id, new_id)
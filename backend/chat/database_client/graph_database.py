@@ -1,11 +1,14 @@
-from chat.database_client.database_client import DatabaseClient
+from chat.database_client.database_client import DatabaseClient, RemovalReport
+from chat.database_client.neo4j_data_access import Neo4jDataAccess
+from chat.database_client.neo4j_schema import (
+    create_relationship_file_id_index, create_vector_index, get_relationship_types, quote_name, rekey_batches,
+    rekey_relationships, slugify_reltype
+)
 from chat.llm_client.deepseek_client import DeepSeekClient
 
-from neo4j import GraphDatabase as Neo4jGraphDatabase
 from chat.basic_triple_extractor import BasicTripleExtractor
 import random
 from torch import Tensor
-import re
 
 class GraphDatabase(DatabaseClient):
     """
@@ -15,13 +18,14 @@ class GraphDatabase(DatabaseClient):
     """
     def __init__(self):
         """
-            Initialises NEO4JInteractor with driver to be used
+            Initialises NEO4JInteractor with the shared data access, see Neo4jDataAccess for its configuration
         """
-        #self._driver = Neo4jGraphDatabase.driver("neo4j://localhost:7687", auth=("neo4j", "password"))
-        # using one below for testing, top one isn't working for me - Rohan
-        self._driver = Neo4jGraphDatabase.driver("bolt://neo4j:7687", auth=("neo4j", "password"))
+        self._data_access = Neo4jDataAccess.shared()
 
-        self.__create_vector_index()
+        create_vector_index(self._data_access, 384)
+        self.__indexed_rel_types = set()
+        for rel_type in get_relationship_types(self._data_access):
+            self.__create_file_id_index(rel_type)
         self.__deepseek_client = DeepSeekClient()
         self.__triple_extractor = BasicTripleExtractor()
     
@@ -29,7 +33,7 @@ class GraphDatabase(DatabaseClient):
         """
             Closes the connection to the Neo4j database.
         """
-        self._driver.close()
+        self._data_access.close()
         
     def store_entries(self, text, file_id: str = None):
         """
@@ -41,22 +45,18 @@ class GraphDatabase(DatabaseClient):
         interviewee_id = "id" + str(random.randrange(0,1000))
         triples = self.__triple_extractor.get_triples(text, "John Smith", interviewee_id)
         #triples = self.__deepseek_client.chat_extract_triples(text)
-        
+
+        # Triples are grouped by relationship type, as a type cannot be a query parameter
+        triples_by_type: dict[str, list[dict]] = {}
         for subj, pred, obj in triples:
-            self.store_triple(subj, pred, obj, file_id)
+            rel_type = slugify_reltype(pred)
+            if rel_type not in self.__indexed_rel_types:
+                self.__create_file_id_index(rel_type)
+            triples_by_type.setdefault(rel_type, []).append({"subject": subj, "object": obj})
 
-    @staticmethod
-    def slugify_reltype(rel_type: str) -> str:
-        """
-            Converts a relationship string into a Neo4j-safe relationship type.
+        if triples_by_type:
+            self._data_access.write_transaction("graph.store_entries", self._merge_triples, triples_by_type, file_id)
 
-            :param rel_type: Relationship string
-            :return: Uppercase, underscore-separated string
-        """
-        rel_type = rel_type.strip().lower()
-        rel_type = re.sub(r'[^a-z0-9]+', '_', rel_type)
-        return rel_type.upper()
-    
     def store_triple(self, subject: str, predicate: str, object_: str, file_id: str = None):
         """
             Stores a single triple in Neo4j as nodes and a relationship.
@@ -66,9 +66,10 @@ class GraphDatabase(DatabaseClient):
             :param object_: Object node
             :param file_id: Optional document ID for metadata
         """
-        rel_type = self.slugify_reltype(predicate)
-        with self._driver.session() as session:
-            session.execute_write(self._merge_triple, subject, object_, rel_type, file_id)
+        rel_type = slugify_reltype(predicate)
+        if rel_type not in self.__indexed_rel_types:
+            self.__create_file_id_index(rel_type)
+        self._data_access.write_transaction("graph.store_triple", self._merge_triple, subject, object_, rel_type, file_id)
    
     @staticmethod
     def _merge_triple(tx, subject, object_, rel_type, file_id):
@@ -91,42 +92,85 @@ class GraphDatabase(DatabaseClient):
             query += " SET r.file_id = $file_id"
 
         tx.run(query, subject=subject, object=object_, file_id=file_id)
-            
-    def __create_vector_index(self, vector_dimension: int = 384):
-        """
-        Creates a vector index on the 'vector' property of Embedding nodes.
-
-        :param vector_dimension: Dimensionality of the stored vectors.
-        """
-        client = self._driver
-        with client.session() as session:
-            session.run("""
-            CREATE VECTOR INDEX embedding_vector_index IF NOT EXISTS
-            FOR (e:Embedding) ON (e.vector)
-            OPTIONS { 
-                indexConfig: {
-                    `vector.dimensions`: $dims,
-                    `vector.similarity_function`: 'cosine'
-                }
-            }
-            """, dims=vector_dimension)
-        
-    def remove_node_by_file_id(self, file_id: str) -> None:
+
+    @classmethod
+    def _merge_triples(cls, tx, triples_by_type: dict[str, list[dict]], file_id):
         """
-            Searches the Neo4j database for any nodes matching the provided file_id, and removes them.
+            Internal Cypher queries to merge the nodes and create the relationships of many triples, one query per
+            relationship type.
 
-                :param str file_id: the file_id to be matched and removed
+            :param tx: Transaction object
+            :param triples_by_type: the subject and object of each triple, by relationship type
+            :param file_id: Optional document ID
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.file_id = $file_id
-                DELETE n
-                """,
-                file_id=file_id
-            )
+        for rel_type, triples in triples_by_type.items():
+            query = f"""
+            UNWIND $triples AS triple
+            MERGE (s:Entity {{name: triple.subject}})
+            MERGE (o:Entity {{name: triple.object}})
+            MERGE (s)-[r:{quote_name(rel_type)}]->(o)
+            """
+            if file_id:
+                query += " SET r.file_id = $file_id"
+
+            tx.run(query, triples=triples, file_id=file_id)
+
+    def __create_file_id_index(self, rel_type: str):
+        """
+        Creates a range index on the 'file_id' property of relationships of the provided type. Relationship indexes
+        are scoped to a single type, so one is created for each type as it is first stored.
+
+        :param rel_type: the relationship type to be indexed
+        """
+        create_relationship_file_id_index(self._data_access, rel_type)
+        self.__indexed_rel_types.add(rel_type)
+
+    def remove_node_by_file_id(self, file_id: str) -> RemovalReport:
+        """
+            Searches the Neo4j database for any relationships matching the provided file_id, and removes them along
+            with any entities left without relationships.
+
+                :param str file_id: the file_id to be matched and removed
+                :return RemovalReport: the number of nodes and relationships removed
+        """
+        return self.remove_nodes_by_file_ids([file_id])
+
+    def remove_nodes_by_file_ids(self, file_ids: list[str]) -> RemovalReport:
+        """
+            Removes the relationships of many files, and any entities left without relationships. Entities are
+            shared between files, so only the relationships carry a file_id. Each relationship type is matched
+            through its file_id index, and the deletes run in inner transactions of DELETE_BATCH_SIZE rows, so memory
+            use stays bounded however large the files are.
+
+                :param list[str] file_ids: the file_ids to be matched and removed
+                :return RemovalReport: the number of nodes and relationships removed
+        """
+        report = RemovalReport()
+        if not file_ids:
+            return report
+
+        # CALL { } IN TRANSACTIONS commits its own transactions, so it has to be run as an auto-commit query
+        for rel_type in get_relationship_types(self._data_access):
+            for start in range(0, len(file_ids), self.BATCH_SIZE):
+                counters = self._data_access.run(
+                    "graph.remove_nodes_by_file_ids",
+                    f"""
+                    MATCH (s)-[r:{quote_name(rel_type)}]->(o)
+                    WHERE r.file_id IN $file_ids
+                    CALL {{
+                        WITH r, s, o
+                        DELETE r
+                        WITH s, o
+                        UNWIND [s, o] AS n
+                        WITH DISTINCT n
+                        WHERE NOT EXISTS {{ (n)--() }}
+                        DELETE n
+                    }} IN TRANSACTIONS OF {int(self.DELETE_BATCH_SIZE)} ROWS
+                    """,
+                    {"file_ids": file_ids[start:start + self.BATCH_SIZE]}
+                ).counters
+                report += RemovalReport(counters.nodes_deleted, counters.relationships_deleted)
+        return report
 
     def remove_node_by_text(self, text_chunk: str) -> None:
         """
@@ -134,23 +178,21 @@ class GraphDatabase(DatabaseClient):
 
                 :param str text_chunk: the text chunk of the nodes to be matched and removed
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.text_chunk = $text_chunk
-                DELETE n
-                """,
-                text_chunk=text_chunk
-            )
+        self._data_access.write(
+            "graph.remove_node_by_text",
+            """
+            MATCH (n)
+            WHERE n.text_chunk = $text_chunk
+            DELETE n
+            """,
+            {"text_chunk": text_chunk}
+        )
     
     def clear_database(self):
         """
             Clears the entire Neo4j database by deleting all nodes and relationships.
         """
-        with self._driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
+        self._data_access.write("graph.clear_database", "MATCH (n) DETACH DELETE n")
 
     def search(self, entity): 
         # todo : find entity to search
@@ -162,7 +204,7 @@ class GraphDatabase(DatabaseClient):
         """
         subject_params = {"subject": entity}
 
-        subject_results = self.run_cypher_query(subject_query, subject_params)
+        subject_results = self._data_access.read("graph.search", subject_query, subject_params)
         return subject_results
             
     def run_cypher_query(self, query: str, params: dict = None):
@@ -173,25 +215,24 @@ class GraphDatabase(DatabaseClient):
         :param params: Optional dictionary of parameters to pass to the query.
         :return: List of dictionaries representing each record returned.
         """
-        with self._driver.session() as session:
-            result = session.run(query, params or {})
-            return [record.data() for record in result]
+        return self._data_access.run("graph.run_cypher_query", query, params).records
         
     def rekey_node(self, file_id: str, new_id: str) -> None:
         """
-        Searches the database for any nodes matching the provided file id, and rekeys with the provided id.
+        Searches the database for any relationships matching the provided file id, and rekeys with the provided id.
 
         :param file_id: the id of the file to be rekeyed
         :param new_id: the new id of the file
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.file_id = $file_id
-                SET n.file_id = $new_id
-                """,
-                file_id=file_id,
-                new_id=new_id
-            )
\ No newline at end of file
+        self.rekey_nodes([(file_id, new_id)])
+
+    def rekey_nodes(self, rekeys: list[tuple[str, str]]) -> None:
+        """
+        Rekeys the relationships of many files, in one transaction per batch of BATCH_SIZE files. Each relationship
+        type is matched through its file_id index rather than by scanning every node.
+
+        :param rekeys: the (file id, new id) pairs of the files to be rekeyed
+        """
+        rel_types = get_relationship_types(self._data_access)
+        for batch in rekey_batches(rekeys, self.BATCH_SIZE):
+            self._data_access.write_transaction("graph.rekey_nodes", rekey_relationships, rel_types, batch)
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+from neo4j import Driver, GraphDatabase, READ_ACCESS, SummaryCounters, WRITE_ACCESS
+
+from config import config
+
+# Used when NEO4J_URL, NEO4J_USERNAME and NEO4J_PASSWORD are not configured, matching docker-compose
+DEFAULT_URL = "bolt://neo4j:7687"
+DEFAULT_USERNAME = "neo4j"
+DEFAULT_PASSWORD = "password"
+
+
+@dataclass
+class QueryStats:
+    """
+    The timings of every run of a named query.
+    """
+    calls: int = 0
+    failures: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+@dataclass
+class QueryResult:
+    """
+    The records and update counters of an auto-commit query.
+    """
+    records: list[dict[str, Any]]
+    counters: SummaryCounters
+
+
+class Neo4jDataAccess:
+    """
+    Runs queries against Neo4j through a single, process-wide driver for each URI, and records their timings.
+
+    The driver keeps a pool of connections shared by every client in the process; sessions are cheap to open and are
+    not thread-safe, so one is opened for each unit of work and its connection returned to the pool when it closes.
+    Reads and writes are run as managed transactions, which the driver retries on transient errors such as a leader
+    election. When the URI uses the neo4j:// scheme and points at a cluster, reads are routed to the read replicas and
+    writes to the leader.
+
+    Schema changes, and queries using CALL { } IN TRANSACTIONS, cannot run in a managed transaction; #run runs them as
+    auto-commit queries.
+    """
+
+    __instances: dict[str, Neo4jDataAccess] = {}
+    __instances_lock = threading.Lock()
+
+    def __init__(
+        self, uri: str, auth: tuple[str, str], database: Optional[str] = None,
+        max_pool_size: int = config.NEO4J_MAX_POOL_SIZE,
+        acquisition_timeout: float = config.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        fetch_size: int = config.NEO4J_FETCH_SIZE,
+        max_retry_time: float = config.NEO4J_MAX_TRANSACTION_RETRY_TIME,
+        slow_query_seconds: float = config.NEO4J_SLOW_QUERY_SECONDS
+    ) -> None:
+        """
+        :param uri: the Neo4j connection URI, bolt:// for a single server or neo4j:// for a cluster
+        :param auth: the username and password
+        :param database: the database queries are run against; defaults to the server's default database
+        :param max_pool_size: the maximum number of connections kept in the pool
+        :param acquisition_timeout: the number of seconds to wait for a connection from the pool
+        :param fetch_size: the number of records fetched from the server at a time
+        :param max_retry_time: the number of seconds a managed transaction is retried for on transient errors
+        :param slow_query_seconds: queries slower than this are logged
+        """
+        self.__uri = uri
+        self.__auth = auth
+        self.__database = database
+        self.__max_pool_size = max_pool_size
+        self.__acquisition_timeout = acquisition_timeout
+        self.__fetch_size = fetch_size
+        self.__max_retry_time = max_retry_time
+        self.__slow_query_seconds = slow_query_seconds
+
+        self.__driver: Optional[Driver] = None
+        self.__driver_lock = threading.Lock()
+        self.__stats: dict[str, QueryStats] = {}
+        self.__stats_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, uri: Optional[str] = None) -> Neo4jDataAccess:
+        """
+        Retrieves the shared data access for the provided URI, creating it on first use.
+
+        :param uri: the Neo4j connection URI; defaults to the configured NEO4J_URL
+        :return: the shared data access
+        """
+        if uri is None:
+            uri = config.NEO4J_URL or DEFAULT_URL
+
+        data_access = cls.__instances.get(uri)
+        if data_access is not None:
+            return data_access
+
+        with cls.__instances_lock:
+            data_access = cls.__instances.get(uri)
+            if data_access is None:
+                auth = (config.NEO4J_USERNAME or DEFAULT_USERNAME, config.NEO4J_PASSWORD or DEFAULT_PASSWORD)
+                data_access = Neo4jDataAccess(uri, auth, config.NEO4J_DATABASE)
+                cls.__instances[uri] = data_access
+            return data_access
+
+    @property
+    def driver(self) -> Driver:
+        """
+        The driver, which is created on first use, and again if it has been closed.
+        """
+        driver = self.__driver
+        if driver is not None:
+            return driver
+
+        with self.__driver_lock:
+            if self.__driver is None:
+                self.__driver = GraphDatabase.driver(
+                    self.__uri,
+                    auth=self.__auth,
+                    max_connection_pool_size=self.__max_pool_size,
+                    connection_acquisition_timeout=self.__acquisition_timeout,
+                    fetch_size=self.__fetch_size,
+                    max_transaction_retry_time=self.__max_retry_time,
+                )
+            return self.__driver
+
+    def close(self) -> None:
+        """
+        Closes the driver and its connections. A new driver is created if the data access is used again.
+        """
+        with self.__driver_lock:
+            if self.__driver is not None:
+                self.__driver.close()
+                self.__driver = None
+
+    @contextmanager
+    def __timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.__stats_lock:
+                stats = self.__stats.setdefault(name, QueryStats())
+                stats.calls += 1
+                stats.failures += failed
+                stats.total_seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+            if elapsed >= self.__slow_query_seconds:
+                logging.warning("Neo4j query %s took %.3fs", name, elapsed)
+
+    def read(self, name: str, query: str, parameters: Optional[dict[str, Any]] = None) -> list[dict[str, Any]]:
+        """
+        Runs a read query in a managed transaction, routed to a read replica when connected to a cluster.
+
+        :param name: the name the query's timings are recorded under
+        :param query: the Cypher query
+        :param parameters: the query parameters
+        :return: the records returned by the query
+        """
+        return self.read_transaction(name, lambda tx: tx.run(query, parameters or {}).data())
+
+    def write(self, name: str, query: str, parameters: Optional[dict[str, Any]] = None) -> SummaryCounters:
+        """
+        Runs a write query in a managed transaction.
+
+        :param name: the name the query's timings are recorded under
+        :param query: the Cypher query
+        :param parameters: the query parameters
+        :return: the counts of the updates made by the query
+        """
+        return self.write_transaction(name, lambda tx: tx.run(query, parameters or {}).consume().counters)
+
+    def read_transaction(self, name: str, work: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs a unit of work in a managed read transaction. The work may be retried, so it must consume its results
+        within the transaction and have no other side effects.
+
+        :param name: the name the transaction's timings are recorded under
+        :param work: a callable taking the transaction, followed by the provided arguments
+        :return: the value returned by the work
+        """
+        with self.__timed(name), self.__session(READ_ACCESS) as session:
+            return session.execute_read(work, *args, **kwargs)
+
+    def write_transaction(self, name: str, work: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs a unit of work in a managed write transaction. The work may be retried, so it must consume its results
+        within the transaction and have no other side effects.
+
+        :param name: the name the transaction's timings are recorded under
+        :param work: a callable taking the transaction, followed by the provided arguments
+        :return: the value returned by the work
+        """
+        with self.__timed(name), self.__session(WRITE_ACCESS) as session:
+            return session.execute_write(work, *args, **kwargs)
+
+    def run(self, name: str, query: str, parameters: Optional[dict[str, Any]] = None) -> QueryResult:
+        """
+        Runs a query as an auto-commit query, on the leader. Auto-commit queries are not retried.
+
+        :param name: the name the query's timings are recorded under
+        :param query: the Cypher query
+        :param parameters: the query parameters
+        :return: the records returned by the query, and the counts of the updates it made
+        """
+        with self.__timed(name), self.__session(WRITE_ACCESS) as session:
+            result = session.run(query, parameters or {})
+            records = result.data()
+            return QueryResult(records, result.consume().counters)
+
+    def __session(self, access_mode: str):
+        return self.driver.session(database=self.__database, default_access_mode=access_mode)
+
+    def get_metrics(self) -> dict[str, dict[str, Any]]:
+        """
+        :return: the number of calls and failures, and the mean, maximum and total duration in seconds, of each
+            named query
+        """
+        with self.__stats_lock:
+            return {
+                name: {
+                    "calls": stats.calls,
+                    "failures": stats.failures,
+                    "mean_seconds": stats.total_seconds / stats.calls,
+                    "max_seconds": stats.max_seconds,
+                    "total_seconds": stats.total_seconds
+                }
+                for name, stats in sorted(self.__stats.items())
+            }
+
+    def reset_metrics(self) -> None:
+        with self.__stats_lock:
+            self.__stats.clear()
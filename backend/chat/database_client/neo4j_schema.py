@@ -0,0 +1,146 @@
+"""
+The Cypher shared by the clients of the graph, i.e. GraphDatabase, VectorDatabase and Neo4JInteractor: quoting names,
+creating the indexes they rely on, and rekeying the file ids of embeddings and relationships.
+"""
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from chat.database_client.neo4j_data_access import Neo4jDataAccess
+
+
+def quote_name(name: str) -> str:
+    """
+    Quotes a label, relationship type or index name for use in a Cypher query.
+
+    :param name: the name to be quoted
+    :return: the name surrounded in backticks, with any backticks within it escaped
+    """
+    return "`" + name.replace("`", "``") + "`"
+
+
+def slugify_reltype(rel_type: str) -> str:
+    """
+    Converts a relationship string into a Neo4j-safe relationship type.
+
+    :param rel_type: Relationship string
+    :return: Uppercase, underscore-separated string
+    """
+    rel_type = rel_type.strip().lower()
+    rel_type = re.sub(r'[^a-z0-9]+', '_', rel_type)
+    return rel_type.upper()
+
+
+def get_relationship_types(data_access: Neo4jDataAccess) -> list[str]:
+    """
+    :return: every relationship type in the database
+    """
+    records = data_access.read(
+        "schema.relationship_types",
+        "CALL db.relationshipTypes() YIELD relationshipType RETURN relationshipType"
+    )
+    return [record["relationshipType"] for record in records]
+
+
+def create_vector_index(data_access: Neo4jDataAccess, vector_dimension: int) -> None:
+    """
+    Creates a vector index on the 'vector' property of Embedding nodes.
+
+    :param vector_dimension: Dimensionality of the stored vectors.
+    """
+    data_access.run("schema.create_vector_index", """
+        CREATE VECTOR INDEX embedding_vector_index IF NOT EXISTS
+        FOR (e:Embedding) ON (e.vector)
+        OPTIONS {
+            indexConfig: {
+                `vector.dimensions`: $dims,
+                `vector.similarity_function`: 'cosine'
+            }
+        }
+        """, {"dims": vector_dimension})
+
+
+def create_embedding_file_id_index(data_access: Neo4jDataAccess) -> None:
+    """
+    Creates a range index on the 'file_id' property of Embedding nodes, used when removing or rekeying a file.
+    """
+    data_access.run("schema.create_embedding_file_id_index", """
+        CREATE INDEX embedding_file_id_index IF NOT EXISTS
+        FOR (e:Embedding) ON (e.file_id)
+        """)
+
+
+def relationship_file_id_index_name(rel_type: str) -> str:
+    """
+    :return: the name of the file_id index of relationships of the provided type
+    """
+    return "rel_" + re.sub(r'[^a-z0-9]+', '_', rel_type.lower()) + "_file_id_index"
+
+
+def create_relationship_file_id_index(data_access: Neo4jDataAccess, rel_type: str) -> None:
+    """
+    Creates a range index on the 'file_id' property of relationships of the provided type. Relationship indexes are
+    scoped to a single type, so one is created for each type as it is first stored.
+
+    :param rel_type: the relationship type to be indexed
+    """
+    data_access.run("schema.create_relationship_file_id_index", f"""
+        CREATE INDEX {quote_name(relationship_file_id_index_name(rel_type))} IF NOT EXISTS
+        FOR ()-[r:{quote_name(rel_type)}]-() ON (r.file_id)
+        """)
+
+
+def rekey_batches(rekeys: list[tuple[str, str]], batch_size: int) -> list[list[dict[str, str]]]:
+    """
+    Splits (file id, new id) pairs into batches of batch_size, in the form taken by the rekey queries below.
+    """
+    return [
+        [{"old": file_id, "new": new_id} for file_id, new_id in rekeys[start:start + batch_size]]
+        for start in range(0, len(rekeys), batch_size)
+    ]
+
+
+def rekey_embeddings(tx: Any, rekeys: list[dict[str, str]]) -> None:
+    """
+    Rekeys the embeddings of a batch of files. Every embedding is matched before any is rekeyed, so a new id which is
+    also the old id of another file in the batch is not rekeyed twice.
+
+    :param tx: Transaction object
+    :param rekeys: the old and new id of each file
+    """
+    tx.run(
+        """
+        UNWIND $rekeys AS rekey
+        MATCH (e:Embedding {file_id: rekey.old})
+        WITH collect([e, rekey.new]) AS updates
+        UNWIND updates AS update
+        WITH update[0] AS e, update[1] AS new_id
+        SET e.file_id = new_id
+        """,
+        rekeys=rekeys
+    )
+
+
+def rekey_relationships(tx: Any, rel_types: list[str], rekeys: list[dict[str, str]]) -> None:
+    """
+    Rekeys the relationships of a batch of files, one query per relationship type, each matched through its file_id
+    index. As with #rekey_embeddings, every relationship is matched before any is rekeyed.
+
+    :param tx: Transaction object
+    :param rel_types: the relationship types to be rekeyed
+    :param rekeys: the old and new id of each file
+    """
+    for rel_type in rel_types:
+        tx.run(
+            f"""
+            UNWIND $rekeys AS rekey
+            MATCH ()-[r:{quote_name(rel_type)}]->()
+            WHERE r.file_id = rekey.old
+            WITH collect([r, rekey.new]) AS updates
+            UNWIND updates AS update
+            WITH update[0] AS r, update[1] AS new_id
+            SET r.file_id = new_id
+            """,
+            rekeys=rekeys
+        )
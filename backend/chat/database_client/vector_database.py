@@ -1,9 +1,11 @@
-from chat.database_client.database_client import DatabaseClient
+from chat.database_client.database_client import DatabaseClient, RemovalReport
+from chat.database_client.neo4j_data_access import Neo4jDataAccess
+from chat.database_client.neo4j_schema import (
+    create_embedding_file_id_index, create_vector_index, rekey_batches, rekey_embeddings
+)
 from chat.text_transformer.text_vectoriser import TextVectoriser
 
-from neo4j import GraphDatabase
 from torch import Tensor
-import re
 
 class VectorDatabase(DatabaseClient):
     """
@@ -14,34 +16,21 @@ class VectorDatabase(DatabaseClient):
     """
     def __init__(self):
         """
-            Initialises NEO4JInteractor with driver to be used
+            Initialises NEO4JInteractor with the shared data access, see Neo4jDataAccess for its configuration
         """
-        # self._driver = GraphDatabase.driver("bolt://localhost:7687", auth=("neo4j", "password"))
-        # using one below for testing, top one isn't working for me - Rohan
-        self._driver = GraphDatabase.driver("bolt://neo4j:7687", auth=("neo4j", "password"))
+        self._data_access = Neo4jDataAccess.shared()
 
         self.__vectoriser = TextVectoriser()
 
-        self.__create_vector_index()
+        create_vector_index(self._data_access, 384)
+        create_embedding_file_id_index(self._data_access)
     
     def close_driver(self) -> None:
         """
             Closes the connection to the Neo4j database.
         """
-        self._driver.close()
+        self._data_access.close()
 
-    @staticmethod
-    def slugify_reltype(rel_type: str) -> str:
-        """
-            Converts a relationship string into a Neo4j-safe relationship type.
-
-            :param rel_type: Relationship string
-            :return: Uppercase, underscore-separated string
-        """
-        rel_type = rel_type.strip().lower()
-        rel_type = re.sub(r'[^a-z0-9]+', '_', rel_type)
-        return rel_type.upper()
-    
     def store_entries(self, entries, file_id):
         """
             Stores multiple vectors in the Neo4j database.
@@ -49,10 +38,25 @@ class VectorDatabase(DatabaseClient):
                 :param list[tuple[str, list[float]]] vectors: A list containing the tuple pair of string and its corresponding vector
         """
         vectors = self.__vectoriser.chunk_and_embed_text(entries)
-        for vector_data in vectors:
-            text_chunk = vector_data[0]
-            vector = vector_data[1]
-            self.store_vector(text_chunk, file_id, vector)
+        embeddings = [
+            {"text_chunk": text_chunk, "vector": self.__flatten(vector)} for text_chunk, vector in vectors
+        ]
+        if embeddings:
+            self._data_access.write(
+                "vector.store_entries",
+                """
+                UNWIND $embeddings AS embedding
+                CREATE (e:Embedding {text_chunk: embedding.text_chunk, file_id: $file_id, vector: embedding.vector})
+                """,
+                {"embeddings": embeddings, "file_id": file_id}
+            )
+
+    @staticmethod
+    def __flatten(vector: list[Tensor]) -> list:
+        # Flatten and convert to float
+        if isinstance(vector[0], Tensor):  # if it's a list of Tensors
+            vector = [float(x) for x in vector[0]]
+        return vector
 
     def store_vector(self, text_chunk: str, file_id: str, vector: list[Tensor]) -> None:
         """
@@ -63,38 +67,14 @@ class VectorDatabase(DatabaseClient):
                 
         """
 
-        # Flatten and convert to float
-        if isinstance(vector[0], Tensor):  # if it's a list of Tensors
-            vector = [float(x) for x in vector[0]]
-
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                CREATE (e:Embedding {text_chunk: $text_chunk, file_id: $file_id, vector: $vector})
-                """,
-                text_chunk=text_chunk, vector=vector, file_id=file_id 
-            )
+        self._data_access.write(
+            "vector.store_vector",
+            """
+            CREATE (e:Embedding {text_chunk: $text_chunk, file_id: $file_id, vector: $vector})
+            """,
+            {"text_chunk": text_chunk, "vector": self.__flatten(vector), "file_id": file_id}
+        )
             
-    def __create_vector_index(self, vector_dimension: int = 384):
-        """
-        Creates a vector index on the 'vector' property of Embedding nodes.
-
-        :param vector_dimension: Dimensionality of the stored vectors.
-        """
-        client = self._driver
-        with client.session() as session:
-            session.run("""
-            CREATE VECTOR INDEX embedding_vector_index IF NOT EXISTS
-            FOR (e:Embedding) ON (e.vector)
-            OPTIONS { 
-                indexConfig: {
-                    `vector.dimensions`: $dims,
-                    `vector.similarity_function`: 'cosine'
-                }
-            }
-            """, dims=vector_dimension)
-
     def search(self, query) -> list[str]:
         """
             Searches the Neo4j database for the vectors nearest to the one provided, using the cosine metric.
@@ -105,37 +85,55 @@ class VectorDatabase(DatabaseClient):
                 :return list[str]: the text chunks of the nearest vectors to the one provided
         """
         limit = 3
-        client = self._driver
         vector = self.__vectoriser.chunk_and_embed_text(query)[0][1]
-        with client.session() as session:
-            result = session.run(
-                """
-                MATCH (e:Embedding)
-                RETURN e.text_chunk
-                ORDER BY vector.similarity.cosine(e.vector, $vector) DESC
-                LIMIT $limit
-                """,
-                vector=vector, limit=limit
-            )
-
-            return [datum['e.text_chunk'] for datum in result.data()]
+        records = self._data_access.read(
+            "vector.search",
+            """
+            MATCH (e:Embedding)
+            RETURN e.text_chunk
+            ORDER BY vector.similarity.cosine(e.vector, $vector) DESC
+            LIMIT $limit
+            """,
+            {"vector": vector, "limit": limit}
+        )
+
+        return [datum['e.text_chunk'] for datum in records]
         
-    def remove_node_by_file_id(self, file_id: str) -> None:
+    def remove_node_by_file_id(self, file_id: str) -> RemovalReport:
         """
-            Searches the Neo4j database for any nodes matching the provided file_id, and removes them.
+            Searches the Neo4j database for any embeddings matching the provided file_id, and removes them.
 
                 :param str file_id: the file_id to be matched and removed
+                :return RemovalReport: the number of nodes and relationships removed
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.file_id = $file_id
-                DELETE n
+        return self.remove_nodes_by_file_ids([file_id])
+
+    def remove_nodes_by_file_ids(self, file_ids: list[str]) -> RemovalReport:
+        """
+            Removes the embeddings of many files. The embeddings are found through the file_id index and detached
+            and deleted in inner transactions of DELETE_BATCH_SIZE rows, so memory use stays bounded however many
+            nodes a file has.
+
+                :param list[str] file_ids: the file_ids to be matched and removed
+                :return RemovalReport: the number of nodes and relationships removed
+        """
+        report = RemovalReport()
+        # CALL { } IN TRANSACTIONS commits its own transactions, so it has to be run as an auto-commit query
+        for start in range(0, len(file_ids), self.BATCH_SIZE):
+            counters = self._data_access.run(
+                "vector.remove_nodes_by_file_ids",
+                f"""
+                MATCH (e:Embedding)
+                WHERE e.file_id IN $file_ids
+                CALL {{
+                    WITH e
+                    DETACH DELETE e
+                }} IN TRANSACTIONS OF {int(self.DELETE_BATCH_SIZE)} ROWS
                 """,
-                file_id=file_id
-            )
+                {"file_ids": file_ids[start:start + self.BATCH_SIZE]}
+            ).counters
+            report += RemovalReport(counters.nodes_deleted, counters.relationships_deleted)
+        return report
 
     def remove_node_by_text(self, text_chunk: str) -> None:
         """
@@ -143,39 +141,37 @@ class VectorDatabase(DatabaseClient):
 
                 :param str text_chunk: the text chunk of the nodes to be matched and removed
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.text_chunk = $text_chunk
-                DELETE n
-                """,
-                text_chunk=text_chunk
-            )
+        self._data_access.write(
+            "vector.remove_node_by_text",
+            """
+            MATCH (n)
+            WHERE n.text_chunk = $text_chunk
+            DELETE n
+            """,
+            {"text_chunk": text_chunk}
+        )
     
     def clear_database(self):
         """
             Clears the entire Neo4j database by deleting all nodes and relationships.
         """
-        with self._driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
+        self._data_access.write("vector.clear_database", "MATCH (n) DETACH DELETE n")
             
     def rekey_node(self, file_id: str, new_id: str) -> None:
         """
-        Searches the database for any nodes matching the provided file id, and rekeys with the provided id.
+        Searches the database for any embeddings matching the provided file id, and rekeys with the provided id.
 
         :param file_id: the id of the file to be rekeyed
         :param new_id: the new id of the file
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.file_id = $file_id
-                SET n.file_id = $new_id
-                """,
-                file_id=file_id,
-                new_id=new_id
-            )
+        self.rekey_nodes([(file_id, new_id)])
+
+    def rekey_nodes(self, rekeys: list[tuple[str, str]]) -> None:
+        """
+        Rekeys the embeddings of many files, in one statement and transaction per batch of BATCH_SIZE files. The
+        embeddings are found through the file_id index rather than by scanning every node.
+
+        :param rekeys: the (file id, new id) pairs of the files to be rekeyed
+        """
+        for batch in rekey_batches(rekeys, self.BATCH_SIZE):
+            self._data_access.write_transaction("vector.rekey_nodes", rekey_embeddings, batch)
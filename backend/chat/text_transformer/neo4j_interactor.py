@@ -1,6 +1,9 @@
-from neo4j import GraphDatabase
+from chat.database_client.neo4j_data_access import Neo4jDataAccess
+from chat.database_client.neo4j_schema import (
+    create_embedding_file_id_index, create_relationship_file_id_index, create_vector_index, get_relationship_types,
+    rekey_batches, rekey_embeddings, rekey_relationships, slugify_reltype
+)
 from torch import Tensor
-import re
 
 class Neo4JInteractor:
     """
@@ -8,34 +11,27 @@ class Neo4JInteractor:
 
         :author: Jonathan Farrand
     """
+    # The maximum number of files rekeyed per transaction by rekey_nodes
+    BATCH_SIZE = 1000
+
     def __init__(self):
         """
-            Initialises NEO4JInteractor with driver to be used
+            Initialises NEO4JInteractor with the shared data access, see Neo4jDataAccess for its configuration
         """
-        # self._driver = GraphDatabase.driver("bolt://localhost:7687", auth=("neo4j", "password"))
-        # using one below for testing, top one isn't working for me - Rohan
-        self._driver = GraphDatabase.driver("bolt://neo4j:7687", auth=("neo4j", "password"))
+        self._data_access = Neo4jDataAccess.shared()
 
-        self.__create_vector_index()
+        create_vector_index(self._data_access, 385)
+        create_embedding_file_id_index(self._data_access)
+        self.__indexed_rel_types = set()
+        for rel_type in get_relationship_types(self._data_access):
+            self.__create_relationship_file_id_index(rel_type)
     
     def close_driver(self) -> None:
         """
             Closes the connection to the NEO4J database.
         """
-        self._driver.close()
-
-    @staticmethod
-    def slugify_reltype(rel_type: str) -> str:
-        """
-            Converts a relationship string into a Neo4j-safe relationship type.
+        self._data_access.close()
 
-            :param rel_type: Relationship string
-            :return: Uppercase, underscore-separated string
-        """
-        rel_type = rel_type.strip().lower()
-        rel_type = re.sub(r'[^a-z0-9]+', '_', rel_type)
-        return rel_type.upper()
-    
     def store_multiple_vectors(self, vectors: list[tuple[str, list[Tensor]]], file_id) -> None:
         """
             Stores multiple vectors in the NEO4J database.
@@ -60,14 +56,13 @@ class Neo4JInteractor:
         if isinstance(vector[0], Tensor):  # if it's a list of Tensors
             vector = [float(x) for x in vector[0]]
 
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                CREATE (e:Embedding {text_chunk: $text_chunk, file_id: $file_id, vector: $vector})
-                """,
-                text_chunk=text_chunk, vector=vector, file_id=file_id 
-            )
+        self._data_access.write(
+            "interactor.store_vector",
+            """
+            CREATE (e:Embedding {text_chunk: $text_chunk, file_id: $file_id, vector: $vector})
+            """,
+            {"text_chunk": text_chunk, "vector": vector, "file_id": file_id}
+        )
 
     def store_triple(self, subject: str, predicate: str, object_: str, file_id: str = None):
         """
@@ -78,9 +73,12 @@ class Neo4JInteractor:
             :param object_: Object node
             :param file_id: Optional document ID for metadata
         """
-        rel_type = self.slugify_reltype(predicate)
-        with self._driver.session() as session:
-            session.execute_write(self._merge_triple, subject, object_, rel_type, file_id)
+        rel_type = slugify_reltype(predicate)
+        if rel_type not in self.__indexed_rel_types:
+            self.__create_relationship_file_id_index(rel_type)
+        self._data_access.write_transaction(
+            "interactor.store_triple", self._merge_triple, subject, object_, rel_type, file_id
+        )
    
     @staticmethod
     def _merge_triple(tx, subject, object_, rel_type, file_id):
@@ -114,24 +112,15 @@ class Neo4JInteractor:
         for subj, pred, obj in triples:
             self.store_triple(subj, pred, obj, file_id)
             
-    def __create_vector_index(self, vector_dimension: int = 385):
+    def __create_relationship_file_id_index(self, rel_type: str):
         """
-        Creates a vector index on the 'vector' property of Embedding nodes.
+        Creates a range index on the 'file_id' property of relationships of the provided type. Relationship indexes
+        are scoped to a single type, so one is created for each type as it is first stored.
 
-        :param vector_dimension: Dimensionality of the stored vectors.
+        :param rel_type: the relationship type to be indexed
         """
-        client = self._driver
-        with client.session() as session:
-            session.run("""
-            CREATE VECTOR INDEX embedding_vector_index IF NOT EXISTS
-            FOR (e:Embedding) ON (e.vector)
-            OPTIONS { 
-                indexConfig: {
-                    `vector.dimensions`: $dims,
-                    `vector.similarity_function`: 'cosine'
-                }
-            }
-            """, dims=vector_dimension)
+        create_relationship_file_id_index(self._data_access, rel_type)
+        self.__indexed_rel_types.add(rel_type)
 
     def search_text_chunk(self, vector: list[float], limit: int = 3) -> list[str]:
         """
@@ -142,19 +131,18 @@ class Neo4JInteractor:
 
                 :return list[str]: the text chunks of the nearest vectors to the one provided
         """
-        client = self._driver
-        with client.session() as session:
-            result = session.run(
-                """
-                MATCH (e:Embedding)
-                RETURN e.text_chunk
-                ORDER BY vector.similarity.cosine(e.vector, $vector) DESC
-                LIMIT $limit
-                """,
-                vector=vector, limit=limit
-            )
-
-            return [datum['e.text_chunk'] for datum in result.data()]
+        records = self._data_access.read(
+            "interactor.search_text_chunk",
+            """
+            MATCH (e:Embedding)
+            RETURN e.text_chunk
+            ORDER BY vector.similarity.cosine(e.vector, $vector) DESC
+            LIMIT $limit
+            """,
+            {"vector": vector, "limit": limit}
+        )
+
+        return [datum['e.text_chunk'] for datum in records]
         
     def remove_node_by_file_id(self, file_id: str) -> None:
         """
@@ -162,35 +150,49 @@ class Neo4JInteractor:
 
                 :param str file_id: the file_id to be matched and removed
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.file_id = $file_id
-                DELETE n
-                """,
-                file_id=file_id
-            )
+        self._data_access.write(
+            "interactor.remove_node_by_file_id",
+            """
+            MATCH (n)
+            WHERE n.file_id = $file_id
+            DELETE n
+            """,
+            {"file_id": file_id}
+        )
 
     def rekey_node(self, file_id: str, new_id: str) -> None:
         """
-        Searches the database for any nodes matching the provided file id, and rekeys with the provided id.
+        Searches the database for any embeddings and relationships matching the provided file id, and rekeys with
+        the provided id.
 
         :param file_id: the id of the file to be rekeyed
         :param new_id: the new id of the file
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.file_id = $file_id
-                SET n.file_id = $new_id
-                """,
-                file_id=file_id,
-                new_id=new_id
-            )
+        self.rekey_nodes([(file_id, new_id)])
+
+    def rekey_nodes(self, rekeys: list[tuple[str, str]]) -> None:
+        """
+        Rekeys the embeddings and relationships of many files, in one transaction per batch of BATCH_SIZE files.
+        Embeddings and each relationship type are matched through their file_id indexes rather than by scanning
+        every node.
+
+        :param rekeys: the (file id, new id) pairs of the files to be rekeyed
+        """
+        rel_types = get_relationship_types(self._data_access)
+        for batch in rekey_batches(rekeys, self.BATCH_SIZE):
+            self._data_access.write_transaction("interactor.rekey_nodes", self._rekey_nodes_batch, rel_types, batch)
+
+    @staticmethod
+    def _rekey_nodes_batch(tx, rel_types: list[str], rekeys: list[dict[str, str]]) -> None:
+        """
+        Rekeys the embeddings and relationships of a batch of files, in a single transaction.
+
+        :param tx: Transaction object
+        :param rel_types: the relationship types to be rekeyed
+        :param rekeys: the old and new id of each file
+        """
+        rekey_embeddings(tx, rekeys)
+        rekey_relationships(tx, rel_types, rekeys)
 
     def remove_node_by_text(self, text_chunk: str) -> None:
         """
@@ -198,23 +200,21 @@ class Neo4JInteractor:
 
                 :param str text_chunk: the text chunk of the nodes to be matched and removed
         """
-        client = self._driver
-        with client.session() as session:
-            session.run(
-                """
-                MATCH (n)
-                WHERE n.text_chunk = $text_chunk
-                DELETE n
-                """,
-                text_chunk=text_chunk
-            )
+        self._data_access.write(
+            "interactor.remove_node_by_text",
+            """
+            MATCH (n)
+            WHERE n.text_chunk = $text_chunk
+            DELETE n
+            """,
+            {"text_chunk": text_chunk}
+        )
     
     def clear_database(self):
         """
             Clears the entire NEO4J database by deleting all nodes and relationships.
         """
-        with self._driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
+        self._data_access.write("interactor.clear_database", "MATCH (n) DETACH DELETE n")
 
     def search_by_entity(self, entity): 
         subject_query = """
@@ -224,7 +224,7 @@ class Neo4JInteractor:
         """
         subject_params = {"subject": entity}
 
-        subject_results = self.run_cypher_query(subject_query, subject_params)
+        subject_results = self._data_access.read("interactor.search_by_entity", subject_query, subject_params)
         return subject_results
             
     def run_cypher_query(self, query: str, params: dict = None):
@@ -235,6 +235,4 @@ class Neo4JInteractor:
         :param params: Optional dictionary of parameters to pass to the query.
         :return: List of dictionaries representing each record returned.
         """
-        with self._driver.session() as session:
-            result = session.run(query, params or {})
-            return [record.data() for record in result]
+        return self._data_access.run("interactor.run_cypher_query", query, params).records
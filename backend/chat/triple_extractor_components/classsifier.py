@@ -1,11 +1,91 @@
+import threading
+from functools import lru_cache
+
 import nltk
 from nltk.tokenize import word_tokenize
-from nltk.tag import pos_tag
+from nltk.tag.perceptron import PerceptronTagger
 
 from chat.triple_extractor_components.constants import WORD_TYPES, WordType, SUBJECT_BAD_APPLES
 
 
+# (resource path, package name) pairs required for tokenising and tagging. Both the pre-3.9 and 3.9+ names are
+# listed, as NLTK renamed the punkt and perceptron tagger packages.
+NLTK_RESOURCES = [
+    ("tokenizers/punkt", "punkt"),
+    ("tokenizers/punkt_tab", "punkt_tab"),
+    ("taggers/averaged_perceptron_tagger", "averaged_perceptron_tagger"),
+    ("taggers/averaged_perceptron_tagger_eng", "averaged_perceptron_tagger_eng"),
+    ("help/tagsets_json", "tagsets_json"),
+]
+
+_resources_lock = threading.Lock()
+_resources_ready = False
+
+
+def ensure_nltk_resources() -> None:
+    """
+    Makes sure the NLTK resources used by the classifier are available, downloading any that are missing.
+
+    The check only runs once per process, so constructing further classifiers is free.
+    """
+    global _resources_ready
+    if _resources_ready:
+        return
+
+    with _resources_lock:
+        if _resources_ready:
+            return
+        for resource_path, package in NLTK_RESOURCES:
+            try:
+                nltk.data.find(resource_path)
+            except LookupError:
+                nltk.download(package, quiet=True)
+        _resources_ready = True
+
+
+@lru_cache(maxsize=1)
+def get_tagger() -> PerceptronTagger:
+    """
+    Returns the shared perceptron tagger, loading its weights on first use.
+    """
+    ensure_nltk_resources()
+    return PerceptronTagger()
+
+
+@lru_cache(maxsize=4096)
+def retag_word(word: str) -> str:
+    """
+    Returns the POS tag of a single word, tagged on its own. Results are cached, as the same sentence-initial words
+    (e.g. "The", "It", "So") are re-tagged over and over.
+    """
+    return get_tagger().tag([word])[0][1]
+
+
+def tag_sentences(sentences: list[str]) -> list[list[tuple[str, str]]]:
+    """
+    Tokenizes and POS-tags many sentences in a single tagging pass.
+
+    :param sentences: the sentences to be tagged
+    :return: the tagged words of each sentence, in the same order as the provided sentences
+    """
+    return get_tagger().tag_sents([word_tokenize(sentence) for sentence in sentences])
+
+
+def classify_word(word: str, word_tag: str, sentence_start: bool = True) -> WordType | None:
+    """
+    Classifies an individual word from its POS tag.
+
+    Capitalised words at the start of a sentence are re-tagged in lower case, so that sentence-initial words are not
+    mistaken for proper nouns. Capitalised words anywhere else are treated as subjects.
+
+    :return: the word type, or None if the tag is not recognised
+    """
+    if word.lower() != word and len(word) > 1 and sentence_start:
+        word_tag = retag_word(word.lower())
 
+    if not sentence_start and word[0] == word[0].upper() and len(word) > 1:
+        return WordType.SUBJECT
+    return WORD_TYPES.get(word_tag)
 
 
 class Classifier:
@@ -17,9 +97,7 @@ class Classifier:
         """
         Initializes the Classifier with a sentence.
         """
-        nltk.download('punkt')
-        nltk.download('averaged_perceptron_tagger')
-        nltk.download('tagsets_json')
+        ensure_nltk_resources()
 
         if tagged:
             self.tagged_words = sentence
@@ -44,9 +122,7 @@ class Classifier:
         """
         Tokenizes and POS-tags the input sentence.
         """
-        tokens = word_tokenize(sentence)
-        tagged_words = pos_tag(tokens)
-        return tagged_words
+        return tag_sentences([sentence])[0]
 
     def classify_sentence(self):
         """
@@ -60,6 +136,7 @@ class Classifier:
                 
                 raise ValueError(f"Unrecognized POS tag: {tag} | word: {word}")
               
+
             self.classified_sentence.append((word, tag, word_type))
             if tag == ".":
                 sentence_start = True
@@ -73,12 +150,7 @@ class Classifier:
         """
         Classify individual words
         """
-        if word.lower() != word and len(word) > 1 and sentence_start:
-            word_tag = pos_tag([word.lower()])[0][1]
-        
-        if not sentence_start and word[0] == word[0].upper() and len(word) > 1:
-            return WordType.SUBJECT
-        return WORD_TYPES.get(word_tag)
+        return classify_word(word, word_tag, sentence_start)
     
     def print_classified_sentence(self):
         """
@@ -403,4 +475,18 @@ class Classifier:
                 subjects.append(word)
         return subjects
 
+    def get_subjects_batch(self, sentences):
+        """
+        Returns the subjects of each of the provided sentences. All sentences are tagged in one pass, rather than
+        re-entering the tagger once per sentence.
+
+        :param sentences: the sentences to extract subjects from
+        :return: a list containing the subjects of each sentence, in the same order as the provided sentences
+        """
+        subjects = []
+        for tagged_words in tag_sentences(sentences):
+            self.reset_sentence(tagged_words, tagged=True)
+            subjects.append(self.get_subjects())
+        return subjects
+
         
@@ -0,0 +1,220 @@
+from typing import Iterable
+
+from chat.triple_extractor_components.classsifier import classify_word, tag_sentences
+from chat.triple_extractor_components.constants import WORD_TYPES, WordType, SUBJECT_BAD_APPLES
+
+
+class Group:
+    """
+    A group of words sharing a word type, e.g. a multi-word subject or connector.
+    """
+    __slots__ = ("text", "word_type")
+
+    def __init__(self, text: str, word_type: WordType) -> None:
+        self.text = text
+        self.word_type = word_type
+
+    def __repr__(self) -> str:
+        return f"Group({self.text!r}, {self.word_type})"
+
+
+class GroupingEngine:
+    """
+    Groups the words of tagged sentences and extracts their subjects.
+
+    Produces the same output as Classifier#get_subjects, but classifies, groups, merges and connects the words in a
+    single pass over the sentence. Neighbouring words are looked up with a one word look-ahead, and each group is
+    merged and connected as soon as it is formed, rather than re-walking intermediate lists. No per-sentence state
+    is stored on the instance, so a single engine can be shared between threads.
+    """
+
+    def __init__(self, interviewer: str = "Interviewer") -> None:
+        """
+        :param interviewer: the name substituted for second-person pronouns
+        """
+        self.__interviewer = interviewer
+
+    def get_subjects(self, tagged_words: Iterable[tuple[str, str]]) -> list[str]:
+        """
+        Returns the subjects of an already tagged sentence.
+
+        :param tagged_words: the (word, POS tag) pairs of the sentence
+        :return: the subjects in the order they appear
+        """
+        return [group.text for group in self.group(tagged_words) if group.word_type == WordType.SUBJECT]
+
+    def get_subjects_batch(self, sentences: list[str]) -> list[list[str]]:
+        """
+        Returns the subjects of each of the provided sentences, tagging all of them in a single pass.
+
+        :param sentences: the untagged sentences
+        :return: the subjects of each sentence, in the same order as the provided sentences
+        """
+        return [self.get_subjects(tagged_words) for tagged_words in tag_sentences(sentences)]
+
+    def group(self, tagged_words: Iterable[tuple[str, str]]) -> list[Group]:
+        """
+        Groups a tagged sentence. Equivalent to Classifier#get_grouped_2_sentence, except that words with unrecognised
+        POS tags are ignored rather than rejected.
+
+        :param tagged_words: the (word, POS tag) pairs of the sentence
+        :return: the grouped words
+        """
+        if not isinstance(tagged_words, list):
+            tagged_words = list(tagged_words)
+
+        # Classifies each word and groups consecutive subjects and connectors, as Classifier#classify_sentence
+        # followed by Classifier#group_sentence, handing each group on to be merged and connected as it is formed
+        groups = _GroupJoiner()
+        append = groups.add
+        interviewer = self.__interviewer
+
+        subject = ""
+        subject_started = False
+        connector = ""
+        connector_started = False
+
+        sentence_start = True
+        prev_tag = None
+        last_index = len(tagged_words) - 1
+
+        for index, (word, tag) in enumerate(tagged_words):
+            word_type = classify_word(word, tag, sentence_start)
+            if word_type is None:
+                # Tags without a word type (e.g. EX, UH, FW, SYM) carry no subject, so are skipped over like
+                # determiners rather than failing the whole response.
+                word_type = WordType.IGNORE
+
+            # Neighbouring words are compared by POS tag, not by word type, as in Classifier#group_sentence.
+            next_tag = tagged_words[index + 1][1] if index < last_index else None
+
+            if word_type == WordType.SUBJECT:
+                if word.lower() not in SUBJECT_BAD_APPLES:
+                    if connector_started:
+                        append(Group(connector, WordType.CONNECTOR))
+                    connector = ""
+                    connector_started = False
+                    if subject_started:
+                        subject += " " + word
+                    else:
+                        subject = word
+                        subject_started = True
+
+            elif word_type == WordType.CONNECTOR:
+                if subject_started:
+                    append(Group(subject, WordType.SUBJECT))
+                subject = ""
+                subject_started = False
+                if connector_started:
+                    # For cases like: I like to run
+                    append(Group(connector, WordType.CONNECTOR))
+                    connector = ""
+                    connector_started = False
+                    subject = word
+                    subject_started = True
+                else:
+                    connector = word
+                    connector_started = True
+
+            elif word_type == WordType.QUALITY or word_type == WordType.SEPERATOR:
+                if connector_started:
+                    append(Group(connector, WordType.CONNECTOR))
+                if subject_started:
+                    append(Group(subject, WordType.SUBJECT))
+                connector = subject = ""
+                connector_started = subject_started = False
+                append(Group(word, word_type))
+
+            elif word_type == WordType.IGNORE:
+                if prev_tag == next_tag:
+                    if subject_started:
+                        subject += " " + word
+                    elif connector_started:
+                        connector += "_" + word
+
+            elif word_type == WordType.PRONOUN:
+                pronoun_type = WORD_TYPES.get(word.lower())
+                if pronoun_type is not None and pronoun_type != WordType.PRONOUN:
+                    if subject_started:
+                        append(Group(subject, WordType.SUBJECT))
+                        subject = ""
+                        subject_started = False
+                    elif connector_started:
+                        append(Group(connector, WordType.CONNECTOR))
+                        connector = ""
+                        connector_started = False
+                    append(Group(word, WordType.SUBJECT_PRONOUN))
+                elif subject_started:
+                    subject += " " + interviewer
+                else:
+                    if connector_started:
+                        append(Group(connector, WordType.CONNECTOR))
+                    connector = ""
+                    connector_started = False
+                    subject = interviewer
+                    subject_started = True
+
+            prev_tag = tag
+            sentence_start = tag == "."
+
+        if subject_started:
+            append(Group(subject, WordType.SUBJECT))
+        elif connector_started:
+            append(Group(connector, WordType.CONNECTOR))
+
+        return groups.close()
+
+
+class _GroupJoiner:
+    """
+    Merges each quality into the subject following it, then joins consecutive groups of the same word type, as the
+    groups of a sentence are formed. Equivalent to Classifier#sentence_grouper_two followed by
+    Classifier#_connect_sentence, each holding back a single group until the one after it is known.
+    """
+    __slots__ = ("__groups", "__quality", "__previous", "__held")
+
+    def __init__(self) -> None:
+        self.__groups: list[Group] = []
+        # A quality, held back as it is merged into the next group if that is a subject
+        self.__quality: Group | None = None
+        # The last group to be connected, and whether it is held back as it is dropped if the next group shares its
+        # word type, the two being joined instead
+        self.__previous: Group | None = None
+        self.__held = False
+
+    def add(self, group: Group) -> None:
+        quality = self.__quality
+        if quality is not None:
+            self.__quality = None
+            if group.word_type == WordType.SUBJECT:
+                self.__connect(Group(quality.text + " " + group.text, WordType.SUBJECT))
+                return
+            self.__connect(quality)
+
+        if group.word_type == WordType.QUALITY:
+            self.__quality = group
+        else:
+            self.__connect(group)
+
+    def __connect(self, group: Group) -> None:
+        previous = self.__previous
+        if previous is not None and previous.word_type == group.word_type:
+            self.__groups.append(Group(previous.text + " " + group.text, group.word_type))
+            self.__held = False
+        else:
+            if self.__held:
+                self.__groups.append(previous)
+            self.__held = True
+        self.__previous = group
+
+    def close(self) -> list[Group]:
+        """
+        :return: the merged and connected groups, once every group of the sentence has been added
+        """
+        if self.__quality is not None:
+            self.__connect(self.__quality)
+            self.__quality = None
+        if self.__held:
+            self.__groups.append(self.__previous)
+            self.__held = False
+        return self.__groups
@@ -1,9 +1,18 @@
-from flask import Flask, jsonify
+import json
+from typing import Any, Iterable, Iterator, Mapping
+
+from flask import Flask, Response, jsonify, request
 
 from mongodb.ChatStore import ChatStore
 
 
 class ChatRetriever:
+
+    # The largest page of chats which can be requested at once
+    MAX_PAGE_SIZE = 500
+
+    # The number of bytes of JSON buffered before each write of a streamed history
+    STREAM_CHUNK_SIZE = 64 * 1024
   
     def __init__(
         self, collection: ChatStore.Collection
@@ -13,27 +22,56 @@ class ChatRetriever:
     def register_routes(self, app: Flask) -> None:
         @app.route('/chathistory', methods=['GET'])
         def get_chat_history():
+            """
+            Streams the chat history, oldest first, as {"history": [...]} with a user and a bot message per chat.
+
+            Query parameters:
+                limit: the maximum number of chats to list, up to MAX_PAGE_SIZE; the most recent chats are listed
+                before: only list chats before this key; pass the first key of a page to get the previous page
+                project: only list chats within this project
+                session: only list chats within this user session
+            """
             try:
-                chats_cursor = self.__collection.get_all_documents()
-
-                chats = list(chats_cursor)
-                chats = sorted(chats, key=lambda x: x['key'])
-                responses =[]
-                for chat in chats:
-                    responses.append({
-                        "key" : chat["key"],
-                        "content" : chat["question"],
-                        "isUser" : True
-                    })
-                    responses.append({
-                        "key" : chat["key"],
-                        "content" : chat["response"],
-                        "isUser": False
-                    })
-
-                # Extract key for each document
-                
-                return jsonify({"history": responses}), 200
+                limit = request.args.get("limit", type=int)
+                if "limit" in request.args and (limit is None or not 0 < limit <= self.MAX_PAGE_SIZE):
+                    return jsonify({"error": f"limit must be between 1 and {self.MAX_PAGE_SIZE}"}), 400
+
+                before = request.args.get("before", type=float)
+                if "before" in request.args and before is None:
+                    return jsonify({"error": "before must be a chat key"}), 400
+
+                chats = self.__collection.list_chats(
+                    before, limit, request.args.get("project"), request.args.get("session")
+                )
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
-            
+
+            return Response(self.__stream_history(chats), mimetype="application/json"), 200
+
+    @classmethod
+    def __stream_history(cls, chats: Iterable[Mapping[str, Any]]) -> Iterator[str]:
+        """
+        Encodes the chats as the history response, a chunk at a time, so the full history is never held in memory.
+        """
+        buffer = ['{"history":[']
+        buffered = len(buffer[0])
+        separator = ""
+        for chat in chats:
+            encoded = separator + json.dumps({
+                "key": chat["key"],
+                "content": chat["question"],
+                "isUser": True
+            }) + "," + json.dumps({
+                "key": chat["key"],
+                "content": chat["response"],
+                "isUser": False
+            })
+            separator = ","
+            buffer.append(encoded)
+            buffered += len(encoded)
+            if buffered >= cls.STREAM_CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer = []
+                buffered = 0
+        buffer.append("]}")
+        yield "".join(buffer)
@@ -1,4 +1,3 @@
-import re
 from flask import Flask, jsonify, request
 from typing import Any, Callable
 
@@ -30,11 +29,7 @@ class DocumentEditor:
         if not collection.update_document(key, content):
             return jsonify({"error": "Document not found"}), 404
 
-        self.__database.remove_node_by_file_id(key)
-
-        self.__database.store_entries(
-            content, key
-        )
+        self.__database.replace_entries(content, key)
 
         return jsonify({"message": "Document updated successfully"}), 200
 
@@ -52,15 +47,11 @@ class DocumentEditor:
         if not dir.endswith("/"):
             dir = dir + "/"
 
-        docs = collection.matching_documents(f"^{re.escape(dir)}")
-
-        for doc in docs:
-            current_key = str(doc.get("key"))
-            # Replace the matching directory prefix with the new content
-            if current_key.startswith(dir):
-                new_key = content + "/" + current_key[len(dir):]
-                collection.rename_document(current_key, new_key)
-                self.__database.rekey_node(current_key, new_key)
+        # Replace the matching directory prefix with the new content
+        rekeys = [(key, content + "/" + key[len(dir):]) for key in collection.matching_keys(dir)]
+        # The graph is rekeyed as each batch of documents is renamed, so it still agrees with the document store if
+        # a later batch fails
+        collection.rename_documents(rekeys, on_renamed=self.__database.rekey_nodes)
 
         return jsonify({"message": "Document/s updated successfully"}), 200
 
@@ -1,5 +1,7 @@
-from chat.database_client.database_client import DatabaseClient
-import re
+from dataclasses import asdict
+from typing import Optional
+
+from chat.database_client.database_client import DatabaseClient, RemovalReport
 from flask import Flask, jsonify, request
 
 from mongodb.DocumentStore import DocumentStore
@@ -28,6 +30,17 @@ class DocumentRemover:
         self.__mongo_database = mongo_database
         self.__database = database
 
+    @staticmethod
+    def __removal_response(message: str, report: Optional[RemovalReport]) -> dict:
+        """
+        Builds the response to a removal. The report is None when the graph database removal is deferred to the
+        outbox, in which case it is left out.
+        """
+        response = {"message": message}
+        if report is not None:
+            response["removed"] = asdict(report)
+        return response
+
     def register_routes(self, app: Flask) -> None:
         """
         Provides the route path to connect the frontend
@@ -47,9 +60,9 @@ class DocumentRemover:
                 project = request.get_json().get("project")
                 collection = self.__mongo_database.get_collection(project)
                 collection.remove_document(file_key)
-                self.__database.remove_node_by_file_id(file_key)
+                report = self.__database.remove_node_by_file_id(file_key)
             
-                return jsonify({"message": f"{file_key} successfully removed"}), 200
+                return jsonify(self.__removal_response(f"{file_key} successfully removed", report)), 200
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
 
@@ -64,13 +77,11 @@ class DocumentRemover:
             try:
                 project = request.get_json().get("project")
                 collection = self.__mongo_database.get_collection(project)
-                docs = collection.matching_documents(f"^{re.escape(dir)}/")
-                for doc in docs:
-                    key = doc.get("key")
-                    collection.remove_document(key)
-                    self.__database.remove_node_by_file_id(key)
+                keys = collection.matching_keys(f"{dir}/")
+                collection.remove_documents(keys)
+                report = self.__database.remove_nodes_by_file_ids(keys)
 
-                return jsonify({"message": f"{dir} successfully removed"}), 200
+                return jsonify(self.__removal_response(f"{dir} successfully removed", report)), 200
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
             
\ No newline at end of file
@@ -1,10 +1,23 @@
-from flask import Flask, jsonify
+import json
+from typing import Any, Iterable, Iterator, Mapping
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+from werkzeug.exceptions import HTTPException
 
 from mongodb.DocumentStore import DocumentStore
 
 
 class DocumentRetriever:
-  
+
+    # The largest page of documents which can be requested at once
+    MAX_PAGE_SIZE = 1000
+
+    # The number of bytes of JSON buffered before each write of a streamed listing
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    # The optional fields which can be requested when listing documents
+    OPTIONAL_FIELDS = {"content"}
+
     def __init__(
         self, database: DocumentStore.Database
     ) -> None:
@@ -13,15 +26,34 @@ class DocumentRetriever:
     def register_routes(self, app: Flask) -> None:
         @app.route('/<project>/documents', methods=['GET'])
         def get_all_documents(project):
+            """
+            Lists the documents of a project in key order, as a streamed JSON array of {"key", "size"} objects.
+
+            Query parameters:
+                limit: the maximum number of documents to list, up to MAX_PAGE_SIZE; if omitted, all are listed
+                after: only list documents after this key; pass the last key of a full page to get the next page
+                fields: a comma separated list of optional fields, i.e. "content" to include each document's content
+            """
             try:
+                limit = request.args.get("limit", type=int)
+                if "limit" in request.args and (limit is None or not 0 < limit <= self.MAX_PAGE_SIZE):
+                    return jsonify({"error": f"limit must be between 1 and {self.MAX_PAGE_SIZE}"}), 400
+
+                fields = {field.strip() for field in request.args.get("fields", "").split(",") if field.strip()}
+                if not fields <= self.OPTIONAL_FIELDS:
+                    return jsonify({"error": f"Unknown fields: {', '.join(sorted(fields - self.OPTIONAL_FIELDS))}"}), 400
+
                 collection = self.__database.get_collection(project)
-                documents_cursor = collection.get_all_documents()
-                documents = list(documents_cursor)
-                # Extract key for each document
-                result = [{"key": doc.get("key"), "content": doc.get("content")} for doc in documents]
-                return jsonify(result), 200
+                if collection is None:
+                    return jsonify({"error": "Project not found"}), 404
+
+                documents = collection.list_documents(request.args.get("after"), limit, "content" in fields)
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
+
+            return Response(
+                stream_with_context(self.__stream_json_array(documents)), mimetype="application/json"
+            ), 200
             
         @app.route('/<project>/documents/<path:file_key>', methods=['GET'])
         def get_document(project, file_key):
@@ -33,3 +65,46 @@ class DocumentRetriever:
                 return jsonify({"content": doc.get("content", "")}), 200
             except Exception as e:
                 return jsonify({"error": str(e)}), 500
+
+        @app.route('/<project>/content/<path:file_key>', methods=['GET'])
+        def get_document_content(project, file_key):
+            """
+            Returns the content of a document as plain text. Supports byte Range requests, so clients can read a
+            long transcript in parts, and conditional requests using the ETag of the content.
+            """
+            try:
+                collection = self.__database.get_collection(project)
+                doc = collection.find_document(file_key) if collection is not None else None
+                if not doc:
+                    return jsonify({"error": "Document not found"}), 404
+
+                content = doc.get("content", "").encode("utf-8")
+                response = Response(content, mimetype="text/plain")
+                response.add_etag()
+                response.headers["Accept-Ranges"] = "bytes"
+                return response.make_conditional(request, accept_ranges=True, complete_length=len(content))
+            except HTTPException:
+                # e.g. 416 for a range beyond the end of the content
+                raise
+            except Exception as e:
+                return jsonify({"error": str(e)}), 500
+
+    @classmethod
+    def __stream_json_array(cls, documents: Iterable[Mapping[str, Any]]) -> Iterator[str]:
+        """
+        Encodes the documents as a JSON array, a chunk at a time, so the full listing is never held in memory.
+        """
+        buffer = ["["]
+        buffered = 1
+        separator = ""
+        for document in documents:
+            encoded = separator + json.dumps(document)
+            separator = ","
+            buffer.append(encoded)
+            buffered += len(encoded)
+            if buffered >= cls.STREAM_CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer = []
+                buffered = 0
+        buffer.append("]")
+        yield "".join(buffer)
@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for serving the backend.
+
+Each worker process loads its own copy of the embedding models and database clients, so concurrency comes mostly from
+threads: requests such as /chat spend nearly all their time waiting on Ollama, Neo4j and MongoDB, and a blocked
+thread releases the GIL while it waits.
+"""
+from config.config import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_THREADS, SERVER_TIMEOUT
+
+bind = f"{SERVER_HOST}:{SERVER_PORT}"
+worker_class = "gthread"
+workers = SERVER_WORKERS
+threads = SERVER_THREADS
+# LLM responses can take minutes on CPU-only hosts
+timeout = SERVER_TIMEOUT
+graceful_timeout = 30
+keepalive = 5
+
+# Database drivers are not fork-safe, so the app is loaded separately in each worker
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import re
-from typing import Mapping, Any
+import threading
+from typing import Iterable, Mapping, Any
 
 from pymongo import MongoClient
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
 from pymongo.synchronous.cursor import Cursor
 from pymongo.synchronous.database import Database
 
 from config import config
+from mongodb.ClientPool import ClientPool
+from mongodb.KeyIndex import ensure_key_index, prefix_range
 
 
 class ChatStore:
@@ -36,13 +40,38 @@ class ChatStore:
             """
             self.__database = document_store.client()[database_name]
 
+            # Collection handles are cached, so that each collection's key index is only ensured once. Whether a
+            # collection exists is always checked with the server, as another worker process may have created or
+            # dropped it; the handle of a collection dropped elsewhere is discarded, so that it is recreated with its
+            # index rather than implicitly by the next write.
+            self.__collections: dict[str, ChatStore.Collection] = {}
+            self.__lock = threading.Lock()
+
+        def __exists(self, collection_name: str) -> bool:
+            return collection_name in self.__database.list_collection_names()
+
+        def __handle(self, collection_name: str) -> ChatStore.Collection:
+            """
+            :return: the cached handle of an existing collection, constructing it if there is none
+            """
+            collection = self.__collections.get(collection_name)
+            if collection is not None:
+                return collection
+
+            with self.__lock:
+                collection = self.__collections.get(collection_name)
+                if collection is None:
+                    collection = ChatStore.Collection(self, collection_name)
+                    self.__collections[collection_name] = collection
+                return collection
+
         def get_collection_names(self) -> list[str]:
-            return self.__database.list_collection_names()
+            return sorted(self.__database.list_collection_names())
 
         def get_collections(self) -> list[ChatStore.Collection]:
             collections = []
-            for collection_name in self.__database.list_collection_names():
-                collections.append(self.create_collection(collection_name))
+            for collection_name in self.get_collection_names():
+                collections.append(self.__handle(collection_name))
             return collections
 
         def get_collection(self, collection_name: str) -> ChatStore.Collection | None:
@@ -51,9 +80,11 @@ class ChatStore:
 
             :return: the retrieved collection, if it exists; else, None
             """
-            if collection_name in self.__database.list_collection_names():
-                return self.create_collection(collection_name)
-            return None
+            if not self.__exists(collection_name):
+                # Never created, or dropped by another process, in which case its cached handle is stale
+                self.__collections.pop(collection_name, None)
+                return None
+            return self.__handle(collection_name)
 
         def create_collection(self, collection_name: str) -> ChatStore.Collection:
             """
@@ -61,13 +92,22 @@ class ChatStore:
 
             :return: the created collection, if it does not exist; else, the existing collection with the same name
             """
-            return ChatStore.Collection(self, collection_name)
+            if not self.__exists(collection_name):
+                try:
+                    self.__database.create_collection(collection_name)
+                except CollectionInvalid:
+                    # Created by another process since it was checked
+                    pass
+                # A handle cached before another process dropped the collection must ensure its index again
+                self.__collections.pop(collection_name, None)
+            return self.__handle(collection_name)
 
         def delete_collection(self, collection_name: str) -> None:
             """
             Deletes the collection with the provided name from this database.
             """
             self.__database.drop_collection(collection_name)
+            self.__collections.pop(collection_name, None)
 
         def client(self) -> Database[Mapping[str, Any]]:
             """
@@ -82,12 +122,34 @@ class ChatStore:
         :author: Kays Beslen
         """
         def __init__(self, database: ChatStore.Database, collection_name: str) -> None:
-            db = database.client()
+            """
+            Wraps an existing collection. Use ChatStore.Database#create_collection to construct a collection, which
+            creates it in the database if needed. Ensures the collection has a unique index on document keys; if the
+            index cannot be built, e.g. as the collection has legacy duplicate keys, new keys are checked for
+            uniqueness with a query before they are written instead.
 
-            if collection_name not in db.list_collection_names():
-                db.create_collection(collection_name)
+            :param database: the database containing the collection
+            :param collection_name: the name of the collection
+            """
+            self.__collection = database.client().get_collection(collection_name)
+            self.__indexed = ensure_key_index(self.__collection)
+            # Serve the history of a single project or session in key order. History scoped by both is served by
+            # the session index, as a session is far narrower than a project.
+            self.__collection.create_index([("project", 1), ("key", 1)], name=ChatStore.PROJECT_INDEX_NAME)
+            self.__collection.create_index([("session", 1), ("key", 1)], name=ChatStore.SESSION_INDEX_NAME)
+
+        def __check_unique(self, document_key: str) -> None:
+            """
+            Checks that no document in the collection has the provided key, when the key index is missing and so
+            cannot reject the duplicate itself.
 
-            self.__collection = db.get_collection(collection_name)
+            :raises KeyError: if the provided document key is already used by a document in this collection
+            """
+            if not self.__indexed and self.find_document(document_key) is not None:
+                raise KeyError(
+                    f"The provided document key, {document_key}, must be unique between all documents within the "
+                    f"collection."
+                )
 
         def get_all_documents(self) -> Cursor[Mapping[str, Any]]:
             """
@@ -97,32 +159,68 @@ class ChatStore:
             """
             return self.__collection.find()
 
+        def list_chats(
+            self, before: float | None = None, limit: int | None = None, project: str | None = None,
+            session: str | None = None
+        ) -> Iterable[Mapping[str, Any]]:
+            """
+            Lists chats in key order, sorted by the server. With a limit, the most recent chats are listed, so older
+            pages can be requested by passing the first key of the current page as before.
+
+            :param before: if provided, only chats with keys before this key are listed
+            :param limit: the maximum number of chats to list; if None, every chat is listed
+            :param project: if provided, only chats within this project are listed
+            :param session: if provided, only chats within this user session are listed
+
+            :return: the listed chats, oldest first
+            """
+            query: dict[str, Any] = {}
+            if project is not None:
+                query["project"] = project
+            if session is not None:
+                query["session"] = session
+            if before is not None:
+                query["key"] = {"$lt": before}
+
+            projection = {"_id": 0, "key": 1, "question": 1, "response": 1}
+            if limit is None:
+                return self.__collection.find(query, projection).sort("key", 1)
+
+            # The newest chats are read back from the end of the index, so the page is reversed into key order
+            page = list(self.__collection.find(query, projection).sort("key", -1).limit(limit))
+            page.reverse()
+            return page
+
         def add_document(self, document_name: str, content: dict) -> str:
             """
             Inserts the provided document into the collection.
 
             :param document_name: the name associated with the provided document
-            :param content: the document content to be added to the collection
+            :param content: the document content to be added to the collection, with a question and response, and
+                optionally the project and session the chat belongs to
 
             :return: the updated document_name
 
             :raises KeyError: if the provided document key is not unique amongst all documents in this collection
             """
-            if self.find_document(document_name) is not None:
+            document: dict[str, str] = {"key": document_name, "question": content["question"], "response": content["response"]}
+            for scope in ("project", "session"):
+                if content.get(scope) is not None:
+                    document[scope] = content[scope]
+            self.__check_unique(document_name)
+            try:
+                self.__collection.insert_one(document)
+            except DuplicateKeyError:
                 raise KeyError(
                     f"The provided document key, {document_name}, must be unique between all documents within the "
                     f"collection."
                 )
-
-            document: dict[str, str] = {"key": document_name, "question": content["question"], "response": content["response"]}
-            self.__collection.insert_one(document)
             return document_name
 
         def update_document_name(self, document_name: str) -> str:
             base_name = document_name
 
-            prefix_regex = f"^{re.escape(base_name)}"
-            existing_count = self.__collection.count_documents({"key": {"$regex": prefix_regex}})
+            existing_count = self.__collection.count_documents({"key": prefix_range(base_name)})
 
             if existing_count > 0:
                 count = existing_count
@@ -135,8 +233,11 @@ class ChatStore:
             return document_name
 
         def update_dir_name(self, dir_name: str) -> str:
+            # The range narrows the scan of the key index, which the regex then filters
             prefix_regex = f"^{re.escape(dir_name)}(_\\d+)?/"
-            existing_keys = list(self.__collection.find({"key": {"$regex": prefix_regex}}))
+            existing_keys = list(self.__collection.find(
+                {"key": {**prefix_range(dir_name), "$regex": prefix_regex}}, {"key": 1, "_id": 0}
+            ))
 
             if not existing_keys or len(existing_keys) == 0:
                 return dir_name
@@ -170,19 +271,21 @@ class ChatStore:
 
             :returns: whether the document was successfully renamed
             """
-            if self.find_document(new_name) is not None:
+            self.__check_unique(new_name)
+            try:
+                result = self.__collection.update_one({ "key": document_key }, { "$set": { "key" : new_name } })
+            except DuplicateKeyError:
                 raise KeyError(
                     f"The provided document key, {new_name}, must be unique between all documents within the "
                     f"collection."
                 )
-            result = self.__collection.update_one({ "key": document_key }, { "$set": { "key" : new_name } })
             return result.modified_count > 0
 
-        def matching_documents(self, regex: str) -> Cursor[Mapping[str, Any]]:
+        def matching_documents(self, prefix: str) -> Cursor[Mapping[str, Any]]:
             """
-            :return: the set of documents with key matching the provided regex expression
+            :return: the set of documents with key starting with the provided prefix, in key order
             """
-            return self.__collection.find({ "key" : { "$regex": regex }})
+            return self.__collection.find({ "key" : prefix_range(prefix) }).sort("key", 1)
         
         def remove_document(self, document_key: str) -> None:
             """
@@ -195,8 +298,12 @@ class ChatStore:
     # Global variable for connecting to the MongoDB client.
     URI = config.MONGO_URI
 
+    # The names of the indexes used to list the chats of a project, and of a session
+    PROJECT_INDEX_NAME = "project_key"
+    SESSION_INDEX_NAME = "session_key"
+
     def __init__(self) -> None:
-        self.__client = MongoClient(ChatStore.URI)
+        self.__client = ClientPool.get_client(ChatStore.URI)
 
     def get_database(self, database_name: str) -> ChatStore.Database | None:
         """
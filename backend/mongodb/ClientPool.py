@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import threading
+
+from pymongo import MongoClient
+
+from config import config
+
+
+class ClientPool:
+    """
+    Provides a single, process-wide MongoClient for each MongoDB URI.
+
+    A MongoClient maintains its own connection pool and is thread-safe, so every store within the process should
+    share it, rather than opening its own set of connections.
+    """
+
+    __clients: dict[str | None, MongoClient] = {}
+    __lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls, uri: str | None = None) -> MongoClient:
+        """
+        Retrieves the shared client for the provided URI, creating it on first use.
+
+        :param uri: the MongoDB connection URI; defaults to the configured MONGO_URI
+
+        :return: the shared client
+        """
+        if uri is None:
+            uri = config.MONGO_URI
+
+        client = cls.__clients.get(uri)
+        if client is not None:
+            return client
+
+        with cls.__lock:
+            client = cls.__clients.get(uri)
+            if client is None:
+                client = MongoClient(
+                    uri,
+                    maxPoolSize=config.MONGO_MAX_POOL_SIZE,
+                    minPoolSize=config.MONGO_MIN_POOL_SIZE,
+                    maxIdleTimeMS=config.MONGO_MAX_IDLE_TIME_MS,
+                    waitQueueTimeoutMS=config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                )
+                cls.__clients[uri] = client
+            return client
+
+    @classmethod
+    def close_all(cls) -> None:
+        """
+        Closes every shared client. Clients are recreated when next requested.
+        """
+        with cls.__lock:
+            for client in cls.__clients.values():
+                client.close()
+            cls.__clients.clear()
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
-import re
-from typing import Mapping, Any
+import threading
+from typing import Any, Callable, Mapping
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError
+from pymongo.synchronous.command_cursor import CommandCursor
 from pymongo.synchronous.cursor import Cursor
 from pymongo.synchronous.database import Database
 
 from config import config
+from mongodb.ClientPool import ClientPool
+from mongodb.KeyIndex import ensure_key_index, prefix_range
 
 
 class DocumentStore:
@@ -36,13 +40,44 @@ class DocumentStore:
             """
             self.__database = document_store.client()[database_name]
 
+            # Collection handles are cached, so that each collection's key index is only ensured once. Whether a
+            # collection exists is always checked with the server, as another worker process may have created or
+            # dropped it; the handle of a collection dropped elsewhere is discarded, so that it is recreated with its
+            # index rather than implicitly by the next write.
+            self.__collections: dict[str, DocumentStore.Collection] = {}
+            self.__lock = threading.Lock()
+
+        def __exists(self, collection_name: str) -> bool:
+            return collection_name in self.__database.list_collection_names()
+
+        def __handle(self, collection_name: str) -> DocumentStore.Collection:
+            """
+            :return: the cached handle of an existing collection, constructing it if there is none
+            """
+            collection = self.__collections.get(collection_name)
+            if collection is not None:
+                return collection
+
+            with self.__lock:
+                collection = self.__collections.get(collection_name)
+                if collection is None:
+                    collection = DocumentStore.Collection(self, collection_name)
+                    self.__collections[collection_name] = collection
+                return collection
+
         def get_collection_names(self) -> list[str]:
-            return self.__database.list_collection_names()
+            """
+            :return: the names of the collections within this database, excluding internal collections
+            """
+            return sorted(
+                name for name in self.__database.list_collection_names()
+                if not name.startswith(DocumentStore.INTERNAL_PREFIX)
+            )
 
         def get_collections(self) -> list[DocumentStore.Collection]:
             collections = []
-            for collection_name in self.__database.list_collection_names():
-                collections.append(self.create_collection(collection_name))
+            for collection_name in self.get_collection_names():
+                collections.append(self.__handle(collection_name))
             return collections
 
         def get_collection(self, collection_name: str) -> DocumentStore.Collection | None:
@@ -51,9 +86,14 @@ class DocumentStore:
 
             :return: the retrieved collection, if it exists; else, None
             """
-            if collection_name in self.__database.list_collection_names():
-                return self.create_collection(collection_name)
-            return None
+            if collection_name.startswith(DocumentStore.INTERNAL_PREFIX):
+                return None
+
+            if not self.__exists(collection_name):
+                # Never created, or dropped by another process, in which case its cached handle is stale
+                self.__collections.pop(collection_name, None)
+                return None
+            return self.__handle(collection_name)
 
         def create_collection(self, collection_name: str) -> DocumentStore.Collection:
             """
@@ -61,13 +101,23 @@ class DocumentStore:
 
             :return: the created collection, if it does not exist; else, the existing collection with the same name
             """
-            return DocumentStore.Collection(self, collection_name)
+            if not self.__exists(collection_name):
+                try:
+                    self.__database.create_collection(collection_name)
+                except CollectionInvalid:
+                    # Created by another process since it was checked
+                    pass
+                # A handle cached before another process dropped the collection must ensure its index again
+                self.__collections.pop(collection_name, None)
+            return self.__handle(collection_name)
 
         def delete_collection(self, collection_name: str) -> None:
             """
             Deletes the collection with the provided name from this database.
             """
             self.__database.drop_collection(collection_name)
+            self.__database[DocumentStore.NAME_COUNTERS].delete_one({"_id": collection_name})
+            self.__collections.pop(collection_name, None)
 
         def client(self) -> Database[Mapping[str, Any]]:
             """
@@ -82,12 +132,32 @@ class DocumentStore:
         :author: Kays Beslen
         """
         def __init__(self, database: DocumentStore.Database, collection_name: str) -> None:
-            db = database.client()
+            """
+            Wraps an existing collection. Use DocumentStore.Database#create_collection to construct a collection, which
+            creates it in the database if needed. Ensures the collection has a unique index on document keys; if the
+            index cannot be built, e.g. as the collection has legacy duplicate keys, new keys are checked for
+            uniqueness with a query before they are written instead.
 
-            if collection_name not in db.list_collection_names():
-                db.create_collection(collection_name)
+            :param database: the database containing the collection
+            :param collection_name: the name of the collection
+            """
+            self.__name = collection_name
+            self.__collection = database.client().get_collection(collection_name)
+            self.__counters = database.client().get_collection(DocumentStore.NAME_COUNTERS)
+            self.__indexed = ensure_key_index(self.__collection)
 
-            self.__collection = db.get_collection(collection_name)
+        def __check_unique(self, document_key: str) -> None:
+            """
+            Checks that no document in the collection has the provided key, when the key index is missing and so
+            cannot reject the duplicate itself.
+
+            :raises KeyError: if the provided document key is already used by a document in this collection
+            """
+            if not self.__indexed and self.find_document(document_key) is not None:
+                raise KeyError(
+                    f"The provided document key, {document_key}, must be unique between all documents within the "
+                    f"collection."
+                )
 
         def get_all_documents(self) -> Cursor[Mapping[str, Any]]:
             """
@@ -97,6 +167,35 @@ class DocumentStore:
             """
             return self.__collection.find()
 
+        def list_documents(
+            self, after: str | None = None, limit: int | None = None, include_content: bool = False
+        ) -> CommandCursor[Mapping[str, Any]]:
+            """
+            Lists the documents within this collection in key order, a page at a time. Pages are read from the key
+            index, so listing a page costs the same however far through the collection it is.
+
+            :param after: if provided, only documents with keys after this key are listed, i.e. the last key of the
+                previous page
+            :param limit: the maximum number of documents to list; if None, every remaining document is listed
+            :param include_content: whether to include the content of each document; otherwise only the key and the
+                content size in bytes are listed, which the server computes without sending the content
+
+            :return: the listed documents
+            """
+            pipeline: list[dict[str, Any]] = []
+            if after is not None:
+                pipeline.append({"$match": {"key": {"$gt": after}}})
+            pipeline.append({"$sort": {"key": 1}})
+            if limit is not None:
+                pipeline.append({"$limit": limit})
+
+            projection: dict[str, Any] = {"_id": 0, "key": 1, "size": {"$strLenBytes": {"$ifNull": ["$content", ""]}}}
+            if include_content:
+                projection["content"] = 1
+            pipeline.append({"$project": projection})
+
+            return self.__collection.aggregate(pipeline)
+
         def add_document(self, document_name: str, content: str) -> str:
             """
             Inserts the provided document into the collection.
@@ -108,48 +207,125 @@ class DocumentStore:
 
             :raises KeyError: if the provided document key is not unique amongst all documents in this collection
             """
-            if self.find_document(document_name) is not None:
+            document: dict[str, str] = {"key": document_name, "content": content}
+            self.__check_unique(document_name)
+            try:
+                self.__collection.insert_one(document)
+            except DuplicateKeyError:
                 raise KeyError(
                     f"The provided document key, {document_name}, must be unique between all documents within the "
                     f"collection."
                 )
-
-            document: dict[str, str] = {"key": document_name, "content": content}
-            self.__collection.insert_one(document)
             return document_name
 
         def update_document_name(self, document_name: str) -> str:
-            base_name = document_name
+            """
+            Allocates a unique document name, see #allocate_document_names.
 
-            prefix_regex = f"^{re.escape(base_name)}"
-            existing_count = self.__collection.count_documents({"key": {"$regex": prefix_regex}})
+            :param document_name: the requested document name
 
-            if existing_count > 0:
-                count = existing_count
-                document_name = f"{base_name}_{count}"
+            :return: the requested name if it is free; else, the name with a numbered suffix
+            """
+            return self.allocate_document_names([document_name])[0]
 
-                while self.find_document(document_name) is not None:
-                    count += 1
-                    document_name = f"{base_name}_{count}"
+        def allocate_document_names(self, document_names: list[str]) -> list[str]:
+            """
+            Allocates unique names for a batch of documents, e.g. the files of a folder upload.
 
-            return document_name
+            Names which are free are kept. Every other name is given a numbered suffix, e.g. notes.txt_2, drawn from
+            this collection's name counters, so a whole batch is allocated in a few round-trips to the server,
+            regardless of the number of documents in the batch or the collection.
+
+            :param document_names: the requested document names
+
+            :return: the allocated names, in the same order as the requested names
+            """
+            allocated = list(document_names)
+            taken = self.__existing_keys(set(document_names))
+
+            # Indexes of the names which need a suffix, by requested name
+            conflicts: dict[str, list[int]] = {}
+            requested = set()
+            for index, document_name in enumerate(document_names):
+                if document_name in taken or document_name in requested:
+                    conflicts.setdefault(document_name, []).append(index)
+                requested.add(document_name)
+
+            if not conflicts:
+                return allocated
+
+            suffixes = self.__reserve_suffixes("documents", {name: len(indexes) for name, indexes in conflicts.items()})
+            for document_name, indexes in conflicts.items():
+                for index, suffix in zip(indexes, suffixes[document_name]):
+                    allocated[index] = f"{document_name}_{suffix}"
+
+            # Suffixed names may have been taken before the counters were introduced, or requested in this batch
+            suffixed = {allocated[index] for indexes in conflicts.values() for index in indexes}
+            taken = self.__existing_keys(suffixed) | requested
+            for document_name, indexes in conflicts.items():
+                for index in indexes:
+                    while allocated[index] in taken:
+                        suffix = self.__reserve_suffixes("documents", {document_name: 1})[document_name][0]
+                        allocated[index] = f"{document_name}_{suffix}"
+                        if self.find_document(allocated[index]) is not None:
+                            taken.add(allocated[index])
+                    taken.add(allocated[index])
+
+                # Keep the suffixes increasing in the order the names were requested
+                names = sorted((allocated[index] for index in indexes), key=lambda name: int(name.rsplit("_", 1)[1]))
+                for index, name in zip(indexes, names):
+                    allocated[index] = name
+
+            return allocated
 
         def update_dir_name(self, dir_name: str) -> str:
-            prefix_regex = f"^{re.escape(dir_name)}(_\\d+)?/"
-            existing_keys = list(self.__collection.find({"key": {"$regex": prefix_regex}}))
+            """
+            Allocates a unique directory name, for the documents of an uploaded folder.
+
+            :param dir_name: the requested directory name
+
+            :return: the requested name if no documents are within it; else, the name with a numbered suffix
+            """
+            allocated = dir_name
+            while self.__collection.find_one({"key": prefix_range(f"{allocated}/")}, {"_id": 1}) is not None:
+                suffix = self.__reserve_suffixes("directories", {dir_name: 1})[dir_name][0]
+                allocated = f"{dir_name}_{suffix}"
+            return allocated
+
+        def __existing_keys(self, keys: set[str]) -> set[str]:
+            """
+            :return: the subset of the provided keys which are already used by documents in this collection
+            """
+            if not keys:
+                return set()
+            return {
+                document["key"] for document in self.__collection.find({"key": {"$in": list(keys)}}, {"key": 1, "_id": 0})
+            }
 
-            if not existing_keys or len(existing_keys) == 0:
-                return dir_name
+        def __reserve_suffixes(self, kind: str, counts: dict[str, int]) -> dict[str, list[int]]:
+            """
+            Atomically reserves numbered suffixes for the provided names, in a single update of this collection's
+            name counter document.
 
-            max_suffix = 0
-            for doc in existing_keys:
-                key = doc["key"]
-                m = re.match(f"{re.escape(dir_name)}_(\\d+)/", key)
-                if m:
-                    suffix = int(m.group(1))
-                    max_suffix = suffix if suffix > max_suffix else max_suffix
+            :param kind: the kind of name, either "documents" or "directories"
+            :param counts: the number of suffixes to reserve for each name
 
-            return f"{dir_name}_{max_suffix + 1}"
+            :return: the reserved suffixes for each name
+            """
+            fields = {name: f"{kind}.{DocumentStore.counter_field(name)}" for name in counts}
+            counter = self.__counters.find_one_and_update(
+                {"_id": self.__name},
+                {"$inc": {fields[name]: count for name, count in counts.items()}},
+                projection={field: 1 for field in fields.values()},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+
+            suffixes = {}
+            for name, count in counts.items():
+                last = counter[kind][DocumentStore.counter_field(name)]
+                suffixes[name] = list(range(last - count + 1, last + 1))
+            return suffixes
 
         def find_document(self, document_key: str) -> Mapping[str, Any] | None:
             """
@@ -180,19 +356,31 @@ class DocumentStore:
 
             :returns: whether the document was successfully renamed
             """
-            if self.find_document(new_name) is not None:
+            self.__check_unique(new_name)
+            try:
+                result = self.__collection.update_one({ "key": document_key }, { "$set": { "key" : new_name } })
+            except DuplicateKeyError:
                 raise KeyError(
                     f"The provided document key, {new_name}, must be unique between all documents within the "
                     f"collection."
                 )
-            result = self.__collection.update_one({ "key": document_key }, { "$set": { "key" : new_name } })
             return result.modified_count > 0
 
-        def matching_documents(self, regex: str) -> Cursor[Mapping[str, Any]]:
+        def matching_documents(self, prefix: str) -> Cursor[Mapping[str, Any]]:
             """
-            :return: the set of documents with key matching the provided regex expression
+            :return: the set of documents with key starting with the provided prefix, in key order
             """
-            return self.__collection.find({ "key" : { "$regex": regex }})
+            return self.__collection.find({ "key" : prefix_range(prefix) }).sort("key", 1)
+
+        def matching_keys(self, prefix: str) -> list[str]:
+            """
+            :return: the keys of the documents with key starting with the provided prefix, in key order, read
+                without their content
+            """
+            return [
+                document["key"]
+                for document in self.__collection.find({"key": prefix_range(prefix)}, {"key": 1, "_id": 0}).sort("key", 1)
+            ]
         
         def remove_document(self, document_key: str) -> None:
             """
@@ -202,11 +390,95 @@ class DocumentStore:
             """
             self.__collection.delete_one({"key": document_key})
 
+        def remove_documents(self, document_keys: list[str]) -> int:
+            """
+            Removes the documents with the provided keys from the collection, in batches of BATCH_SIZE keys per
+            round-trip.
+
+            :param document_keys: the unique identifiers associated with the documents
+
+            :return: the number of removed documents
+            """
+            removed = 0
+            for start in range(0, len(document_keys), DocumentStore.BATCH_SIZE):
+                batch = document_keys[start:start + DocumentStore.BATCH_SIZE]
+                removed += self.__collection.delete_many({"key": {"$in": batch}}).deleted_count
+            return removed
+
+        def rename_documents(
+            self, renames: list[tuple[str, str]], on_renamed: Callable[[list[tuple[str, str]]], Any] | None = None
+        ) -> int:
+            """
+            Renames many documents, in batches of BATCH_SIZE renames per round-trip. Renames are applied in order,
+            and stop at the first new name which is already taken.
+
+            :param renames: the (current key, new key) pairs of the documents to be renamed
+            :param on_renamed: if provided, called with the renames of each batch once they are committed, including
+                those committed before a failure, e.g. to rekey the graph in step with the documents
+
+            :return: the number of renamed documents
+
+            :raises KeyError: if a new key is not unique amongst all documents in this collection
+            """
+            if not self.__indexed:
+                # Without the key index, each new key is checked before its document is renamed
+                renamed = 0
+                for index, (key, new_key) in enumerate(renames):
+                    try:
+                        renamed += self.rename_document(key, new_key)
+                    except Exception:
+                        if on_renamed is not None and index > 0:
+                            on_renamed(renames[:index])
+                        raise
+                if on_renamed is not None and renames:
+                    on_renamed(renames)
+                return renamed
+
+            renamed = 0
+            for start in range(0, len(renames), DocumentStore.BATCH_SIZE):
+                batch = renames[start:start + DocumentStore.BATCH_SIZE]
+                try:
+                    result = self.__collection.bulk_write(
+                        [UpdateOne({"key": key}, {"$set": {"key": new_key}}) for key, new_key in batch]
+                    )
+                except BulkWriteError as e:
+                    # The writes are ordered, so stop at the first error, after committing the renames before it
+                    error = e.details["writeErrors"][0]
+                    if on_renamed is not None and error["index"] > 0:
+                        on_renamed(batch[:error["index"]])
+                    if error["code"] != 11000:
+                        raise
+                    new_key = batch[error["index"]][1]
+                    raise KeyError(
+                        f"The provided document key, {new_key}, must be unique between all documents within the "
+                        f"collection."
+                    )
+                renamed += result.modified_count
+                if on_renamed is not None:
+                    on_renamed(batch)
+            return renamed
+
     # Global variable for connecting to the MongoDB client.
     URI = config.MONGO_URI
 
+    # The maximum number of documents removed or renamed per round-trip by the bulk operations
+    BATCH_SIZE = 1000
+
+    # Collections with this prefix are used internally, and are not listed as projects
+    INTERNAL_PREFIX = "__"
+
+    # The internal collection holding the name counters of each collection, see Collection#allocate_document_names
+    NAME_COUNTERS = "__name_counters"
+
+    @staticmethod
+    def counter_field(name: str) -> str:
+        """
+        Escapes a document or directory name for use as a field name, which may not contain '.', or start with '$'.
+        """
+        return name.replace("%", "%25").replace(".", "%2E").replace("$", "%24").replace("\0", "%00")
+
     def __init__(self) -> None:
-        self.__client = MongoClient(DocumentStore.URI)
+        self.__client = ClientPool.get_client(DocumentStore.URI)
 
     def get_database(self, database_name: str) -> DocumentStore.Database | None:
         """
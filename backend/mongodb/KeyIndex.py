@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Mapping
+
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+
+# The name of the unique index on the key field of every document and chat collection
+KEY_INDEX_NAME = "key_unique"
+
+# Code points which cannot be encoded in UTF-8 strings, so are skipped when computing range bounds
+_SURROGATES = range(0xD800, 0xE000)
+
+
+def prefix_range(prefix: str) -> dict[str, str]:
+    """
+    Builds a range filter matching every string starting with the provided prefix.
+
+    Unlike a regular expression, a range can always be answered from the key index with tight bounds.
+
+    :param prefix: the prefix to be matched
+
+    :return: a filter to be applied to a string field, e.g. {"key": prefix_range("dir/")}
+    """
+    if not prefix:
+        return {"$gte": ""}
+
+    # Strings starting with the prefix sort before the prefix with its last character incremented
+    upper = prefix
+    while upper:
+        last = ord(upper[-1]) + 1
+        if last in _SURROGATES:
+            last = _SURROGATES.stop
+        if last <= 0x10FFFF:
+            return {"$gte": prefix, "$lt": upper[:-1] + chr(last)}
+        upper = upper[:-1]
+    return {"$gte": prefix}
+
+
+def ensure_key_index(collection: Collection[Mapping[str, Any]]) -> bool:
+    """
+    Ensures the provided collection has a unique index on its key field. Does nothing if the index already exists.
+
+    :param collection: the collection to be indexed
+
+    :return: whether the index exists; False if it could not be built, e.g. as the collection has duplicate keys
+    """
+    try:
+        collection.create_index("key", unique=True, name=KEY_INDEX_NAME)
+        return True
+    except OperationFailure as e:
+        logging.warning(
+            "Could not build a unique key index on %s, run mongodb.KeyIndexMigration to fix it: %s",
+            collection.full_name, e
+        )
+        return False
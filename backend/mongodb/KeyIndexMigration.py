@@ -0,0 +1,161 @@
+"""
+Back-fills the unique key index on every existing project and chat collection.
+
+Collections created before the index was introduced may hold documents with duplicate keys, which prevent the index
+from being built. These are reported, and with --rename-duplicates every duplicate but the oldest is given a free
+numbered key, in the same style as DocumentStore.Collection#update_document_name. The graph database keeps the
+content of documents under their keys, mixing the content of duplicates together, so renamed documents and the
+duplicates they were renamed from are stored again through the graph outbox.
+
+Run from the backend directory with:
+
+    python -m mongodb.KeyIndexMigration [--database Documents --database Chat_History] [--rename-duplicates] [--dry-run]
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Any, Mapping, Optional
+
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from config.config import OUTBOX_ENABLED
+from mongodb.ClientPool import ClientPool
+from mongodb.DocumentStore import DocumentStore
+from mongodb.KeyIndex import KEY_INDEX_NAME, ensure_key_index
+from outbox.GraphOutbox import GraphOutbox
+
+# The database whose documents are stored in the graph database
+DOCUMENTS_DATABASE = "Documents"
+DEFAULT_DATABASES = [DOCUMENTS_DATABASE, "Chat_History"]
+
+
+def find_duplicate_keys(collection: Collection[Mapping[str, Any]]) -> list[Mapping[str, Any]]:
+    """
+    :return: the duplicated keys of the collection, each with the ids of its documents from oldest to newest
+    """
+    return list(collection.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$key", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True))
+
+
+def rename_duplicates(
+    collection: Collection[Mapping[str, Any]], duplicates: list[Mapping[str, Any]],
+    outbox: Optional[GraphOutbox] = None
+) -> int:
+    """
+    Gives every duplicate but the oldest a free numbered key.
+
+    :param outbox: if provided, the outbox the content of each renamed document is recorded to be stored in, under
+        its new key, along with the content of the oldest duplicate, which replaces the mixed content under its key
+    :return: the number of renamed documents
+    """
+    renamed = 0
+    for duplicate in duplicates:
+        key = duplicate["_id"]
+        if not isinstance(key, str):
+            print(f"    cannot rename documents with non-string key {key!r}, ids: {duplicate['ids'][1:]}")
+            continue
+
+        contents = {}
+        if outbox is not None:
+            contents = {
+                document["_id"]: document.get("content", "")
+                for document in collection.find({"_id": {"$in": duplicate["ids"]}}, {"content": 1})
+            }
+            outbox.record_store(key, contents[duplicate["ids"][0]])
+
+        suffix = 0
+        for document_id in duplicate["ids"][1:]:
+            suffix += 1
+            while collection.count_documents({"key": f"{key}_{suffix}"}, limit=1) > 0:
+                suffix += 1
+            new_key = f"{key}_{suffix}"
+            collection.update_one({"_id": document_id}, {"$set": {"key": new_key}})
+            print(f"    renamed {key!r} ({document_id}) to {new_key!r}")
+            if outbox is not None:
+                outbox.record_store(new_key, contents[document_id])
+            renamed += 1
+    return renamed
+
+
+def migrate_collection(
+    collection: Collection[Mapping[str, Any]], rename: bool, dry_run: bool, outbox: Optional[GraphOutbox] = None
+) -> bool:
+    """
+    Builds the key index on a single collection.
+
+    :param outbox: the outbox renamed documents are stored in the graph database through, if they are stored there
+    :return: whether the collection is indexed
+    """
+    if KEY_INDEX_NAME in collection.index_information():
+        print(f"  {collection.name}: already indexed")
+        return True
+
+    duplicates = find_duplicate_keys(collection)
+    if duplicates:
+        print(f"  {collection.name}: {len(duplicates)} duplicated keys")
+        for duplicate in duplicates:
+            print(f"    {duplicate['_id']!r} x{duplicate['count']}")
+        if not rename or dry_run:
+            return False
+        rename_duplicates(collection, duplicates, outbox)
+
+    if dry_run:
+        print(f"  {collection.name}: would be indexed")
+        return True
+
+    indexed = ensure_key_index(collection)
+    print(f"  {collection.name}: {'indexed' if indexed else 'could not be indexed'}")
+    return indexed
+
+
+def migrate_database(
+    database: Database[Mapping[str, Any]], rename: bool, dry_run: bool, outbox: Optional[GraphOutbox] = None
+) -> list[str]:
+    """
+    Builds the key index on every project or chat collection of a database. Internal collections, such as the name
+    counters and the graph outbox, are skipped, as their documents have no key.
+
+    :param outbox: the outbox renamed documents are stored in the graph database through, if they are stored there
+    :return: the names of the collections which are not indexed
+    """
+    failed = []
+    for collection_name in sorted(database.list_collection_names()):
+        if collection_name.startswith("system.") or collection_name.startswith(DocumentStore.INTERNAL_PREFIX):
+            continue
+        if not migrate_collection(database[collection_name], rename, dry_run, outbox):
+            failed.append(collection_name)
+    return failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", action="append", help="database to migrate; may be repeated")
+    parser.add_argument("--rename-duplicates", action="store_true", help="rename duplicate keys so they can be indexed")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without changing anything")
+    args = parser.parse_args()
+
+    client = ClientPool.get_client()
+    failed = []
+    for database_name in args.database or DEFAULT_DATABASES:
+        print(f"{database_name}:")
+        outbox = None
+        if database_name == DOCUMENTS_DATABASE and args.rename_duplicates and not args.dry_run:
+            if OUTBOX_ENABLED:
+                outbox = GraphOutbox(DocumentStore().create_database(database_name))
+            else:
+                print("  the graph outbox is disabled, so renamed documents are not stored again in the graph "
+                      "database; it must be re-indexed once they are renamed")
+        for collection_name in migrate_database(client[database_name], args.rename_duplicates, args.dry_run, outbox):
+            failed.append(f"{database_name}.{collection_name}")
+
+    if failed:
+        print(f"Not indexed: {', '.join(failed)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import time
+from enum import Enum
+from typing import Any, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from mongodb.DocumentStore import DocumentStore
+
+
+class OutboxOperation(str, Enum):
+    STORE = "store"
+    REMOVE = "remove"
+    REKEY = "rekey"
+
+
+class GraphOutbox:
+    """
+    Records the mutations to be made to the graph database in an internal MongoDB collection, so that requests only
+    wait on MongoDB. The recorded mutations are applied in order by the OutboxApplier.
+
+    Each entry is keyed by a sequence number allocated from an atomic counter, so entries recorded by different
+    worker processes are applied in the order they were recorded. A lease, held by one applier at a time, stops two
+    processes from applying the same entries concurrently. Entries which keep failing are moved to a dead-letter
+    collection, so they do not hold up the entries recorded after them.
+    """
+
+    COLLECTION = DocumentStore.INTERNAL_PREFIX + "graph_outbox"
+    STATE_COLLECTION = DocumentStore.INTERNAL_PREFIX + "graph_outbox_state"
+    DEAD_LETTER_COLLECTION = DocumentStore.INTERNAL_PREFIX + "graph_outbox_dead"
+
+    SEQUENCE_ID = "sequence"
+    LEASE_ID = "lease"
+    APPLIED_ID = "applied"
+
+    def __init__(self, database: DocumentStore.Database) -> None:
+        """
+        :param database: the database the outbox collections are kept in
+        """
+        client = database.client()
+        self.__entries = client[self.COLLECTION]
+        self.__state = client[self.STATE_COLLECTION]
+        self.__dead_letters = client[self.DEAD_LETTER_COLLECTION]
+
+    def __record(self, operation: OutboxOperation, fields: dict[str, Any]) -> int:
+        sequence = self.__state.find_one_and_update(
+            {"_id": self.SEQUENCE_ID},
+            {"$inc": {"value": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )["value"]
+        self.__entries.insert_one({
+            "_id": sequence,
+            "operation": operation.value,
+            "created_at": time.time(),
+            "attempts": 0,
+            **fields
+        })
+        return sequence
+
+    def record_store(self, file_id: str, content: str) -> int:
+        """
+        Records that the content of a file is to be stored, replacing any content already stored for the file.
+
+        :param file_id: the id of the file
+        :param content: the content of the file
+        :return: the sequence number of the entry
+        """
+        return self.__record(OutboxOperation.STORE, {"file_id": file_id, "content": content})
+
+    def record_remove(self, file_ids: list[str]) -> int:
+        """
+        Records that the content of the provided files is to be removed.
+
+        :param file_ids: the ids of the files
+        :return: the sequence number of the entry
+        """
+        return self.__record(OutboxOperation.REMOVE, {"file_ids": list(file_ids)})
+
+    def record_rekey(self, rekeys: list[tuple[str, str]]) -> int:
+        """
+        Records that the content of the provided files is to be rekeyed.
+
+        :param rekeys: the (file id, new id) pairs of the files
+        :return: the sequence number of the entry
+        """
+        return self.__record(OutboxOperation.REKEY, {"rekeys": [[file_id, new_id] for file_id, new_id in rekeys]})
+
+    def pending(self, limit: int) -> list[dict[str, Any]]:
+        """
+        :param limit: the maximum number of entries to return
+        :return: the oldest entries yet to be applied, in the order they were recorded
+        """
+        return list(self.__entries.find().sort("_id", 1).limit(limit))
+
+    def complete(self, sequences: list[int]) -> None:
+        """
+        Removes applied entries from the outbox.
+
+        :param sequences: the sequence numbers of the applied entries
+        """
+        if not sequences:
+            return
+        self.__entries.delete_many({"_id": {"$in": sequences}})
+        self.__state.update_one(
+            {"_id": self.APPLIED_ID},
+            {"$inc": {"count": len(sequences)}, "$set": {"last_applied_at": time.time()}},
+            upsert=True
+        )
+
+    def fail(self, sequence: int, error: str) -> int:
+        """
+        Records a failed attempt to apply an entry.
+
+        :param sequence: the sequence number of the entry
+        :param error: a description of the failure
+        :return: the number of failed attempts made to apply the entry so far
+        """
+        entry = self.__entries.find_one_and_update(
+            {"_id": sequence},
+            {"$inc": {"attempts": 1}, "$set": {"last_error": error}},
+            projection={"attempts": True},
+            return_document=ReturnDocument.AFTER
+        )
+        return entry["attempts"] if entry else 0
+
+    def dead_letter(self, sequence: int) -> None:
+        """
+        Moves an entry which cannot be applied out of the outbox, into the dead-letter collection.
+
+        :param sequence: the sequence number of the entry
+        """
+        entry = self.__entries.find_one({"_id": sequence})
+        if entry is None:
+            return
+        # Copied before it is removed, so an interruption between the two leaves the entry in the outbox
+        self.__dead_letters.replace_one({"_id": sequence}, {**entry, "dead_lettered_at": time.time()}, upsert=True)
+        self.__entries.delete_one({"_id": sequence})
+
+    def dead_letters(self, limit: int) -> list[dict[str, Any]]:
+        """
+        :param limit: the maximum number of entries to return
+        :return: the most recently dead-lettered entries, without the content of stored files
+        """
+        return list(self.__dead_letters.find({}, {"content": False}).sort("dead_lettered_at", -1).limit(limit))
+
+    def acquire_lease(self, owner: str, seconds: float) -> bool:
+        """
+        Acquires or renews the lease allowing the owner to apply entries.
+
+        :param owner: a unique id of the applier
+        :param seconds: how long the lease is held for, unless renewed
+        :return: whether the owner holds the lease
+        """
+        now = time.time()
+        try:
+            self.__state.find_one_and_update(
+                {"_id": self.LEASE_ID, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expires_at": now + seconds}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease exists and is held by another applier, so the upsert attempted to insert a second one
+            return False
+        return True
+
+    def release_lease(self, owner: str) -> None:
+        """
+        Releases the lease, if it is held by the owner.
+
+        :param owner: a unique id of the applier
+        """
+        self.__state.update_one({"_id": self.LEASE_ID, "owner": owner}, {"$set": {"expires_at": 0}})
+
+    def get_lag(self) -> dict[str, Any]:
+        """
+        :return: the number of pending entries, the age in seconds of the oldest, the number applied so far, when an
+            entry was last applied and the number of dead-lettered entries
+        """
+        oldest: Optional[dict] = self.__entries.find_one({}, {"created_at": True}, sort=[("_id", 1)])
+        applied = self.__state.find_one({"_id": self.APPLIED_ID}) or {}
+        lease = self.__state.find_one({"_id": self.LEASE_ID}) or {}
+        now = time.time()
+        return {
+            "pending": self.__entries.count_documents({}),
+            "oldest_pending_seconds": now - oldest["created_at"] if oldest else 0.0,
+            "applied": applied.get("count", 0),
+            "last_applied_at": applied.get("last_applied_at"),
+            "dead_lettered": self.__dead_letters.count_documents({}),
+            "leader": lease.get("owner") if lease.get("expires_at", 0) > now else None
+        }
@@ -0,0 +1,213 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from flask import Flask, jsonify
+
+from chat.database_client.database_client import DatabaseClient
+from config.config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_RETRY_DELAY, OUTBOX_MAX_ATTEMPTS
+)
+from outbox.GraphOutbox import GraphOutbox, OutboxOperation
+
+
+class OutboxApplier:
+    """
+    Applies the entries of the graph outbox to the graph database, on a background thread.
+
+    Entries are applied in the order they were recorded, in batches of up to batch_size. Consecutive removals, and
+    consecutive rekeys which do not depend on each other, are combined into a single bulk call. Every operation can be
+    replayed safely: a store first removes anything already stored for the file, and removing or rekeying a file a
+    second time matches nothing. An entry is only removed from the outbox once it has been applied, so entries
+    interrupted by a failure or a restart are retried. An entry which fails max_attempts times is moved to the
+    dead-letter collection, and the entries after it are applied.
+    """
+
+    def __init__(
+        self, outbox: GraphOutbox, database: DatabaseClient,
+        batch_size: int = OUTBOX_BATCH_SIZE, poll_interval: float = OUTBOX_POLL_INTERVAL,
+        lease_seconds: float = OUTBOX_LEASE_SECONDS, max_retry_delay: float = OUTBOX_MAX_RETRY_DELAY,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS
+    ) -> None:
+        """
+        :param outbox: the outbox to apply entries from
+        :param database: the graph database to apply entries to
+        :param batch_size: the maximum number of entries read from the outbox at once
+        :param poll_interval: the number of seconds waited before checking an empty outbox again
+        :param lease_seconds: how long the lease on the outbox is held for between renewals
+        :param max_retry_delay: the maximum number of seconds waited before retrying after a failure
+        :param max_attempts: the number of failed attempts after which an entry is dead-lettered
+        """
+        self.__outbox = outbox
+        self.__database = database
+        self.__batch_size = batch_size
+        self.__poll_interval = poll_interval
+        self.__lease_seconds = lease_seconds
+        self.__max_retry_delay = max_retry_delay
+        self.__max_attempts = max_attempts
+
+        self.__owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.__stop = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+        self.__is_leader = False
+        self.__applied = 0
+        self.__dead_lettered = 0
+        self.__consecutive_failures = 0
+        self.__last_error: Optional[str] = None
+
+    @property
+    def owner(self) -> str:
+        """
+        The id this applier holds the outbox lease under.
+        """
+        return self.__owner
+
+    def start(self) -> threading.Thread:
+        """
+        Starts applying entries on a background thread.
+
+        :return: the applier thread
+        """
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, name="graph-outbox-applier", daemon=True)
+            self.__thread.start()
+        return self.__thread
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stops the background thread, once it has finished the operation it is applying, and releases the lease.
+        """
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+            self.__thread = None
+
+    def __run(self) -> None:
+        while not self.__stop.is_set():
+            delay = self.__poll_interval
+            try:
+                self.__is_leader = self.__outbox.acquire_lease(self.__owner, self.__lease_seconds)
+                if self.__is_leader and self.apply_pending() == self.__batch_size:
+                    # There may be more entries waiting
+                    delay = 0
+                self.__consecutive_failures = 0
+            except Exception as e:
+                self.__consecutive_failures += 1
+                self.__last_error = str(e)
+                delay = min(self.__poll_interval * 2 ** self.__consecutive_failures, self.__max_retry_delay)
+                logging.exception("Failed to apply the graph outbox, retrying in %.1fs", delay)
+            self.__stop.wait(delay)
+
+        try:
+            self.__outbox.release_lease(self.__owner)
+        except Exception:
+            logging.exception("Failed to release the graph outbox lease")
+        self.__is_leader = False
+
+    def apply_pending(self) -> int:
+        """
+        Applies the next batch of entries in the outbox. The caller must hold the lease.
+
+        :return: the number of entries applied or dead-lettered
+        """
+        entries = self.__outbox.pending(self.__batch_size)
+        applied = 0
+        index = 0
+        isolate = False
+        while index < len(entries) and not self.__stop.is_set():
+            run = [entries[index]] if isolate else self.__next_run(entries, index)
+            try:
+                self.__apply(run)
+            except Exception as e:
+                if len(run) > 1:
+                    # Retry the rest of the batch an entry at a time, so the failure is charged to the entry causing it
+                    isolate = True
+                    continue
+                if self.__outbox.fail(run[0]["_id"], str(e)) < self.__max_attempts:
+                    raise
+                logging.error("Dead-lettering graph outbox entry %s after %d attempts: %s",
+                              run[0]["_id"], self.__max_attempts, e)
+                self.__last_error = str(e)
+                self.__outbox.dead_letter(run[0]["_id"])
+                self.__dead_lettered += 1
+            else:
+                self.__outbox.complete([entry["_id"] for entry in run])
+                self.__applied += len(run)
+            applied += len(run)
+            index += len(run)
+
+            # Applying a batch may take longer than the lease, e.g. when it stores many large transcripts
+            if not self.__outbox.acquire_lease(self.__owner, self.__lease_seconds):
+                self.__is_leader = False
+                break
+        return applied
+
+    @staticmethod
+    def __next_run(entries: list[dict[str, Any]], start: int) -> list[dict[str, Any]]:
+        """
+        Returns the entries, from the one at the start index, which can be applied in a single call.
+        """
+        first = entries[start]
+        operation = first["operation"]
+        run = [first]
+        if operation == OutboxOperation.REMOVE:
+            for entry in entries[start + 1:]:
+                if entry["operation"] != operation:
+                    break
+                run.append(entry)
+        elif operation == OutboxOperation.REKEY:
+            # A rekey of a file renamed by an earlier rekey in the run must wait for it to be applied
+            new_ids = {new_id for _, new_id in first["rekeys"]}
+            for entry in entries[start + 1:]:
+                if entry["operation"] != operation or any(file_id in new_ids for file_id, _ in entry["rekeys"]):
+                    break
+                run.append(entry)
+                new_ids.update(new_id for _, new_id in entry["rekeys"])
+        return run
+
+    def __apply(self, run: list[dict[str, Any]]) -> None:
+        operation = run[0]["operation"]
+        if operation == OutboxOperation.STORE:
+            entry = run[0]
+            self.__database.remove_nodes_by_file_ids([entry["file_id"]])
+            self.__database.store_entries(entry["content"], entry["file_id"])
+        elif operation == OutboxOperation.REMOVE:
+            report = self.__database.remove_nodes_by_file_ids([file_id for entry in run for file_id in entry["file_ids"]])
+            logging.info("Removed %s from the graph database", report)
+        elif operation == OutboxOperation.REKEY:
+            self.__database.rekey_nodes([(file_id, new_id) for entry in run for file_id, new_id in entry["rekeys"]])
+        else:
+            logging.warning("Skipping graph outbox entry %s with unknown operation %s", run[0]["_id"], operation)
+
+    def get_status(self) -> dict[str, Any]:
+        """
+        :return: the outbox lag, the most recently dead-lettered entries, and the state of this process's applier
+        """
+        return {
+            **self.__outbox.get_lag(),
+            "dead_letters": [
+                {"sequence": entry.pop("_id"), **entry} for entry in self.__outbox.dead_letters(10)
+            ],
+            "is_leader": self.__is_leader,
+            "applied_by_process": self.__applied,
+            "dead_lettered_by_process": self.__dead_lettered,
+            "consecutive_failures": self.__consecutive_failures,
+            "last_error": self.__last_error,
+            "checked_at": time.time()
+        }
+
+    def register_routes(self, app: Flask) -> None:
+        @app.route('/outbox/status', methods=['GET'])
+        def outbox_status():
+            """
+            Reports how far the graph database lags behind the document store.
+            """
+            try:
+                return jsonify(self.get_status()), 200
+            except Exception as e:
+                return jsonify({"error": str(e)}), 500
@@ -0,0 +1,58 @@
+from typing import Optional
+
+from chat.database_client.database_client import DatabaseClient, RemovalReport
+from outbox.GraphOutbox import GraphOutbox
+
+
+class OutboxDatabaseClient(DatabaseClient):
+    """
+    A database client which records writes in the graph outbox rather than making them, so that the requests making
+    them do not wait on the graph database. Searches are made against the wrapped database directly.
+
+    The writes are applied later by the OutboxApplier, so removals report None rather than the number of nodes removed.
+    """
+
+    def __init__(self, outbox: GraphOutbox, database: DatabaseClient) -> None:
+        """
+        :param outbox: the outbox writes are recorded in
+        :param database: the database searches are made against
+        """
+        self.__outbox = outbox
+        self.__database = database
+
+    def store_entries(self, entries, file_id):
+        """
+        Records that the entries of a file are to be stored, replacing any already stored for the file.
+
+        :param entries: the content of the file
+        :param file_id: the id of the file
+        """
+        self.__outbox.record_store(file_id, entries)
+
+    def replace_entries(self, entries, file_id) -> None:
+        """
+        Records a single entry replacing the entries of a file, as each stored entry replaces those already stored.
+
+        :param entries: the new content of the file
+        :param file_id: the id of the file
+        """
+        self.__outbox.record_store(file_id, entries)
+
+    def search(self, query) -> list:
+        return self.__database.search(query)
+
+    def remove_node_by_file_id(self, file_id) -> Optional[RemovalReport]:
+        self.__outbox.record_remove([file_id])
+        return None
+
+    def remove_nodes_by_file_ids(self, file_ids: list[str]) -> Optional[RemovalReport]:
+        if file_ids:
+            self.__outbox.record_remove(file_ids)
+        return None
+
+    def rekey_node(self, file_id: str, new_id: str) -> None:
+        self.__outbox.record_rekey([(file_id, new_id)])
+
+    def rekey_nodes(self, rekeys: list[tuple[str, str]]) -> None:
+        if rekeys:
+            self.__outbox.record_rekey(rekeys)
@@ -4,5 +4,14 @@ set -e
 
 curl -X POST http://ollama:11434/api/pull -d '{"name": "deepseek-r1:1.5b"}'
 
+if [ "${MODEL_CACHE_WARM:-true}" = "true" ]; then
+    # Fetch and verify the transcription models, so the first upload does not wait on downloads
+    /opt/venv/bin/python upload/whisper-diarization/model_cache.py warm --no-load \
+        || echo "Model cache warm-up failed, models will be fetched when first used"
+fi
+
 echo "Starting backend..."
-exec python app.py
+if [ "${SERVER_MODE:-production}" = "development" ]; then
+    exec python app.py
+fi
+exec gunicorn -c gunicorn.conf.py wsgi:app
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Optional
+
+
+class ComponentState(str, Enum):
+    PENDING = "pending"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+
+@dataclass
+class ComponentStatus:
+    state: ComponentState = ComponentState.PENDING
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class ComponentRegistry:
+    """
+    Lazily constructs the application's components, e.g. database clients and models.
+
+    Components are registered with a factory and built the first time they are needed, either by a request or by the
+    background warm-up thread, which builds them in registration order. Each component is only built once, concurrent
+    callers wait for the in-progress build, and a failed build is retried on the next access.
+    """
+
+    class _Component:
+        def __init__(self, factory: Callable[[], Any]) -> None:
+            self.factory = factory
+            self.instance = None
+            self.status = ComponentStatus()
+            self.lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.__components: dict[str, ComponentRegistry._Component] = {}
+        self.__warm_up_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Registers a component. Components should be registered after the components they depend on.
+
+        :param name: the unique name of the component
+        :param factory: a callable building the component, which may get other components from this registry
+        """
+        if name in self.__components:
+            raise KeyError(f"Component {name} is already registered")
+        self.__components[name] = ComponentRegistry._Component(factory)
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the component with the given name, building it if it has not been built yet.
+
+        :param name: the name of the component
+        :return: the component
+        """
+        component = self.__components[name]
+        if component.status.state == ComponentState.READY:
+            return component.instance
+
+        with component.lock:
+            if component.status.state == ComponentState.READY:
+                return component.instance
+
+            component.status = ComponentStatus(ComponentState.LOADING)
+            start = time.perf_counter()
+            try:
+                instance = component.factory()
+            except Exception as e:
+                component.status = ComponentStatus(ComponentState.FAILED, time.perf_counter() - start, str(e))
+                raise
+
+            component.instance = instance
+            component.status = ComponentStatus(ComponentState.READY, time.perf_counter() - start)
+            logging.info("Loaded component %s in %.2fs", name, component.status.load_seconds)
+            return instance
+
+    def lazy(self, name: str) -> "LazyComponent":
+        """
+        Returns a proxy for the component with the given name, which builds the component when first used.
+
+        :param name: the name of the component
+        :return: the proxy
+        """
+        if name not in self.__components:
+            raise KeyError(f"Component {name} is not registered")
+        return LazyComponent(self, name)
+
+    def warm_up(self) -> None:
+        """
+        Builds every component in registration order. Failures are logged, and the component is retried when it is
+        next accessed.
+        """
+        for name in self.__components:
+            try:
+                self.get(name)
+            except Exception:
+                logging.exception("Failed to load component %s", name)
+
+    def start_warm_up(self) -> threading.Thread:
+        """
+        Builds every component on a background thread, see #warm_up.
+
+        :return: the warm-up thread
+        """
+        if self.__warm_up_thread is None:
+            self.__warm_up_thread = threading.Thread(target=self.warm_up, name="component-warm-up", daemon=True)
+            self.__warm_up_thread.start()
+        return self.__warm_up_thread
+
+    def is_ready(self) -> bool:
+        """
+        :return: whether every component has been built
+        """
+        return all(component.status.state == ComponentState.READY for component in self.__components.values())
+
+    def get_status(self) -> dict[str, dict[str, Any]]:
+        """
+        :return: the state, load duration in seconds and last error of each component
+        """
+        return {
+            name: {
+                "state": component.status.state.value,
+                "load_seconds": component.status.load_seconds,
+                "error": component.status.error
+            }
+            for name, component in self.__components.items()
+        }
+
+
+class LazyComponent:
+    """
+    A stand-in for a registered component, which forwards attribute access to the component, building it on first use.
+    """
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ComponentRegistry, name: str) -> None:
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._registry.get(self._name), item)
+
+    def __repr__(self) -> str:
+        return f"LazyComponent({self._name})"
@@ -1,9 +1,15 @@
 import subprocess
 import os
 import whisper
-import sys
-from upload.video_to_audio import convert_media
-from moviepy import AudioFileClip
+import time
+from pathlib import Path
+from typing import Optional
+from upload.media_decoder import load_media, probe_duration, save_samples
+from upload.TranscriptCache import TranscriptCache, file_sha256
+from upload.UploadStream import decode_text
+from config.config import (
+    TRANSCRIPTION_WORKERS, TRANSCRIPTION_CPU_THREADS, TRANSCRIPTION_STREAMING, TRANSCRIPTION_SPEAKER_ESTIMATION
+)
 
 # whisper-diarization
 class AudioTranscriber:
@@ -15,20 +21,52 @@ class AudioTranscriber:
     :author: Kade Lucy
     """
 
-    def __init__(self):
+    # Models used for short clips and by the diarize process
+    SHORT_CLIP_MODEL = "base"
+    DIARIZE_MODEL = "medium.en"
+    SHORT_CLIP_SECONDS = 10
+
+    def __init__(self, transcript_cache: Optional[TranscriptCache] = None):
         """
         Initialises the transcriber by loading in the 
         OpenAI whisper model to base configuration and
+
+            :param transcript_cache: the cache transcripts are looked up in before transcribing, if any
         """
         # Path to whisper-diarization model
         self.diarize_path = "./upload/whisper-diarization/diarize.py"
-        self.model = whisper.load_model("base")
+        # Processes the audio a window at a time, in memory which does not grow with its length
+        self.diarize_streaming_path = "./upload/whisper-diarization/diarize_streaming.py"
+        self.model = whisper.load_model(self.SHORT_CLIP_MODEL)
+        self.transcript_cache = transcript_cache
+
+    def pipeline_options(self, num_speakers: Optional[int] = None) -> dict:
+        """
+        :param num_speakers: the number of speakers the diarize process is told of, if any
+        :return: the options which affect the transcript, part of its cache key
+        """
+        return {
+            "num_speakers": num_speakers,
+            "short_clip_model": self.SHORT_CLIP_MODEL,
+            "short_clip_seconds": self.SHORT_CLIP_SECONDS,
+            "batch_size": 2,
+            "stemming": False,
+            # Recordings estimated to have a single speaker skip diarization; only diarize.py makes the estimate
+            "speaker_estimation": TRANSCRIPTION_SPEAKER_ESTIMATION and not TRANSCRIPTION_STREAMING,
+            # Windows transcribed in parallel are stitched together, which may differ slightly from a single pass
+            "chunked": TRANSCRIPTION_WORKERS > 1,
+            # Speakers are clustered from embeddings of each window, rather than found by MSDD
+            "streaming": TRANSCRIPTION_STREAMING
+        }
 
-    def transcribe(self, audio_filepath: str):
+    def transcribe(self, audio_filepath: str, audio_sha256: Optional[str] = None, num_speakers: Optional[int] = None):
         """
         Transcribes the audio located at the provided filepath into text using the OpenAI-whisper model.
+        Recordings which have been transcribed before are returned from the transcript cache.
 
             :param audio_filepath: the filepath of the audio file to be transcribed
+            :param audio_sha256: the SHA-256 of the file's contents, if already known; otherwise it is hashed
+            :param num_speakers: the number of speakers, if known; a single speaker skips diarization
 
             :return str: the transcribed text
         """
@@ -36,30 +74,101 @@ class AudioTranscriber:
         # Validate file types (.txt or audio/video formats only)
         if audio_filepath.endswith(".txt"):
             # Return contents of text file
-            transcript = open(audio_filepath)
-            return transcript.read()
-        # Convert audio file to mp3
-        filepath_mp3 = convert_media(audio_filepath)
+            with open(audio_filepath, "rb") as transcript:
+                return decode_text(transcript.read())
+
+        if self.transcript_cache is None:
+            return self.__transcribe_media(audio_filepath, num_speakers)["text"]
+
+        key = TranscriptCache.key(
+            audio_sha256 or file_sha256(audio_filepath), self.DIARIZE_MODEL, self.pipeline_options(num_speakers)
+        )
+        transcript = self.transcript_cache.get(key)
+        if transcript is not None:
+            return transcript["text"]
+
+        start = time.perf_counter()
+        transcript = self.__transcribe_media(audio_filepath, num_speakers)
+        self.transcript_cache.put(key, transcript, time.perf_counter() - start, transcript["duration"])
+        return transcript["text"]
+
+    def __transcribe_media(self, audio_filepath: str, num_speakers: Optional[int] = None) -> dict:
+        """
+        Transcribes an audio or video file.
+
+            :param audio_filepath: the filepath of the audio or video file
+            :param num_speakers: the number of speakers, if known
+
+            :return dict: the transcribed text, the model used and the duration of the audio
+        """
+        if TRANSCRIPTION_STREAMING:
+            # The streaming diarize process reads the media through ffmpeg a window at a time, so it is not decoded
+            # here; only recordings of unknown length are decoded, to check whether they are short clips
+            duration = probe_duration(audio_filepath)
+            if duration is not None and duration >= self.SHORT_CLIP_SECONDS:
+                text = self.__diarize(audio_filepath, [self.diarize_streaming_path], num_speakers)
+                return {"text": text, "model": self.DIARIZE_MODEL, "duration": duration}
+
+        # Decode the audio or video once, straight to 16 kHz mono samples
+        audio = load_media(audio_filepath)
 
         # Use default whisper for short clips (Less than 10 seconds)
-        if (AudioFileClip(filepath_mp3).duration < 10):
-            audio = whisper.load_audio(filepath_mp3)
-            result = whisper.transcribe(model = self.model, audio = audio)
+        if (audio.duration < self.SHORT_CLIP_SECONDS):
+            result = whisper.transcribe(model = self.model, audio = audio.samples)
 
-            return result["text"]
+            return {"text": result["text"], "model": self.SHORT_CLIP_MODEL, "duration": audio.duration}
         
+        # Pass the decoded samples to the diarize process, so it does not decode the file again
+        filepath_samples = save_samples(audio, audio_filepath)
+
+        if TRANSCRIPTION_STREAMING:
+            diarize_args = [self.diarize_streaming_path]
+        else:
+            diarize_args = [
+                self.diarize_path,
+                # Long recordings are split at silences and transcribed by parallel workers
+                "--workers", str(TRANSCRIPTION_WORKERS),
+                "--no-stem" # Reduces load on docker to avoid crashing 
+            ]
+            if TRANSCRIPTION_SPEAKER_ESTIMATION:
+                # Single-speaker recordings, such as lectures, skip diarization when their number of speakers is unknown
+                diarize_args.append("--speaker-estimation")
+
+        try:
+            text = self.__diarize(str(filepath_samples), diarize_args, num_speakers)
+        finally:
+            os.remove(filepath_samples)
+
+        return {"text": text, "model": self.DIARIZE_MODEL, "duration": audio.duration}
+
+    def __diarize(self, input_filepath: str, diarize_args: list, num_speakers: Optional[int] = None) -> str:
+        """
+        Runs a diarize process on an audio file, or on samples saved by #save_samples.
+
+            :param input_filepath: the filepath passed to the diarize process
+            :param diarize_args: the diarize script, followed by its options
+            :param num_speakers: the number of speakers, if known
+
+            :return str: the transcribed text
+        """
+        # Otherwise the number of speakers is estimated by the diarize process
+        speaker_args = ["--num-speakers", str(num_speakers)] if num_speakers else []
+
         # Run diarize process as subprocess
         subprocess.run(
             ['/opt/venv/bin/python', 
-             self.diarize_path, 
-             '-a', audio_filepath,
+             *diarize_args,
+             '-a', input_filepath,
+             "--whisper-model", self.DIARIZE_MODEL,
              "--batch-size", '2',
-             "--no-stem"]) # Reduces load on docker to avoid crashing 
+             "--cpu-threads", str(TRANSCRIPTION_CPU_THREADS),
+             *speaker_args])
         
         # Retrieve text file transcription
-        filepath_txt = filepath_mp3.with_suffix(".txt")
-        filepath_srt = filepath_mp3.with_suffix(".srt")
-        transcript = open(filepath_txt)
+        filepath_txt = Path(input_filepath).with_suffix(".txt")
+        filepath_srt = Path(input_filepath).with_suffix(".srt")
+        with open(filepath_txt) as transcript:
+            text = transcript.read()
 
         # Delete created transcripts (.txt and .srt file)
         if os.path.exists(filepath_txt):
@@ -74,7 +183,7 @@ class AudioTranscriber:
             except OSError as e:
                 print(f'Error: {filepath_srt}: {e.strerror}')
 
-        return transcript.read()
+        return text
  
 if __name__ == "__main__":
     transcriber = AudioTranscriber()
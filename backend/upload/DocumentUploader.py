@@ -1,11 +1,15 @@
 import os
 from dataclasses import dataclass
 from flask import Flask, request, jsonify
-from typing import Any, Optional
+from typing import Any, Optional, TYPE_CHECKING
 
 from chat.database_client.database_client import DatabaseClient
 from mongodb.DocumentStore import DocumentStore
-from upload.AudioTranscriber import AudioTranscriber
+from upload.UploadStream import UploadError, UploadStream, UploadedFile, remove_staged
+
+if TYPE_CHECKING:
+    # Not imported at runtime, as it loads whisper
+    from upload.AudioTranscriber import AudioTranscriber
 
 
 @dataclass
@@ -17,10 +21,19 @@ class FilePathInfo:
 class DocumentUploader:
   
     def __init__(
-        self, mongo_database: DocumentStore.Database, database: DatabaseClient
+        self, mongo_database: DocumentStore.Database, database: DatabaseClient,
+        audio_transcriber: "AudioTranscriber", upload_stream: Optional[UploadStream] = None
     ) -> None:
+        """
+        :param mongo_database: Mongodb database storing the transcripts
+        :param database: database the transcripts are indexed in
+        :param audio_transcriber: transcriber shared by all uploads, so the whisper model is only loaded once
+        :param upload_stream: receives the uploaded files; defaults to the configured limits
+        """
         self.__mongo_database = mongo_database
         self.__database = database
+        self.__audio_transcriber = audio_transcriber
+        self.__upload_stream = upload_stream or UploadStream()
 
     def register_routes(self, app: Flask) -> None:
         @app.route('/upload', methods=['POST'])
@@ -31,26 +44,57 @@ class DocumentUploader:
 
             :return: Whether was a success or if there was an error.
             """
-            uploaded_files = request.files.getlist("files[]")
-
-            collection_name = request.form.get("project")
-            collection = self.__mongo_database.get_collection(collection_name)
-
-            if not uploaded_files:
-                return jsonify({"error": "No file uploaded"}), 400
+            # The body is read in chunks, with each file written to disk as it arrives
+            try:
+                form, uploaded_files = self.__upload_stream.receive(
+                    request.stream, request.content_type, request.content_length
+                )
+            except UploadError as e:
+                print("Error during file upload:", e)
+                return jsonify({"error": str(e)}), e.status
+
+            try:
+                return self.__upload_files(form, uploaded_files)
+            finally:
+                # Files which were not moved to their destination, e.g. after an error
+                remove_staged(uploaded_files)
+
+    def __upload_files(self, form: dict[str, str], uploaded_files: list[UploadedFile]) -> tuple[Any, int]:
+        collection_name = form.get("project")
+        collection = self.__mongo_database.get_collection(collection_name)
+
+        if not uploaded_files:
+            return jsonify({"error": "No file uploaded"}), 400
+
+        # The number of speakers, if known, e.g. 1 for a lecture, which skips diarization
+        num_speakers = form.get("num_speakers") or None
+        if num_speakers is not None:
+            if not num_speakers.isdigit() or int(num_speakers) < 1:
+                return jsonify({"error": "num_speakers must be a positive integer"}), 400
+            num_speakers = int(num_speakers)
+
+        folder_mapping = {}
+        file_path_infos = []
+        for file in uploaded_files:
+            fpi, err = self.__filepath_and_filename(collection, file, folder_mapping)
+            if not fpi:
+                print("Error during file upload:", err)
+                return jsonify({"error": str(err)}), 500
+            file_path_infos.append(fpi)
 
-            folder_mapping = {}
-            for file in uploaded_files:
-                fpi, err = self.__filepath_and_filename(collection, file, folder_mapping)
-                if not fpi:
-                    print("Error during file upload:", err)
-                    return jsonify({"error": str(err)}), 500
-
-                result, err = self.__save_file(collection, file, fpi)
-                if not result:
-                    print("Error during file upload:", err)
-                    return jsonify({"error": str(err)}), 500
-            return jsonify({"status": "ok"}), 200
+        try:
+            # Names are allocated for the whole upload at once, rather than with queries for each file
+            document_names = collection.allocate_document_names([fpi.filename for fpi in file_path_infos])
+        except Exception as e:
+            print("Error during file upload:", e)
+            return jsonify({"error": str(e)}), 500
+
+        for file, fpi, document_name in zip(uploaded_files, file_path_infos, document_names):
+            result, err = self.__save_file(collection, file, fpi, document_name, num_speakers)
+            if not result:
+                print("Error during file upload:", err)
+                return jsonify({"error": str(err)}), 500
+        return jsonify({"status": "ok"}), 200
 
     @staticmethod
     def __filepath_and_filename(collection: DocumentStore.Collection, file, folder_mapping) -> tuple[Optional[FilePathInfo], Optional[Exception]]:
@@ -75,12 +119,20 @@ class DocumentUploader:
         except Exception as e:
             return None, e
 
-    def __save_file(self, collection: DocumentStore.Collection, file, fpi: FilePathInfo):
+    def __save_file(
+        self,
+        collection: DocumentStore.Collection,
+        file: UploadedFile,
+        fpi: FilePathInfo,
+        document_name: str,
+        num_speakers: Optional[int] = None
+    ):
         try:
             os.makedirs(os.path.dirname(fpi.filepath), exist_ok=True)
-            file.save(fpi.filepath)
+            # Staged alongside the uploads, so this is a rename rather than a copy
+            os.replace(file.path, fpi.filepath)
 
-            self.__process_file(collection, fpi.filepath, fpi.filename)
+            self.__process_file(collection, fpi.filepath, document_name, file.sha256, num_speakers)
 
             return True, None
 
@@ -89,15 +141,17 @@ class DocumentUploader:
             # return jsonify({"error": str(e)}), 500
             return False, e
 
-    def __process_file(self, collection: DocumentStore.Collection, path: str, name: str):
+    def __process_file(
+        self, collection: DocumentStore.Collection, path: str, name: str, sha256: str, num_speakers: Optional[int] = None
+    ):
         """
         Accepts a file path as an input to be sent to the transcriber.
 
+        :param sha256: the SHA-256 of the file's contents, computed as it was uploaded
+        :param num_speakers: the number of speakers in the recording, if known
         :return: TEMPORARY, outputs the file length, the mp3 won't need to be saved in the future.
         """
-        audio_transcriber = AudioTranscriber()
-        transcribed_text = audio_transcriber.transcribe(path)
-        name = collection.update_document_name(name)
+        transcribed_text = self.__audio_transcriber.transcribe(path, sha256, num_speakers)
         collection.add_document(name, transcribed_text)
         self.__database.store_entries(transcribed_text, name)
         return jsonify({"status": "ok"}), 200
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the stats are only locked between the threads of a process
+    fcntl = None
+
+from config.config import TRANSCRIPT_CACHE_DIR, TRANSCRIPT_CACHE_MAX_BYTES
+
+# The number of bytes read at a time when hashing a file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    Hashes the contents of a file, reading it in chunks so large recordings are not held in memory.
+
+    :param file_path: the path of the file
+    :return: the hex SHA-256 digest of the file's contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    A content-addressed, on-disk cache of transcripts, so that uploading the same recording again, e.g. to another
+    project or after a failed upload, does not run the transcription pipeline again.
+
+    Transcripts are keyed on the SHA-256 of the audio file's contents, the model name and the pipeline options, and
+    stored as one JSON file each. Reading a transcript touches its file, and once the cache exceeds its size bound the
+    least recently used transcripts are evicted. The number of hits and the transcription time they saved are kept
+    alongside the transcripts, so they are shared by every process using the cache directory; updates to them are
+    serialised between processes by a lock on a file beside them.
+    """
+
+    STATS_FILE = "stats.json"
+    STATS_LOCK_FILE = "stats.lock"
+
+    def __init__(self, directory: str = TRANSCRIPT_CACHE_DIR, max_bytes: int = TRANSCRIPT_CACHE_MAX_BYTES) -> None:
+        """
+        :param directory: the directory the transcripts are stored in, created if it does not exist
+        :param max_bytes: the maximum total size of the stored transcripts
+        """
+        self.__directory = directory
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(audio_sha256: str, model_name: str, options: Optional[dict[str, Any]] = None) -> str:
+        """
+        Derives the cache key of a transcript.
+
+        :param audio_sha256: the hex SHA-256 digest of the audio file's contents, see #file_sha256
+        :param model_name: the name of the transcription model
+        :param options: the pipeline options which affect the transcript
+        :return: the cache key
+        """
+        identity = json.dumps([audio_sha256, model_name, options or {}], sort_keys=True)
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.__directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        """
+        Retrieves a cached transcript, marking it as recently used.
+
+        :param key: the cache key, see #key
+        :return: the transcript, or None if it is not cached
+        """
+        path = self.__path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing, evicted by another process, or partially written
+            self.__record(misses=1)
+            return None
+
+        self.__record(
+            hits=1,
+            seconds_saved=entry.get("transcribe_seconds", 0.0),
+            audio_seconds_saved=entry.get("audio_duration") or 0.0
+        )
+        return entry["transcript"]
+
+    def put(
+        self, key: str, transcript: dict[str, Any], transcribe_seconds: float, audio_duration: Optional[float] = None
+    ) -> None:
+        """
+        Stores a transcript, evicting the least recently used transcripts if the cache exceeds its size bound.
+
+        :param key: the cache key, see #key
+        :param transcript: the structured transcript, which must be serialisable as JSON
+        :param transcribe_seconds: the time taken to produce the transcript, saved by each later hit
+        :param audio_duration: the duration of the transcribed audio in seconds
+        """
+        entry = {
+            "transcript": transcript,
+            "transcribe_seconds": transcribe_seconds,
+            "audio_duration": audio_duration,
+            "created_at": time.time()
+        }
+
+        # Written to a temporary file and renamed, so readers never see a partial transcript
+        path = self.__path(key)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(temporary_path, path)
+
+        self.__evict()
+
+    def __entries(self) -> list[os.DirEntry]:
+        return [
+            entry for entry in os.scandir(self.__directory)
+            if entry.is_file() and entry.name.endswith(".json") and entry.name != self.STATS_FILE
+        ]
+
+    def __evict(self) -> None:
+        with self.__lock:
+            entries = []
+            total_bytes = 0
+            for entry in self.__entries():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+            evicted = 0
+            # Oldest first, as reads touch the modification time
+            for _, size, path in sorted(entries):
+                if total_bytes <= self.__max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_bytes -= size
+                evicted += 1
+
+        if evicted:
+            self.__record(evictions=evicted)
+
+    def __read_stats(self) -> dict[str, float]:
+        stats = {"hits": 0, "misses": 0, "evictions": 0, "seconds_saved": 0.0, "audio_seconds_saved": 0.0}
+        try:
+            with open(os.path.join(self.__directory, self.STATS_FILE), encoding="utf-8") as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return stats
+
+    @contextmanager
+    def __stats_locked(self) -> Iterator[None]:
+        """
+        Holds the stats lock, shared by the threads of this process and, through the lock file, by other processes.
+        """
+        with self.__lock, open(os.path.join(self.__directory, self.STATS_LOCK_FILE), "a") as lock_file:
+            if fcntl is not None:
+                # Released when the lock file is closed
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def __record(self, **increments: float) -> None:
+        with self.__stats_locked():
+            stats = self.__read_stats()
+            for name, increment in increments.items():
+                stats[name] += increment
+
+            path = os.path.join(self.__directory, self.STATS_FILE)
+            temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as f:
+                json.dump(stats, f)
+            os.replace(temporary_path, path)
+
+    def get_report(self) -> dict[str, Any]:
+        """
+        :return: the number of hits, misses and evictions, the hit rate, the transcription time saved by hits and the
+            duration of the audio they did not transcribe again, and the number and total size of the stored
+            transcripts
+        """
+        with self.__lock:
+            stats = self.__read_stats()
+            sizes = []
+            for entry in self.__entries():
+                try:
+                    sizes.append(entry.stat().st_size)
+                except FileNotFoundError:
+                    pass
+
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.__max_bytes
+        }
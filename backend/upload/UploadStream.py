@@ -0,0 +1,297 @@
+import codecs
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from config.config import (
+    UPLOAD_CHUNK_SIZE, UPLOAD_MAX_FILE_BYTES, UPLOAD_MAX_FILES, UPLOAD_MAX_FORM_BYTES, UPLOAD_MAX_TOTAL_BYTES,
+    UPLOAD_STAGING_DIR
+)
+
+# The number of leading bytes of each file its type is sniffed from
+SNIFF_BYTES = 4096
+
+# The byte order marks text may start with, and the encodings they mark. UTF-32 is checked before UTF-16, as the
+# UTF-32 LE mark starts with the UTF-16 LE one.
+TEXT_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def text_encoding(head: bytes, bom_only: bool = False) -> Optional[str]:
+    """
+    Identifies the encoding of a text file from its leading bytes: the one marked by its byte order mark if it has one,
+    else UTF-8 if it decodes as such, else Latin-1, which decodes any legacy 8-bit text.
+
+    :param head: the first bytes of the file, see SNIFF_BYTES
+    :param bom_only: whether only text starting with a byte order mark is identified
+    :return: the encoding, or None if the file is not text, as it contains NUL bytes without a byte order mark
+    """
+    for bom, encoding in TEXT_BOMS:
+        if head.startswith(bom):
+            return encoding
+    if bom_only or b"\x00" in head:
+        return None
+    try:
+        # Not final, as the head may end part way through a character
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def decode_text(data: bytes) -> str:
+    """
+    Decodes the contents of an uploaded text file, in the encoding identified by #text_encoding. Characters which
+    are not valid in that encoding are replaced, rather than failing the upload.
+
+    :param data: the contents of the file
+    :return: the decoded text
+    """
+    return data.decode(text_encoding(data[:SNIFF_BYTES]) or "utf-8", errors="replace")
+
+
+def sniff_mime_type(head: bytes) -> str:
+    """
+    Identifies the type of a file from its leading bytes, rather than its name or the type sent by the client.
+
+    :param head: the first bytes of the file, see SNIFF_BYTES
+    :return: the MIME type, or application/octet-stream if it is not a recognised audio, video or text format
+    """
+    # Checked first, as the UTF-16 LE mark would otherwise be taken for an MPEG audio frame
+    if text_encoding(head, bom_only=True) is not None:
+        return "text/plain"
+    if head.startswith(b"ID3"):
+        return "audio/mpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "video/x-msvideo"
+    if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+        return "audio/aiff"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head.startswith(b"#!AMR"):
+        return "audio/amr"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm" if b"webm" in head[:64] else "video/x-matroska"
+    if head.startswith(b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"):
+        return "video/x-ms-asf"
+    if head[4:8] == b"ftyp":
+        # MP4 family: the major brand distinguishes audio-only files
+        return "audio/mp4" if head[8:11] == b"M4A" else "video/mp4"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # An MPEG audio frame, or an AAC ADTS frame when the layer bits are zero
+        return "audio/aac" if head[1] & 0x06 == 0 else "audio/mpeg"
+
+    if text_encoding(head) is not None:
+        return "text/plain"
+    return "application/octet-stream"
+
+
+class UploadError(Exception):
+    """
+    An upload which was rejected, with the HTTP status it is reported with.
+    """
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class UploadedFile:
+    """
+    A file received in an upload, staged on disk until it is moved to its destination.
+    """
+    filename: str
+    path: str
+    size: int
+    sha256: str
+    mime_type: str
+
+
+class UploadStream:
+    """
+    Receives multipart/form-data uploads by reading the request body in fixed-size chunks, rather than letting
+    Werkzeug spool the whole body before it is copied to its destination. Each file is written straight to a staging
+    file, next to the upload directory so it can be moved rather than copied, while its SHA-256 is computed and its
+    type sniffed from its leading bytes. Memory use is bounded by the chunk size, however large the upload.
+    """
+
+    def __init__(
+        self, staging_dir: str = UPLOAD_STAGING_DIR, chunk_size: int = UPLOAD_CHUNK_SIZE,
+        max_file_bytes: int = UPLOAD_MAX_FILE_BYTES, max_total_bytes: int = UPLOAD_MAX_TOTAL_BYTES,
+        max_files: int = UPLOAD_MAX_FILES, max_form_bytes: int = UPLOAD_MAX_FORM_BYTES
+    ) -> None:
+        """
+        :param staging_dir: the directory files are written to as they are received
+        :param chunk_size: the number of bytes read from the request at a time
+        :param max_file_bytes: the maximum size of each file
+        :param max_total_bytes: the maximum size of the request body
+        :param max_files: the maximum number of files in an upload
+        :param max_form_bytes: the maximum size of each form field other than the files
+        """
+        self.__staging_dir = staging_dir
+        self.__chunk_size = chunk_size
+        self.__max_file_bytes = max_file_bytes
+        self.__max_total_bytes = max_total_bytes
+        self.__max_files = max_files
+        self.__max_form_bytes = max_form_bytes
+
+    def receive(
+        self, stream: BinaryIO, content_type: Optional[str], content_length: Optional[int], file_field: str = "files[]"
+    ) -> tuple[dict[str, str], list[UploadedFile]]:
+        """
+        Reads a multipart/form-data request body, staging its files on disk. If the upload is rejected, the files
+        staged so far are removed.
+
+        :param stream: the request body
+        :param content_type: the request's Content-Type header
+        :param content_length: the request's Content-Length header, if sent
+        :param file_field: the name of the field the files are sent in
+        :return: the other form fields, and the staged files, which the caller must move or remove
+        :raises UploadError: if the request is not a multipart upload, exceeds a limit, or holds a file which is not
+            audio, video or text
+        """
+        mimetype, options = parse_options_header(content_type or "")
+        boundary = options.get("boundary")
+        if mimetype != "multipart/form-data" or not boundary:
+            raise UploadError("Expected a multipart/form-data upload")
+        if content_length is not None and content_length > self.__max_total_bytes:
+            raise UploadError(f"Upload exceeds the limit of {self.__max_total_bytes} bytes", 413)
+
+        os.makedirs(self.__staging_dir, exist_ok=True)
+        files: list[UploadedFile] = []
+        try:
+            form = self.__receive_parts(stream, boundary.encode("latin-1"), file_field, files)
+        except BaseException:
+            remove_staged(files)
+            raise
+        return form, files
+
+    def __receive_parts(
+        self, stream: BinaryIO, boundary: bytes, file_field: str, files: list[UploadedFile]
+    ) -> dict[str, str]:
+        # The decoder's own size limit is not used, as it bounds its buffer rather than each field
+        decoder = MultipartDecoder(boundary, max_parts=self.__max_files + 100)
+        form: dict[str, str] = {}
+        field: Optional[str] = None
+        field_value = bytearray()
+        staged: Optional[_StagedFile] = None
+        received = 0
+
+        try:
+            while True:
+                chunk = stream.read(self.__chunk_size)
+                received += len(chunk)
+                if received > self.__max_total_bytes:
+                    raise UploadError(f"Upload exceeds the limit of {self.__max_total_bytes} bytes", 413)
+
+                # An empty read marks the end of the body
+                decoder.receive_data(chunk or None)
+                event = decoder.next_event()
+                while not isinstance(event, (NeedData, Epilogue)):
+                    if isinstance(event, File):
+                        if event.name != file_field:
+                            raise UploadError(f"Unexpected file field {event.name}")
+                        if len(files) >= self.__max_files:
+                            raise UploadError(f"Upload exceeds the limit of {self.__max_files} files", 413)
+                        staged = _StagedFile(self.__staging_dir, event.filename or "")
+                        files.append(staged.file)
+                    elif isinstance(event, Field):
+                        field = event.name
+                        field_value.clear()
+                    elif isinstance(event, Data) and staged is not None:
+                        staged.write(event.data, self.__max_file_bytes)
+                        if not event.more_data:
+                            staged.close()
+                            staged = None
+                    elif isinstance(event, Data):
+                        field_value.extend(event.data)
+                        if len(field_value) > self.__max_form_bytes:
+                            raise UploadError(f"{field} exceeds the limit of {self.__max_form_bytes} bytes", 413)
+                        if not event.more_data:
+                            form[field] = field_value.decode("utf-8", errors="replace")
+                    event = decoder.next_event()
+
+                if isinstance(event, Epilogue):
+                    return form
+        except RequestEntityTooLarge:
+            # Raised by the decoder when the body has more parts than max_parts
+            raise UploadError("Upload has too many parts", 413)
+        except ValueError as e:
+            # Raised by the decoder for a malformed or truncated body
+            raise UploadError(f"Malformed upload: {e}")
+        finally:
+            if staged is not None:
+                staged.abort()
+
+
+class _StagedFile:
+    """
+    A file being written to the staging directory, hashed and sniffed as it is written.
+    """
+
+    def __init__(self, staging_dir: str, filename: str) -> None:
+        path = os.path.join(staging_dir, uuid.uuid4().hex)
+        self.file = UploadedFile(filename, path, 0, "", "")
+        self.__handle = open(path, "wb", buffering=0)
+        self.__digest = hashlib.sha256()
+        self.__head = bytearray()
+
+    def write(self, data: bytes, max_bytes: int) -> None:
+        self.file.size += len(data)
+        if self.file.size > max_bytes:
+            raise UploadError(f"{self.file.filename} exceeds the limit of {max_bytes} bytes", 413)
+
+        if len(self.__head) < SNIFF_BYTES:
+            self.__head.extend(data[:SNIFF_BYTES - len(self.__head)])
+            if len(self.__head) == SNIFF_BYTES:
+                self.__check_type()
+
+        self.__digest.update(data)
+        self.__handle.write(data)
+
+    def close(self) -> None:
+        self.__handle.close()
+        if len(self.__head) < SNIFF_BYTES:
+            # Smaller than the sniffed head, so not checked while it was written
+            self.__check_type()
+        self.file.sha256 = self.__digest.hexdigest()
+
+    def abort(self) -> None:
+        self.__handle.close()
+
+    def __check_type(self) -> None:
+        mime_type = sniff_mime_type(bytes(self.__head))
+        # The transcriber reads .txt files as text, and decodes anything else as media
+        is_text = self.file.filename.lower().endswith(".txt")
+        if mime_type == "application/octet-stream" or is_text != (mime_type == "text/plain"):
+            raise UploadError(f"{self.file.filename} is not an audio, video or text file", 415)
+        self.file.mime_type = mime_type
+
+
+def remove_staged(files: list[UploadedFile]) -> None:
+    """
+    Removes the staging files of an upload which have not been moved to their destination.
+
+    :param files: the staged files
+    """
+    for file in files:
+        try:
+            os.remove(file.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,96 @@
+import os
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+# The sample rate expected by whisper, faster-whisper and the NeMo diarization models
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class DecodedAudio:
+    """
+    The audio track of a media file, as 16 kHz mono float32 samples in the range [-1, 1].
+    """
+    samples: np.ndarray
+    sample_rate: int
+    duration: float
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """
+    Reads the duration of a media file from its container metadata, without decoding it.
+
+    :param file_path: the path of the media file
+    :return: the duration in seconds, or None if the container does not record it or ffprobe is unavailable
+    """
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1",
+             file_path],
+            capture_output=True, text=True
+        )
+    except FileNotFoundError:
+        # ffprobe is not installed
+        return None
+
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def decode_audio(file_path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decodes the audio track of any audio or video file ffmpeg can read, in a single pass, resampling it and mixing
+    it down to mono.
+
+    :param file_path: the path of the media file
+    :param sample_rate: the sample rate to resample to
+    :return: the float32 samples
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-threads", "0", "-i", file_path,
+         "-vn", "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        capture_output=True
+    )
+    if result.returncode != 0:
+        raise ValueError(f"Could not decode the audio of {os.path.basename(file_path)}: "
+                         f"{result.stderr.decode(errors='replace').strip()}")
+
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    if samples.size == 0:
+        raise ValueError("The media has no audio track.")
+    return samples
+
+
+def load_media(file_path: str, sample_rate: int = SAMPLE_RATE) -> DecodedAudio:
+    """
+    Decodes the audio track of a media file, see #decode_audio, along with its duration. The duration is read from
+    the container metadata, falling back to the number of decoded samples.
+
+    :param file_path: the path of the media file
+    :param sample_rate: the sample rate to resample to
+    :return: the decoded audio
+    """
+    samples = decode_audio(file_path, sample_rate)
+    duration = probe_duration(file_path)
+    if duration is None:
+        duration = len(samples) / sample_rate
+    return DecodedAudio(samples, sample_rate, duration)
+
+
+def save_samples(audio: DecodedAudio, file_path: str) -> Path:
+    """
+    Saves decoded samples as a .npy file, so another process can load them without decoding the media again.
+
+    :param audio: the decoded audio
+    :param file_path: the path of the media file the samples were decoded from
+    :return: the path of the saved samples, alongside the media file
+    """
+    samples_path = Path(file_path).with_suffix(".npy")
+    np.save(samples_path, audio.samples)
+    return samples_path
@@ -0,0 +1,265 @@
+"""
+Long-audio transcription across a pool of worker processes.
+
+The waveform is split at silences found by voice activity detection into windows,
+each extended by an overlap on both sides so that words cut at a window boundary are
+heard whole by one of the neighbouring windows. The windows are transcribed in
+parallel, each worker holding its own faster-whisper model, and the words are stitched
+back together by keeping, from each window, only the words whose midpoint falls within
+the window's core region, i.e. the window without its overlaps.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class Window:
+    index: int
+    # The samples transcribed, including the overlaps
+    start: int
+    end: int
+    # The samples whose words are kept
+    core_start: int
+    core_end: int
+
+
+@dataclass
+class ChunkedTranscript:
+    text: str
+    language: str
+    words: list = field(default_factory=list)
+    windows: int = 0
+
+
+def find_speech(audio: np.ndarray, min_silence_ms: int = 500) -> list[dict]:
+    """
+    Finds the speech in the waveform with the Silero VAD model bundled with faster-whisper.
+
+    :return: the start and end sample of each speech segment
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    return get_speech_timestamps(
+        audio, VadOptions(min_silence_duration_ms=min_silence_ms)
+    )
+
+
+def plan_windows(
+    speech: list[dict],
+    total_samples: int,
+    window_seconds: float = 60.0,
+    overlap_seconds: float = 2.0,
+    sample_rate: int = SAMPLE_RATE,
+) -> list[Window]:
+    """
+    Splits the waveform into windows of at most window_seconds, cutting in the middle of
+    the latest silence in the second half of each window. Windows without such a
+    silence are cut at their full length, and rely on the overlap.
+    """
+    window = int(window_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    cuts = [
+        (previous["end"] + following["start"]) // 2
+        for previous, following in zip(speech, speech[1:])
+    ]
+
+    windows = []
+    core_start = 0
+    while core_start < total_samples:
+        core_end = core_start + window
+        if core_end >= total_samples:
+            core_end = total_samples
+        else:
+            candidates = [cut for cut in cuts if core_start + window // 2 <= cut <= core_end]
+            if candidates:
+                core_end = candidates[-1]
+
+        windows.append(
+            Window(
+                index=len(windows),
+                start=max(0, core_start - overlap),
+                end=min(total_samples, core_end + overlap),
+                core_start=core_start,
+                core_end=core_end,
+            )
+        )
+        core_start = core_end
+    return windows
+
+
+def stitch_words(
+    windows: list[Window],
+    window_words: list[list[dict]],
+    sample_rate: int = SAMPLE_RATE,
+) -> list[dict]:
+    """
+    Joins the words of each window, with timestamps already offset to the start of the
+    waveform, keeping each word only from the window whose core region holds its
+    midpoint.
+    """
+    words = []
+    for window, candidates in zip(windows, window_words):
+        core_start = window.core_start / sample_rate
+        core_end = window.core_end / sample_rate
+        for word in candidates:
+            midpoint = (word["start"] + word["end"]) / 2
+            if core_start <= midpoint < core_end:
+                words.append(word)
+    return words
+
+
+_worker_model = None
+_worker_suppress_tokens = [-1]
+
+
+def _init_worker(model_name, device, compute_type, cpu_threads, suppress_numerals):
+    global _worker_model, _worker_suppress_tokens
+    import faster_whisper
+
+    from model_cache import resolve
+
+    _worker_model = faster_whisper.WhisperModel(
+        resolve("whisper", model_name),
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=1,
+    )
+    if suppress_numerals:
+        from helpers import find_numeral_symbol_tokens
+
+        _worker_suppress_tokens = find_numeral_symbol_tokens(_worker_model.hf_tokenizer)
+
+
+def _transcribe_window(samples: np.ndarray, offset: float, language: Optional[str]):
+    segments, info = _worker_model.transcribe(
+        samples,
+        language=language,
+        suppress_tokens=_worker_suppress_tokens,
+        word_timestamps=True,
+        # Each window is transcribed independently, so there is no previous text
+        condition_on_previous_text=False,
+    )
+    words = [
+        {"word": word.word, "start": word.start + offset, "end": word.end + offset}
+        for segment in segments
+        for word in segment.words
+    ]
+    return words, info.language
+
+
+def transcribe_chunked(
+    audio: np.ndarray,
+    model_name: str,
+    device: str = "cpu",
+    compute_type: str = "int8",
+    workers: int = 2,
+    cpu_threads: int = 2,
+    language: Optional[str] = None,
+    suppress_numerals: bool = False,
+    window_seconds: float = 60.0,
+    overlap_seconds: float = 2.0,
+) -> ChunkedTranscript:
+    """
+    Transcribes a 16 kHz mono waveform across a pool of worker processes.
+
+    :param workers: the number of worker processes, each loading its own model
+    :param cpu_threads: the number of CTranslate2 threads used by each worker
+    :param language: the spoken language, or None to detect it from the first window
+    """
+    windows = plan_windows(
+        find_speech(audio), len(audio), window_seconds, overlap_seconds
+    )
+
+    # Workers are spawned rather than forked, as torch and CTranslate2 are not fork-safe
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(windows)) or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, device, compute_type, cpu_threads, suppress_numerals),
+    ) as pool:
+
+        def submit(window, window_language):
+            return pool.submit(
+                _transcribe_window,
+                audio[window.start : window.end],
+                window.start / SAMPLE_RATE,
+                window_language,
+            )
+
+        results = [None] * len(windows)
+        if language is None and windows:
+            # Detect the language once, so every window is transcribed in the same one
+            results[0] = submit(windows[0], None).result()
+            language = results[0][1]
+
+        futures = {
+            window.index: submit(window, language)
+            for window in windows
+            if results[window.index] is None
+        }
+        for index, future in futures.items():
+            results[index] = future.result()
+
+    words = stitch_words(windows, [window_words for window_words, _ in results])
+    return ChunkedTranscript(
+        text="".join(word["word"] for word in words),
+        language=language,
+        words=words,
+        windows=len(windows),
+    )
+
+
+if __name__ == "__main__":
+    # Run as a separate script by diarize.py, as spawned workers re-run the main script
+    # of the process that starts them, and diarize.py has no main guard
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-a", "--audio", help=".npy file of 16 kHz mono float32 samples", required=True
+    )
+    parser.add_argument(
+        "-o", "--output", help="JSON file the transcript is written to", required=True
+    )
+    parser.add_argument("--whisper-model", dest="model_name", default="medium.en")
+    parser.add_argument("--compute-type", dest="compute_type", default="int8")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--cpu-threads", dest="cpu_threads", type=int, default=2)
+    parser.add_argument("--language", type=str, default=None)
+    parser.add_argument(
+        "--suppress_numerals", action="store_true", dest="suppress_numerals"
+    )
+    parser.add_argument("--window-seconds", dest="window_seconds", type=float, default=60.0)
+    parser.add_argument("--overlap-seconds", dest="overlap_seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    transcript = transcribe_chunked(
+        np.load(args.audio).astype(np.float32, copy=False),
+        args.model_name,
+        compute_type=args.compute_type,
+        workers=args.workers,
+        cpu_threads=args.cpu_threads,
+        language=args.language,
+        suppress_numerals=args.suppress_numerals,
+        window_seconds=args.window_seconds,
+        overlap_seconds=args.overlap_seconds,
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "text": transcript.text,
+                "language": transcript.language,
+                "words": transcript.words,
+                "windows": transcript.windows,
+            },
+            f,
+        )
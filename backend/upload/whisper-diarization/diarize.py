@@ -1,9 +1,12 @@
 import argparse
+import json
 import logging
 import os
-import re
+import subprocess
+import sys
 
 import faster_whisper
+import numpy as np
 import torch
 import torchaudio
 
@@ -15,7 +18,6 @@ from ctc_forced_aligner import (
     postprocess_results,
     preprocess_text,
 )
-from deepmultilingualpunctuation import PunctuationModel
 from nemo.collections.asr.models.msdd_models import NeuralDiarizer
 
 from helpers import (
@@ -32,6 +34,9 @@ from helpers import (
     whisper_langs,
     write_srt,
 )
+from model_cache import ALIGNMENT_MODEL, resolve
+from punctuation import PunctuationRestorer
+from speaker_estimation import estimate_speakers
 
 mtypes = {"cpu": "int8", "cuda": "float16"}
 
@@ -41,7 +46,10 @@ temp_outputs_dir = f"temp_outputs_{pid}"
 # Initialize parser
 parser = argparse.ArgumentParser()
 parser.add_argument(
-    "-a", "--audio", help="name of the target audio file", required=True
+    "-a",
+    "--audio",
+    help="name of the target audio file, or a .npy file of 16 kHz mono float32 samples",
+    required=True,
 )
 parser.add_argument(
     "--no-stem",
@@ -92,9 +100,75 @@ parser.add_argument(
     help="if you have a GPU use 'cuda', otherwise 'cpu'",
 )
 
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=1,
+    help="Number of worker processes transcribing long audio in parallel on the CPU, "
+    "each loading its own model. 1 transcribes the whole file in one job",
+)
+
+parser.add_argument(
+    "--cpu-threads",
+    type=int,
+    dest="cpu_threads",
+    default=2,
+    help="Number of CTranslate2 threads used by each worker process",
+)
+
+parser.add_argument(
+    "--num-speakers",
+    type=int,
+    dest="num_speakers",
+    default=None,
+    help="Number of speakers, if known, which shortens clustering. "
+    "1 skips diarization and labels every word as Speaker 0",
+)
+
+parser.add_argument(
+    "--speaker-estimation",
+    action="store_true",
+    dest="speaker_estimation",
+    default=False,
+    help="Estimates whether the audio has a single speaker before diarization, "
+    "which is skipped when it does. Its threshold is not yet calibrated, "
+    "so it is off by default.",
+)
+
+parser.add_argument(
+    "--punct-chunk-size",
+    type=int,
+    dest="punct_chunk_size",
+    default=230,
+    help="Number of words the punctuation model is run on at a time",
+)
+
+parser.add_argument(
+    "--punct-batch-size",
+    type=int,
+    dest="punct_batch_size",
+    default=8,
+    help="Number of chunks the punctuation model is run on together",
+)
+
+parser.add_argument(
+    "--punct-threads",
+    type=int,
+    dest="punct_threads",
+    default=None,
+    help="Number of torch threads used by the punctuation model on the CPU",
+)
+
 args = parser.parse_args()
 language = process_language_arg(args.language, args.model_name)
 
+# Samples already decoded by the caller, which are used as they are
+predecoded = args.audio.endswith(".npy")
+
+if args.stemming and predecoded:
+    logging.warning("Source splitting is not supported for decoded samples, skipping it.")
+    args.stemming = False
+
 if args.stemming:
     # Isolate vocals from the rest of the audio
 
@@ -121,41 +195,81 @@ else:
 
 # Transcribe the audio file
 
-whisper_model = faster_whisper.WhisperModel(
-    args.model_name, device=args.device, compute_type=mtypes[args.device]
-)
-whisper_pipeline = faster_whisper.BatchedInferencePipeline(whisper_model)
-audio_waveform = faster_whisper.decode_audio(vocal_target)
-suppress_tokens = (
-    find_numeral_symbol_tokens(whisper_model.hf_tokenizer)
-    if args.suppress_numerals
-    else [-1]
+audio_waveform = (
+    np.load(vocal_target).astype(np.float32, copy=False)
+    if predecoded
+    else faster_whisper.decode_audio(vocal_target)
 )
 
-if args.batch_size > 0:
-    transcript_segments, info = whisper_pipeline.transcribe(
-        audio_waveform,
-        language,
-        suppress_tokens=suppress_tokens,
-        batch_size=args.batch_size,
-    )
+if args.workers > 1 and args.device == "cpu":
+    # Long-audio mode: windows split at silences are transcribed by a pool of workers
+    os.makedirs(temp_outputs_dir, exist_ok=True)
+    samples_path = vocal_target
+    if not predecoded:
+        samples_path = os.path.join(temp_outputs_dir, "samples.npy")
+        np.save(samples_path, audio_waveform)
+    chunked_path = os.path.join(temp_outputs_dir, "chunked_transcript.json")
+
+    chunked_command = [
+        sys.executable,
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunked_transcription.py"),
+        "-a", samples_path,
+        "-o", chunked_path,
+        "--whisper-model", args.model_name,
+        "--compute-type", mtypes[args.device],
+        "--workers", str(args.workers),
+        "--cpu-threads", str(args.cpu_threads),
+    ]
+    if language is not None:
+        chunked_command += ["--language", language]
+    if args.suppress_numerals:
+        chunked_command.append("--suppress_numerals")
+    subprocess.run(chunked_command, check=True)
+
+    with open(chunked_path, encoding="utf-8") as f:
+        chunked_transcript = json.load(f)
+    full_transcript = chunked_transcript["text"]
+    transcript_language = chunked_transcript["language"]
+
 else:
-    transcript_segments, info = whisper_model.transcribe(
-        audio_waveform,
-        language,
-        suppress_tokens=suppress_tokens,
-        vad_filter=True,
+    whisper_model = faster_whisper.WhisperModel(
+        resolve("whisper", args.model_name),
+        device=args.device,
+        compute_type=mtypes[args.device],
+    )
+    whisper_pipeline = faster_whisper.BatchedInferencePipeline(whisper_model)
+    suppress_tokens = (
+        find_numeral_symbol_tokens(whisper_model.hf_tokenizer)
+        if args.suppress_numerals
+        else [-1]
     )
 
-full_transcript = "".join(segment.text for segment in transcript_segments)
+    if args.batch_size > 0:
+        transcript_segments, info = whisper_pipeline.transcribe(
+            audio_waveform,
+            language,
+            suppress_tokens=suppress_tokens,
+            batch_size=args.batch_size,
+        )
+    else:
+        transcript_segments, info = whisper_model.transcribe(
+            audio_waveform,
+            language,
+            suppress_tokens=suppress_tokens,
+            vad_filter=True,
+        )
 
-# clear gpu vram
-del whisper_model, whisper_pipeline
-torch.cuda.empty_cache()
+    full_transcript = "".join(segment.text for segment in transcript_segments)
+    transcript_language = info.language
+
+    # clear gpu vram
+    del whisper_model, whisper_pipeline
+    torch.cuda.empty_cache()
 
 # Forced Alignment
 alignment_model, alignment_tokenizer = load_alignment_model(
     args.device,
+    model_path=resolve("alignment", ALIGNMENT_MODEL),
     dtype=torch.float16 if args.device == "cuda" else torch.float32,
 )
 
@@ -173,7 +287,7 @@ torch.cuda.empty_cache()
 tokens_starred, text_starred = preprocess_text(
     full_transcript,
     romanize=True,
-    language=langs_to_iso[info.language],
+    language=langs_to_iso[transcript_language],
 )
 
 segments, scores, blank_token = get_alignments(
@@ -187,68 +301,71 @@ spans = get_spans(tokens_starred, segments, blank_token)
 word_timestamps = postprocess_results(text_starred, spans, stride, scores)
 
 
-# convert audio to mono for NeMo combatibility
 ROOT = os.getcwd()
 temp_path = os.path.join(ROOT, temp_outputs_dir)
 os.makedirs(temp_path, exist_ok=True)
-torchaudio.save(
-    os.path.join(temp_path, "mono_file.wav"),
-    torch.from_numpy(audio_waveform).unsqueeze(0).float(),
-    16000,
-    channels_first=True,
-)
 
+num_speakers = args.num_speakers
+if num_speakers is None and args.speaker_estimation:
+    # A cheap pre-pass, so single-speaker recordings such as lectures skip MSDD
+    speaker_estimate = estimate_speakers(audio_waveform, args.device)
+    print(
+        f"Estimated {'one speaker' if speaker_estimate.single_speaker else 'several speakers'}"
+        f" from {speaker_estimate.windows} windows of speech"
+    )
+    if speaker_estimate.single_speaker:
+        num_speakers = 1
 
-# Initialize NeMo MSDD diarization model
-msdd_model = NeuralDiarizer(cfg=create_config(temp_path)).to(args.device)
-msdd_model.diarize()
+if num_speakers == 1:
+    speaker_ts = [[0, int(len(audio_waveform) / 16), 0]]
 
-del msdd_model
-torch.cuda.empty_cache()
+else:
+    # convert audio to mono for NeMo combatibility
+    torchaudio.save(
+        os.path.join(temp_path, "mono_file.wav"),
+        torch.from_numpy(audio_waveform).unsqueeze(0).float(),
+        16000,
+        channels_first=True,
+    )
+
+    # Initialize NeMo MSDD diarization model
+    msdd_model = NeuralDiarizer(cfg=create_config(temp_path, num_speakers)).to(
+        args.device
+    )
+    msdd_model.diarize()
 
-# Reading timestamps <> Speaker Labels mapping
+    del msdd_model
+    torch.cuda.empty_cache()
 
+    # Reading timestamps <> Speaker Labels mapping
 
-speaker_ts = []
-with open(os.path.join(temp_path, "pred_rttms", "mono_file.rttm"), "r") as f:
-    lines = f.readlines()
-    for line in lines:
-        line_list = line.split(" ")
-        s = int(float(line_list[5]) * 1000)
-        e = s + int(float(line_list[8]) * 1000)
-        speaker_ts.append([s, e, int(line_list[11].split("_")[-1])])
+    speaker_ts = []
+    with open(os.path.join(temp_path, "pred_rttms", "mono_file.rttm"), "r") as f:
+        lines = f.readlines()
+        for line in lines:
+            line_list = line.split(" ")
+            s = int(float(line_list[5]) * 1000)
+            e = s + int(float(line_list[8]) * 1000)
+            speaker_ts.append([s, e, int(line_list[11].split("_")[-1])])
 
 wsm = get_words_speaker_mapping(word_timestamps, speaker_ts, "start")
 
-if info.language in punct_model_langs:
+if transcript_language in punct_model_langs:
     # restoring punctuation in the transcript to help realign the sentences
-    punct_model = PunctuationModel(model="kredor/punctuate-all")
-
-    words_list = list(map(lambda x: x["word"], wsm))
-
-    labled_words = punct_model.predict(words_list, chunk_size=230)
-
-    ending_puncts = ".?!"
-    model_puncts = ".,;:!?"
-
-    # We don't want to punctuate U.S.A. with a period. Right?
-    is_acronym = lambda x: re.fullmatch(r"\b(?:[a-zA-Z]\.){2,}", x)
-
-    for word_dict, labeled_tuple in zip(wsm, labled_words):
-        word = word_dict["word"]
-        if (
-            word
-            and labeled_tuple[1] in ending_puncts
-            and (word[-1] not in model_puncts or is_acronym(word))
-        ):
-            word += labeled_tuple[1]
-            if word.endswith(".."):
-                word = word.rstrip(".")
-            word_dict["word"] = word
+    punctuation_restorer = PunctuationRestorer(
+        chunk_size=args.punct_chunk_size,
+        batch_size=args.punct_batch_size,
+        num_threads=args.punct_threads,
+    )
+    punctuation_restorer.restore([wsm])
+    print(
+        f"Restored punctuation of {punctuation_restorer.stats.words} words at "
+        f"{punctuation_restorer.stats.tokens_per_second:.0f} tokens/s"
+    )
 
 else:
     logging.warning(
-        f"Punctuation restoration is not available for {info.language} language."
+        f"Punctuation restoration is not available for {transcript_language} language."
         " Using the original punctuation."
     )
 
@@ -1,7 +1,6 @@
 import argparse
 import logging
 import os
-import re
 import subprocess
 
 import faster_whisper
@@ -15,7 +14,6 @@ from ctc_forced_aligner import (
     postprocess_results,
     preprocess_text,
 )
-from deepmultilingualpunctuation import PunctuationModel
 
 from helpers import (
     cleanup,
@@ -30,6 +28,8 @@ from helpers import (
     whisper_langs,
     write_srt,
 )
+from model_cache import ALIGNMENT_MODEL, resolve
+from punctuation import PunctuationRestorer
 
 mtypes = {"cpu": "int8", "cuda": "float16"}
 
@@ -90,6 +90,39 @@ parser.add_argument(
     help="if you have a GPU use 'cuda', otherwise 'cpu'",
 )
 
+parser.add_argument(
+    "--punct-chunk-size",
+    type=int,
+    dest="punct_chunk_size",
+    default=230,
+    help="Number of words the punctuation model is run on at a time",
+)
+
+parser.add_argument(
+    "--punct-batch-size",
+    type=int,
+    dest="punct_batch_size",
+    default=8,
+    help="Number of chunks the punctuation model is run on together",
+)
+
+parser.add_argument(
+    "--punct-threads",
+    type=int,
+    dest="punct_threads",
+    default=None,
+    help="Number of torch threads used by the punctuation model on the CPU",
+)
+
+parser.add_argument(
+    "--num-speakers",
+    type=int,
+    dest="num_speakers",
+    default=None,
+    help="Number of speakers in the audio, if known. "
+    "Diarization is skipped for a single speaker.",
+)
+
 args = parser.parse_args()
 language = process_language_arg(args.language, args.model_name)
 
@@ -116,15 +149,19 @@ if args.stemming:
 else:
     vocal_target = args.audio
 
-logging.info("Starting Nemo process with vocal_target: ", vocal_target)
-nemo_process = subprocess.Popen(
-    ["python", "nemo_process.py", "-a", vocal_target, "--device", args.device],
-    stderr=subprocess.PIPE,
-)
+nemo_process = None
+if args.num_speakers != 1:
+    logging.info("Starting Nemo process with vocal_target: ", vocal_target)
+    nemo_command = ["python", "nemo_process.py", "-a", vocal_target, "--device", args.device]
+    if args.num_speakers is not None:
+        nemo_command += ["--num-speakers", str(args.num_speakers)]
+    nemo_process = subprocess.Popen(nemo_command, stderr=subprocess.PIPE)
 # Transcribe the audio file
 
 whisper_model = faster_whisper.WhisperModel(
-    args.model_name, device=args.device, compute_type=mtypes[args.device]
+    resolve("whisper", args.model_name),
+    device=args.device,
+    compute_type=mtypes[args.device],
 )
 whisper_pipeline = faster_whisper.BatchedInferencePipeline(whisper_model)
 audio_waveform = faster_whisper.decode_audio(vocal_target)
@@ -159,6 +196,7 @@ torch.cuda.empty_cache()
 # Forced Alignment
 alignment_model, alignment_tokenizer = load_alignment_model(
     args.device,
+    model_path=resolve("alignment", ALIGNMENT_MODEL),
     dtype=torch.float16 if args.device == "cuda" else torch.float32,
 )
 
@@ -191,52 +229,44 @@ word_timestamps = postprocess_results(text_starred, spans, stride, scores)
 
 # Reading timestamps <> Speaker Labels mapping
 
-nemo_return_code = nemo_process.wait()
-nemo_error_trace = nemo_process.stderr.read()
-assert nemo_return_code == 0, (
-    "Diarization failed with the following error:"
-    f"\n{nemo_error_trace.decode('utf-8')}"
-)
-
 ROOT = os.getcwd()
 temp_path = os.path.join(ROOT, temp_outputs_dir)
+os.makedirs(temp_path, exist_ok=True)
+
+if nemo_process is None:
+    # A single speaker throughout, so there is nothing to diarize
+    speaker_ts = [[0, int(len(audio_waveform) / 16), 0]]
+else:
+    nemo_return_code = nemo_process.wait()
+    nemo_error_trace = nemo_process.stderr.read()
+    assert nemo_return_code == 0, (
+        "Diarization failed with the following error:"
+        f"\n{nemo_error_trace.decode('utf-8')}"
+    )
 
-speaker_ts = []
-with open(os.path.join(temp_path, "pred_rttms", "mono_file.rttm"), "r") as f:
-    lines = f.readlines()
-    for line in lines:
-        line_list = line.split(" ")
-        s = int(float(line_list[5]) * 1000)
-        e = s + int(float(line_list[8]) * 1000)
-        speaker_ts.append([s, e, int(line_list[11].split("_")[-1])])
+    speaker_ts = []
+    with open(os.path.join(temp_path, "pred_rttms", "mono_file.rttm"), "r") as f:
+        lines = f.readlines()
+        for line in lines:
+            line_list = line.split(" ")
+            s = int(float(line_list[5]) * 1000)
+            e = s + int(float(line_list[8]) * 1000)
+            speaker_ts.append([s, e, int(line_list[11].split("_")[-1])])
 
 wsm = get_words_speaker_mapping(word_timestamps, speaker_ts, "start")
 
 if info.language in punct_model_langs:
     # restoring punctuation in the transcript to help realign the sentences
-    punct_model = PunctuationModel(model="kredor/punctuate-all")
-
-    words_list = list(map(lambda x: x["word"], wsm))
-
-    labled_words = punct_model.predict(words_list, chunk_size=230)
-
-    ending_puncts = ".?!"
-    model_puncts = ".,;:!?"
-
-    # We don't want to punctuate U.S.A. with a period. Right?
-    is_acronym = lambda x: re.fullmatch(r"\b(?:[a-zA-Z]\.){2,}", x)
-
-    for word_dict, labeled_tuple in zip(wsm, labled_words):
-        word = word_dict["word"]
-        if (
-            word
-            and labeled_tuple[1] in ending_puncts
-            and (word[-1] not in model_puncts or is_acronym(word))
-        ):
-            word += labeled_tuple[1]
-            if word.endswith(".."):
-                word = word.rstrip(".")
-            word_dict["word"] = word
+    punctuation_restorer = PunctuationRestorer(
+        chunk_size=args.punct_chunk_size,
+        batch_size=args.punct_batch_size,
+        num_threads=args.punct_threads,
+    )
+    punctuation_restorer.restore([wsm])
+    print(
+        f"Restored punctuation of {punctuation_restorer.stats.words} words at "
+        f"{punctuation_restorer.stats.tokens_per_second:.0f} tokens/s"
+    )
 
 else:
     logging.warning(
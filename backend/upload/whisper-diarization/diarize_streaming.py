@@ -0,0 +1,349 @@
+import argparse
+import logging
+import os
+
+import faster_whisper
+import torch
+
+from ctc_forced_aligner import (
+    generate_emissions,
+    get_alignments,
+    get_spans,
+    load_alignment_model,
+    postprocess_results,
+    preprocess_text,
+)
+
+from chunked_transcription import SAMPLE_RATE, find_speech, stitch_words
+from helpers import (
+    find_numeral_symbol_tokens,
+    get_realigned_ws_mapping_with_punctuation,
+    get_sentences_speaker_mapping,
+    get_speaker_aware_transcript,
+    get_words_speaker_mapping,
+    langs_to_iso,
+    process_language_arg,
+    punct_model_langs,
+    whisper_langs,
+    write_srt,
+)
+from model_cache import ALIGNMENT_MODEL, SPEAKER_MODEL, resolve
+from punctuation import PunctuationRestorer
+from speaker_estimation import embed_windows, load_speaker_model
+from streaming import (
+    Pipeline,
+    SpeakerClusterer,
+    core_speech_segments,
+    read_blocks,
+    read_windows,
+)
+
+mtypes = {"cpu": "int8", "cuda": "float16"}
+
+# Initialize parser
+parser = argparse.ArgumentParser(
+    description="Transcribes and diarizes audio a window at a time, in memory which "
+    "does not grow with the length of the recording."
+)
+parser.add_argument(
+    "-a",
+    "--audio",
+    help="name of the target audio file, or a .npy file of 16 kHz mono float32 samples",
+    required=True,
+)
+
+parser.add_argument(
+    "--suppress_numerals",
+    action="store_true",
+    dest="suppress_numerals",
+    default=False,
+    help="Suppresses Numerical Digits."
+    "This helps the diarization accuracy but converts all digits into written text.",
+)
+
+parser.add_argument(
+    "--whisper-model",
+    dest="model_name",
+    default="medium.en",
+    help="name of the Whisper model to use",
+)
+
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    dest="batch_size",
+    default=8,
+    help="Batch size for batched inference, reduce if you run out of memory, "
+    "set to 0 for original whisper longform inference",
+)
+
+parser.add_argument(
+    "--language",
+    type=str,
+    default=None,
+    choices=whisper_langs,
+    help="Language spoken in the audio, specify None to perform language detection",
+)
+
+parser.add_argument(
+    "--device",
+    dest="device",
+    default="cuda" if torch.cuda.is_available() else "cpu",
+    help="if you have a GPU use 'cuda', otherwise 'cpu'",
+)
+
+parser.add_argument(
+    "--cpu-threads",
+    type=int,
+    dest="cpu_threads",
+    default=2,
+    help="Number of CTranslate2 threads used by the Whisper model",
+)
+
+parser.add_argument(
+    "--num-speakers",
+    type=int,
+    dest="num_speakers",
+    default=None,
+    help="Number of speakers, if known. 1 skips diarization",
+)
+
+parser.add_argument(
+    "--speaker-model",
+    dest="speaker_model",
+    default=SPEAKER_MODEL,
+    help="name of the NeMo speaker embedding model",
+)
+
+parser.add_argument(
+    "--speaker-threshold",
+    type=float,
+    dest="speaker_threshold",
+    default=0.5,
+    help="Similarity below which speakers are kept apart, when their number is unknown",
+)
+
+parser.add_argument(
+    "--window-seconds",
+    type=float,
+    dest="window_seconds",
+    default=30.0,
+    help="Length of the windows the audio is processed in",
+)
+
+parser.add_argument(
+    "--overlap-seconds",
+    type=float,
+    dest="overlap_seconds",
+    default=2.0,
+    help="Audio added to both sides of each window, so words cut at its edge are heard whole",
+)
+
+parser.add_argument(
+    "--queue-size",
+    type=int,
+    dest="queue_size",
+    default=2,
+    help="Number of windows waiting between each pair of stages",
+)
+
+parser.add_argument(
+    "--punct-chunk-size",
+    type=int,
+    dest="punct_chunk_size",
+    default=230,
+    help="Number of words the punctuation model is run on at a time",
+)
+
+parser.add_argument(
+    "--punct-batch-size",
+    type=int,
+    dest="punct_batch_size",
+    default=8,
+    help="Number of chunks the punctuation model is run on together",
+)
+
+parser.add_argument(
+    "--punct-threads",
+    type=int,
+    dest="punct_threads",
+    default=None,
+    help="Number of torch threads used by the punctuation model on the CPU",
+)
+
+args = parser.parse_args()
+language = process_language_arg(args.language, args.model_name)
+diarize = args.num_speakers != 1
+
+# Every model is loaded up front, as the stages run at the same time
+whisper_model = faster_whisper.WhisperModel(
+    resolve("whisper", args.model_name),
+    device=args.device,
+    compute_type=mtypes[args.device],
+    cpu_threads=args.cpu_threads,
+)
+whisper_pipeline = faster_whisper.BatchedInferencePipeline(whisper_model)
+suppress_tokens = (
+    find_numeral_symbol_tokens(whisper_model.hf_tokenizer)
+    if args.suppress_numerals
+    else [-1]
+)
+
+alignment_model, alignment_tokenizer = load_alignment_model(
+    args.device,
+    model_path=resolve("alignment", ALIGNMENT_MODEL),
+    dtype=torch.float16 if args.device == "cuda" else torch.float32,
+)
+
+if diarize:
+    speaker_model = load_speaker_model(args.speaker_model, args.device)
+    speaker_clusterer = SpeakerClusterer()
+
+# State shared by the stages, each item written by one stage only
+transcript_language = language
+total_samples = 0
+word_timestamps = []
+
+
+def transcribe(item):
+    global transcript_language, total_samples
+    window, samples = item
+    if args.batch_size > 0:
+        transcript_segments, info = whisper_pipeline.transcribe(
+            samples,
+            transcript_language,
+            suppress_tokens=suppress_tokens,
+            batch_size=args.batch_size,
+        )
+    else:
+        transcript_segments, info = whisper_model.transcribe(
+            samples,
+            transcript_language,
+            suppress_tokens=suppress_tokens,
+            vad_filter=True,
+            # Each window is transcribed independently, so there is no previous text
+            condition_on_previous_text=False,
+        )
+    text = "".join(segment.text for segment in transcript_segments)
+
+    # The language detected in the first window is used for the rest
+    transcript_language = info.language
+    total_samples = window.end
+    return window, samples, text, info.language
+
+
+def align(item):
+    window, samples, text, window_language = item
+    if not text.strip():
+        return
+
+    emissions, stride = generate_emissions(
+        alignment_model,
+        torch.from_numpy(samples)
+        .to(alignment_model.dtype)
+        .to(alignment_model.device),
+        batch_size=args.batch_size,
+    )
+    tokens_starred, text_starred = preprocess_text(
+        text,
+        romanize=True,
+        language=langs_to_iso[window_language],
+    )
+    segments, scores, blank_token = get_alignments(
+        emissions,
+        tokens_starred,
+        alignment_tokenizer,
+    )
+    spans = get_spans(tokens_starred, segments, blank_token)
+
+    offset = window.start / SAMPLE_RATE
+    window_words = postprocess_results(text_starred, spans, stride, scores)
+    for word in window_words:
+        word["start"] += offset
+        word["end"] += offset
+    # Words in the overlaps are kept by the neighbouring windows
+    word_timestamps.extend(stitch_words([window], [window_words]))
+
+
+def embed(item):
+    window, samples = item
+    segments = core_speech_segments(window, find_speech(samples))
+    if segments:
+        speaker_clusterer.add(
+            embed_windows(samples, segments, args.device, model=speaker_model),
+            [(window.start + start, window.start + end) for start, end in segments],
+        )
+
+
+pipeline = Pipeline(queue_size=args.queue_size)
+transcribe_inbox = pipeline.queue()
+align_inbox = pipeline.queue()
+reader_outboxes = [transcribe_inbox]
+if diarize:
+    embed_inbox = pipeline.queue()
+    reader_outboxes.append(embed_inbox)
+    pipeline.stage("diarize", embed, embed_inbox)
+
+pipeline.source(
+    "read",
+    read_windows(
+        read_blocks(args.audio, SAMPLE_RATE),
+        args.window_seconds,
+        args.overlap_seconds,
+    ),
+    reader_outboxes,
+)
+pipeline.stage("transcribe", transcribe, transcribe_inbox, [align_inbox])
+pipeline.stage("align", align, align_inbox)
+pipeline.run()
+
+print(
+    "Busy time of each stage: "
+    + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in pipeline.busy_seconds.items())
+)
+
+del whisper_model, whisper_pipeline, alignment_model
+if diarize:
+    del speaker_model
+torch.cuda.empty_cache()
+
+# Reading timestamps <> Speaker Labels mapping
+
+speaker_ts = []
+if diarize:
+    speaker_ts = speaker_clusterer.speaker_turns(
+        args.num_speakers, args.speaker_threshold
+    )
+if not speaker_ts:
+    # A single speaker, or no speech long enough to embed
+    speaker_ts = [[0, total_samples * 1000 // SAMPLE_RATE, 0]]
+
+wsm = get_words_speaker_mapping(word_timestamps, speaker_ts, "start")
+
+if transcript_language in punct_model_langs:
+    # restoring punctuation in the transcript to help realign the sentences
+    punctuation_restorer = PunctuationRestorer(
+        chunk_size=args.punct_chunk_size,
+        batch_size=args.punct_batch_size,
+        num_threads=args.punct_threads,
+    )
+    punctuation_restorer.restore([wsm])
+    print(
+        f"Restored punctuation of {punctuation_restorer.stats.words} words at "
+        f"{punctuation_restorer.stats.tokens_per_second:.0f} tokens/s"
+    )
+
+else:
+    logging.warning(
+        f"Punctuation restoration is not available for {transcript_language} language."
+        " Using the original punctuation."
+    )
+
+wsm = get_realigned_ws_mapping_with_punctuation(wsm)
+ssm = get_sentences_speaker_mapping(wsm, speaker_ts)
+
+with open(f"{os.path.splitext(args.audio)[0]}.txt", "w", encoding="utf-8-sig") as f:
+    get_speaker_aware_transcript(ssm, f)
+
+with open(f"{os.path.splitext(args.audio)[0]}.srt", "w", encoding="utf-8-sig") as srt:
+    write_srt(ssm, srt)
@@ -1,12 +1,15 @@
 import json
 import os
 import shutil
+from collections import Counter
 
 import nltk
-import wget
+import numpy as np
 
 from omegaconf import OmegaConf
 
+from model_cache import MSDD_MODEL, SPEAKER_MODEL, VAD_MODEL, resolve
+
 punct_model_langs = [
     "en",
     "fr",
@@ -249,15 +252,11 @@ langs_to_iso = {
 }
 
 
-def create_config(output_dir):
+def create_config(output_dir, num_speakers=None):
     DOMAIN_TYPE = "telephonic"
-    CONFIG_LOCAL_DIRECTORY = "nemo_msdd_configs"
     CONFIG_FILE_NAME = f"diar_infer_{DOMAIN_TYPE}.yaml"
-    MODEL_CONFIG_PATH = os.path.join(CONFIG_LOCAL_DIRECTORY, CONFIG_FILE_NAME)
-    if not os.path.exists(MODEL_CONFIG_PATH):
-        os.makedirs(CONFIG_LOCAL_DIRECTORY, exist_ok=True)
-        CONFIG_URL = f"https://raw.githubusercontent.com/NVIDIA/NeMo/main/examples/speaker_tasks/diarization/conf/inference/{CONFIG_FILE_NAME}"
-        MODEL_CONFIG_PATH = wget.download(CONFIG_URL, MODEL_CONFIG_PATH)
+    # The cached config, or the copy kept with the pipeline
+    MODEL_CONFIG_PATH = resolve("config", CONFIG_FILE_NAME)
 
     config = OmegaConf.load(MODEL_CONFIG_PATH)
 
@@ -273,12 +272,15 @@ def create_config(output_dir):
         "rttm_filepath": None,
         "uem_filepath": None,
     }
+    if num_speakers is not None:
+        meta["num_speakers"] = num_speakers
     with open(os.path.join(data_dir, "input_manifest.json"), "w") as fp:
         json.dump(meta, fp)
         fp.write("\n")
 
-    pretrained_vad = "vad_multilingual_marblenet"
-    pretrained_speaker_model = "titanet_large"
+    # The cached .nemo files, which NeMo restores without resolving the names online
+    pretrained_vad = resolve("nemo", VAD_MODEL)
+    pretrained_speaker_model = resolve("nemo", SPEAKER_MODEL)
     config.num_workers = 0
     config.diarizer.manifest_filepath = os.path.join(data_dir, "input_manifest.json")
     config.diarizer.out_dir = (
@@ -289,16 +291,17 @@ def create_config(output_dir):
     config.diarizer.oracle_vad = (
         False  # compute VAD provided with model_path to vad config
     )
-    config.diarizer.clustering.parameters.oracle_num_speakers = False
+    # A known number of speakers is read from the manifest, which shortens clustering
+    config.diarizer.clustering.parameters.oracle_num_speakers = num_speakers is not None
 
     # Here, we use our in-house pretrained NeMo VAD model
     config.diarizer.vad.model_path = pretrained_vad
     config.diarizer.vad.parameters.onset = 0.8
     config.diarizer.vad.parameters.offset = 0.6
     config.diarizer.vad.parameters.pad_offset = -0.05
-    config.diarizer.msdd_model.model_path = (
-        "diar_msdd_telephonic"  # Telephonic speaker diarization model
-    )
+    config.diarizer.msdd_model.model_path = resolve(
+        "nemo", MSDD_MODEL
+    )  # Telephonic speaker diarization model
 
     return config
 
@@ -312,6 +315,42 @@ def get_word_ts_anchor(s, e, option="start"):
 
 
 def get_words_speaker_mapping(wrd_ts, spk_ts, word_anchor_option="start"):
+    turn_ends = np.array([e for _, e, _ in spk_ts], dtype=np.float64)
+    if np.any(np.diff(turn_ends) < 0):
+        # Overlapping turns, where a later turn ends before an earlier one
+        return _get_words_speaker_mapping_sequential(
+            wrd_ts, spk_ts, word_anchor_option
+        )
+
+    wrd_starts = [int(wrd_dict["start"] * 1000) for wrd_dict in wrd_ts]
+    wrd_ends = [int(wrd_dict["end"] * 1000) for wrd_dict in wrd_ts]
+    wrd_pos = get_word_ts_anchor(
+        np.array(wrd_starts, dtype=np.float64),
+        np.array(wrd_ends, dtype=np.float64),
+        word_anchor_option,
+    )
+
+    # Each word belongs to the first turn ending at or after it, never to a turn
+    # before that of the previous word, and to the last turn if it is after them all
+    turn_idxs = np.maximum.accumulate(
+        np.searchsorted(turn_ends, wrd_pos, side="left")
+    )
+    turn_idxs = np.minimum(turn_idxs, len(spk_ts) - 1)
+
+    return [
+        {
+            "word": wrd_dict["text"],
+            "start_time": ws,
+            "end_time": we,
+            "speaker": spk_ts[turn_idx][2],
+        }
+        for wrd_dict, ws, we, turn_idx in zip(
+            wrd_ts, wrd_starts, wrd_ends, turn_idxs.tolist()
+        )
+    ]
+
+
+def _get_words_speaker_mapping_sequential(wrd_ts, spk_ts, word_anchor_option="start"):
     s, e, sp = spk_ts[0]
     wrd_pos, turn_idx = 0, 0
     wrd_spk_mapping = []
@@ -337,101 +376,54 @@ def get_words_speaker_mapping(wrd_ts, spk_ts, word_anchor_option="start"):
 sentence_ending_punctuations = ".?!"
 
 
-def get_first_word_idx_of_sentence(word_idx, word_list, speaker_list, max_words):
-    is_word_sentence_end = (
-        lambda x: x >= 0 and word_list[x][-1] in sentence_ending_punctuations
-    )
-    left_idx = word_idx
-    while (
-        left_idx > 0
-        and word_idx - left_idx < max_words
-        and speaker_list[left_idx - 1] == speaker_list[left_idx]
-        and not is_word_sentence_end(left_idx - 1)
-    ):
-        left_idx -= 1
-
-    return left_idx if left_idx == 0 or is_word_sentence_end(left_idx - 1) else -1
-
-
-def get_last_word_idx_of_sentence(word_idx, word_list, max_words):
-    is_word_sentence_end = (
-        lambda x: x >= 0 and word_list[x][-1] in sentence_ending_punctuations
-    )
-    right_idx = word_idx
-    while (
-        right_idx < len(word_list) - 1
-        and right_idx - word_idx < max_words
-        and not is_word_sentence_end(right_idx)
-    ):
-        right_idx += 1
-
-    return (
-        right_idx
-        if right_idx == len(word_list) - 1 or is_word_sentence_end(right_idx)
-        else -1
-    )
-
-
 def get_realigned_ws_mapping_with_punctuation(
     word_speaker_mapping, max_words_in_sentence=50
 ):
-    is_word_sentence_end = (
-        lambda x: x >= 0
-        and word_speaker_mapping[x]["word"][-1] in sentence_ending_punctuations
-    )
+    speaker_list = [line_dict["speaker"] for line_dict in word_speaker_mapping]
     wsp_len = len(word_speaker_mapping)
 
-    words_list, speaker_list = [], []
-    for k, line_dict in enumerate(word_speaker_mapping):
-        word, speaker = line_dict["word"], line_dict["speaker"]
-        words_list.append(word)
-        speaker_list.append(speaker)
-
-    k = 0
-    while k < len(word_speaker_mapping):
-        line_dict = word_speaker_mapping[k]
-        if (
-            k < wsp_len - 1
-            and speaker_list[k] != speaker_list[k + 1]
-            and not is_word_sentence_end(k)
+    # A sentence runs up to a word ending in punctuation, or the last word. Realigning
+    # a sentence only changes its own words, so the sentences are realigned in turn
+    left_idx = 0
+    for right_idx, line_dict in enumerate(word_speaker_mapping):
+        word = line_dict["word"]
+        if right_idx < wsp_len - 1 and not (
+            word and word[-1] in sentence_ending_punctuations
         ):
-            left_idx = get_first_word_idx_of_sentence(
-                k, words_list, speaker_list, max_words_in_sentence
-            )
-            right_idx = (
-                get_last_word_idx_of_sentence(
-                    k, words_list, max_words_in_sentence - k + left_idx - 1
-                )
-                if left_idx > -1
-                else -1
-            )
-            if min(left_idx, right_idx) == -1:
-                k += 1
-                continue
-
-            spk_labels = speaker_list[left_idx : right_idx + 1]
-            mod_speaker = max(set(spk_labels), key=spk_labels.count)
-            if spk_labels.count(mod_speaker) < len(spk_labels) // 2:
-                k += 1
-                continue
-
-            speaker_list[left_idx : right_idx + 1] = [mod_speaker] * (
-                right_idx - left_idx + 1
-            )
-            k = right_idx
-
-        k += 1
-
-    k, realigned_list = 0, []
-    while k < len(word_speaker_mapping):
-        line_dict = word_speaker_mapping[k].copy()
-        line_dict["speaker"] = speaker_list[k]
+            continue
+        _realign_sentence(speaker_list, left_idx, right_idx, max_words_in_sentence)
+        left_idx = right_idx + 1
+
+    realigned_list = []
+    for line_dict, speaker in zip(word_speaker_mapping, speaker_list):
+        line_dict = line_dict.copy()
+        line_dict["speaker"] = speaker
         realigned_list.append(line_dict)
-        k += 1
 
     return realigned_list
 
 
+def _realign_sentence(speaker_list, left_idx, right_idx, max_words_in_sentence):
+    """
+    Assigns every word of a sentence to its most common speaker, if the speaker changes
+    within the sentence, the sentence has at most max_words_in_sentence words, and the
+    most common speaker has at least half of them.
+    """
+    spk_labels = speaker_list[left_idx : right_idx + 1]
+    if len(spk_labels) > max_words_in_sentence or all(
+        spk == spk_labels[0] for spk in spk_labels
+    ):
+        return
+
+    spk_counts = Counter(spk_labels)
+    # Ties are broken by the order of the set, as they were before
+    mod_speaker = max(set(spk_labels), key=spk_counts.__getitem__)
+    if spk_counts[mod_speaker] < len(spk_labels) // 2:
+        return
+
+    speaker_list[left_idx : right_idx + 1] = [mod_speaker] * len(spk_labels)
+
+
 def get_sentences_speaker_mapping(word_speaker_mapping, spk_ts):
     sentence_checker = nltk.tokenize.PunktSentenceTokenizer().text_contains_sentbreak
     s, e, spk = spk_ts[0]
@@ -439,11 +431,17 @@ def get_sentences_speaker_mapping(word_speaker_mapping, spk_ts):
 
     snts = []
     snt = {"speaker": f"Speaker {spk}", "start_time": s, "end_time": e, "text": ""}
+    snt_words = []
+    # Punkt decides whether a token ends a sentence from it and the token after it, and
+    # the sentence so far has no break, so only its last word needs to be checked
+    # along with the new one, rather than the whole sentence
+    last_chunk = ""
 
     for wrd_dict in word_speaker_mapping:
         wrd, spk = wrd_dict["word"], wrd_dict["speaker"]
         s, e = wrd_dict["start_time"], wrd_dict["end_time"]
-        if spk != prev_spk or sentence_checker(snt["text"] + " " + wrd):
+        if spk != prev_spk or sentence_checker(last_chunk + " " + wrd):
+            snt["text"] = "".join(snt_words)
             snts.append(snt)
             snt = {
                 "speaker": f"Speaker {spk}",
@@ -451,11 +449,17 @@ def get_sentences_speaker_mapping(word_speaker_mapping, spk_ts):
                 "end_time": e,
                 "text": "",
             }
+            snt_words = []
+            last_chunk = ""
         else:
             snt["end_time"] = e
-        snt["text"] += wrd + " "
+        snt_words.append(wrd + " ")
+        chunks = wrd.split()
+        if chunks:
+            last_chunk = chunks[-1]
         prev_spk = spk
 
+    snt["text"] = "".join(snt_words)
     snts.append(snt)
     return snts
 
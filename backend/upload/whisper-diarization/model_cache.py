@@ -0,0 +1,410 @@
+"""
+A local cache of the models and configs used by the pipeline.
+
+Without it, pretrained model names are resolved over the network on every cold run, and
+the MSDD config is downloaded when it is missing, so runs stall on slow networks and
+fail on hosts without one. The warm-up command fetches every artefact into the cache
+directory, records a digest of each, and times loading it back from disk:
+
+    python model_cache.py warm --whisper-model medium.en
+    python model_cache.py verify
+
+The pipeline then resolves each artefact to its local path, see #resolve. Artefacts which
+are not cached are resolved by name, as before, unless WHISPER_DIARIZATION_OFFLINE is set,
+in which case they are an error.
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import time
+import urllib.request
+from dataclasses import dataclass
+from typing import Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_CACHE_DIR = os.environ.get(
+    "WHISPER_DIARIZATION_MODELS", os.path.join(HERE, "models")
+)
+OFFLINE = os.environ.get("WHISPER_DIARIZATION_OFFLINE", "").lower() in ("1", "true", "yes")
+
+ALIGNMENT_MODEL = "MahmoudAshraf/mms-300m-1130-forced-aligner"
+PUNCTUATION_MODEL = "kredor/punctuate-all"
+VAD_MODEL = "vad_multilingual_marblenet"
+SPEAKER_MODEL = "titanet_large"
+SPEAKER_ESTIMATION_MODEL = "titanet_small"
+MSDD_MODEL = "diar_msdd_telephonic"
+MSDD_CONFIG = "diar_infer_telephonic.yaml"
+
+MSDD_CONFIG_DIR = os.path.join(HERE, "nemo_msdd_configs")
+MSDD_CONFIG_URL = "https://raw.githubusercontent.com/NVIDIA/NeMo/main/examples/speaker_tasks/diarization/conf/inference/{}"
+
+# The NeMo class each pretrained model is listed by
+NEMO_MODEL_CLASSES = {
+    VAD_MODEL: "nemo.collections.asr.models.EncDecClassificationModel",
+    SPEAKER_MODEL: "nemo.collections.asr.models.EncDecSpeakerLabelModel",
+    SPEAKER_ESTIMATION_MODEL: "nemo.collections.asr.models.EncDecSpeakerLabelModel",
+    MSDD_MODEL: "nemo.collections.asr.models.msdd_models.EncDecDiarLabelModel",
+}
+
+
+@dataclass(frozen=True)
+class Artefact:
+    # One of "whisper", "alignment", "punctuation", "nemo" or "config"
+    kind: str
+    name: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}/{self.name}"
+
+
+@dataclass
+class ArtefactReport:
+    artefact: Artefact
+    bytes: int = 0
+    fetch_seconds: float = 0.0
+    load_seconds: Optional[float] = None
+    verified: bool = False
+    error: Optional[str] = None
+
+
+def pipeline_artefacts(whisper_models: list[str] = ("medium.en",)) -> list[Artefact]:
+    """
+    :return: every artefact used by the pipeline, with the given Whisper models
+    """
+    return [
+        *(Artefact("whisper", name) for name in whisper_models),
+        Artefact("alignment", ALIGNMENT_MODEL),
+        Artefact("nemo", VAD_MODEL),
+        Artefact("nemo", SPEAKER_MODEL),
+        Artefact("nemo", SPEAKER_ESTIMATION_MODEL),
+        Artefact("nemo", MSDD_MODEL),
+        Artefact("config", MSDD_CONFIG),
+        Artefact("punctuation", PUNCTUATION_MODEL),
+    ]
+
+
+def path_sha256(path: str, chunk_size: int = 1024 * 1024) -> tuple[str, int]:
+    """
+    Hashes a file, or every file of a directory along with its relative path.
+
+    :return: the hex digest, and the number of bytes hashed
+    """
+    if os.path.isfile(path):
+        files = [(os.path.basename(path), path)]
+    else:
+        files = sorted(
+            (os.path.relpath(os.path.join(root, name), path), os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+
+    digest = hashlib.sha256()
+    size = 0
+    for relative, file_path in files:
+        digest.update(relative.encode())
+        with open(file_path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+                size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class ModelCache:
+    """
+    Fetches, verifies and resolves the artefacts of the pipeline in a local directory.
+    A manifest of the digest of each fetched artefact is kept alongside them.
+    """
+
+    def __init__(self, directory: str = MODEL_CACHE_DIR, offline: bool = OFFLINE):
+        """
+        :param offline: whether artefacts missing from the cache are an error, rather
+            than resolved by name over the network
+        """
+        self.directory = directory
+        self.offline = offline
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+    def path(self, artefact: Artefact) -> str:
+        """
+        :return: where the artefact is kept in the cache
+        """
+        name = artefact.name.replace("/", "--")
+        if artefact.kind == "nemo":
+            name += ".nemo"
+        return os.path.join(self.directory, artefact.kind, name)
+
+    def manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def is_cached(self, artefact: Artefact) -> bool:
+        return artefact.key in self.manifest() and os.path.exists(self.path(artefact))
+
+    def resolve(self, artefact: Artefact) -> str:
+        """
+        :return: the local path of the artefact if it is cached, otherwise its name, or
+            for the MSDD config, the copy kept with the pipeline
+        :raises FileNotFoundError: if the artefact is not cached and the cache is offline
+        """
+        if self.is_cached(artefact):
+            return self.path(artefact)
+        if artefact.kind == "config":
+            bundled = os.path.join(MSDD_CONFIG_DIR, artefact.name)
+            if os.path.exists(bundled):
+                return bundled
+        if self.offline:
+            raise FileNotFoundError(
+                f"{artefact.key} is not in the model cache at {self.directory}, "
+                "run python model_cache.py warm to fetch it"
+            )
+        if artefact.kind == "config":
+            return self.fetch(artefact)
+        return artefact.name
+
+    def fetch(self, artefact: Artefact) -> str:
+        """
+        Downloads the artefact into the cache, replacing any copy already there, and
+        records its digest.
+
+        :return: the local path of the artefact
+        """
+        target = self.path(artefact)
+        partial = target + ".partial"
+        _remove(partial)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+
+        if artefact.kind == "whisper":
+            import faster_whisper
+
+            faster_whisper.download_model(artefact.name, output_dir=partial)
+        elif artefact.kind in ("alignment", "punctuation"):
+            from huggingface_hub import snapshot_download
+
+            snapshot_download(
+                artefact.name, local_dir=partial, local_dir_use_symlinks=False
+            )
+        elif artefact.kind == "nemo":
+            _fetch_nemo_model(artefact.name, partial)
+        elif artefact.kind == "config":
+            bundled = os.path.join(MSDD_CONFIG_DIR, artefact.name)
+            if os.path.exists(bundled):
+                shutil.copyfile(bundled, partial)
+            else:
+                urllib.request.urlretrieve(MSDD_CONFIG_URL.format(artefact.name), partial)
+        else:
+            raise ValueError(f"Unknown kind of artefact: {artefact.kind}")
+
+        _remove(target)
+        os.replace(partial, target)
+
+        digest, size = path_sha256(target)
+        manifest = self.manifest()
+        manifest[artefact.key] = {"sha256": digest, "bytes": size, "fetched": time.time()}
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        return target
+
+    def verify(self, artefact: Artefact) -> bool:
+        """
+        :return: whether the cached artefact still matches the digest recorded when it
+            was fetched
+        """
+        entry = self.manifest().get(artefact.key)
+        if entry is None or not os.path.exists(self.path(artefact)):
+            return False
+        return path_sha256(self.path(artefact))[0] == entry["sha256"]
+
+    def load(self, artefact: Artefact, device: str = "cpu"):
+        """
+        Loads the cached artefact as the pipeline does, from its local path only.
+        """
+        path = self.path(artefact)
+        if artefact.kind == "whisper":
+            import faster_whisper
+
+            return faster_whisper.WhisperModel(
+                path, device=device, compute_type="float16" if device == "cuda" else "int8"
+            )
+        if artefact.kind == "alignment":
+            from ctc_forced_aligner import load_alignment_model
+
+            return load_alignment_model(device, model_path=path)
+        if artefact.kind == "punctuation":
+            from deepmultilingualpunctuation import PunctuationModel
+
+            return PunctuationModel(model=path)
+        if artefact.kind == "nemo":
+            return load_nemo_model(artefact.name, path, device)
+        if artefact.kind == "config":
+            from omegaconf import OmegaConf
+
+            return OmegaConf.load(path)
+        raise ValueError(f"Unknown kind of artefact: {artefact.kind}")
+
+    def warm(
+        self,
+        artefacts: list[Artefact],
+        refresh: bool = False,
+        load: bool = True,
+        device: str = "cpu",
+    ) -> list[ArtefactReport]:
+        """
+        Fetches each artefact which is not cached, or fails verification, then verifies
+        it and times loading it from the cache.
+
+        :param refresh: whether to fetch every artefact again
+        :param load: whether to load each artefact, to time it and check it loads
+        """
+        reports = []
+        for artefact in artefacts:
+            report = ArtefactReport(artefact)
+            reports.append(report)
+            try:
+                if refresh or not self.verify(artefact):
+                    start = time.perf_counter()
+                    self.fetch(artefact)
+                    report.fetch_seconds = time.perf_counter() - start
+                report.verified = self.verify(artefact)
+                report.bytes = self.manifest()[artefact.key]["bytes"]
+                if load and report.verified:
+                    report.load_seconds = self.time_load(artefact, device)
+            except Exception as e:
+                report.error = f"{type(e).__name__}: {e}"
+        return reports
+
+    def check(
+        self, artefacts: list[Artefact], load: bool = True, device: str = "cpu"
+    ) -> list[ArtefactReport]:
+        """
+        Verifies each cached artefact and times loading it, without fetching anything.
+        """
+        reports = []
+        for artefact in artefacts:
+            report = ArtefactReport(artefact)
+            reports.append(report)
+            try:
+                report.verified = self.verify(artefact)
+                if not report.verified:
+                    report.error = "missing or modified since it was fetched"
+                    continue
+                report.bytes = self.manifest()[artefact.key]["bytes"]
+                if load:
+                    report.load_seconds = self.time_load(artefact, device)
+            except Exception as e:
+                report.error = f"{type(e).__name__}: {e}"
+        return reports
+
+    def time_load(self, artefact: Artefact, device: str = "cpu") -> float:
+        start = time.perf_counter()
+        model = self.load(artefact, device)
+        seconds = time.perf_counter() - start
+        del model
+        return seconds
+
+
+def _remove(path: str) -> None:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _nemo_class(name: str):
+    module, class_name = NEMO_MODEL_CLASSES[name].rsplit(".", 1)
+    return getattr(importlib.import_module(module), class_name)
+
+
+def _fetch_nemo_model(name: str, target: str) -> None:
+    """
+    Downloads the .nemo file of a pretrained NeMo model, or where NeMo does not list it
+    at a URL, saves the model it loads.
+    """
+    model_class = _nemo_class(name)
+    for info in model_class.list_available_models() or []:
+        if info.pretrained_model_name == name and info.location.startswith("http"):
+            urllib.request.urlretrieve(info.location, target)
+            return
+    model_class.from_pretrained(name, map_location="cpu").save_to(target)
+
+
+def load_nemo_model(name: str, path: str, device: str = "cpu"):
+    """
+    Loads a NeMo model, from its .nemo file if it is cached, otherwise by name.
+    """
+    model_class = _nemo_class(name)
+    if path.endswith(".nemo"):
+        return model_class.restore_from(path, map_location=device)
+    return model_class.from_pretrained(name, map_location=device)
+
+
+_default_cache = None
+
+
+def default_cache() -> ModelCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ModelCache()
+    return _default_cache
+
+
+def resolve(kind: str, name: str) -> str:
+    """
+    Resolves an artefact in the default cache, see ModelCache.resolve.
+    """
+    return default_cache().resolve(Artefact(kind, name))
+
+
+def print_reports(reports: list[ArtefactReport]) -> None:
+    for report in reports:
+        load = "-" if report.load_seconds is None else f"{report.load_seconds:.1f}s"
+        status = report.error or ("verified" if report.verified else "not verified")
+        print(
+            f"{report.artefact.key:60s} {report.bytes / 2 ** 20:9.1f} MiB  "
+            f"fetch {report.fetch_seconds:6.1f}s  load {load:>7s}  {status}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fetches and verifies the models and configs of the pipeline."
+    )
+    parser.add_argument("command", choices=["warm", "verify"])
+    parser.add_argument(
+        "--whisper-model",
+        dest="whisper_models",
+        nargs="+",
+        default=["medium.en"],
+        help="names of the Whisper models to cache",
+    )
+    parser.add_argument("--directory", default=MODEL_CACHE_DIR)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument(
+        "--refresh", action="store_true", help="fetch every artefact again"
+    )
+    parser.add_argument(
+        "--no-load",
+        action="store_false",
+        dest="load",
+        help="skip loading each artefact to time it",
+    )
+    args = parser.parse_args()
+
+    cache = ModelCache(args.directory)
+    artefacts = pipeline_artefacts(args.whisper_models)
+    if args.command == "warm":
+        reports = cache.warm(artefacts, args.refresh, args.load, args.device)
+    else:
+        reports = cache.check(artefacts, args.load, args.device)
+    print_reports(reports)
+    if any(report.error or not report.verified for report in reports):
+        raise SystemExit(1)
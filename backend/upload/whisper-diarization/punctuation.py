@@ -0,0 +1,192 @@
+"""
+Punctuation restoration for transcripts, used to realign speakers to sentences.
+
+The punctuation model is loaded once per process and shared by every restorer. The
+words of each transcript are split into overlapping chunks, as by
+deepmultilingualpunctuation's PunctuationModel.predict, and the chunks of every
+transcript passed together are run through the model in batches, rather than one chunk
+at a time.
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from model_cache import PUNCTUATION_MODEL, resolve
+
+ENDING_PUNCTS = ".?!"
+MODEL_PUNCTS = ".,;:!?"
+# We don't want to punctuate U.S.A. with a period. Right?
+ACRONYM_RE = re.compile(r"\b(?:[a-zA-Z]\.){2,}")
+
+# The number of words repeated at the start of the next chunk, for context
+CHUNK_OVERLAP = 5
+
+_models = {}
+
+
+def load_punctuation_model(model_name: str):
+    """
+    Loads a punctuation model, from the model cache if it is there, or returns the one
+    already loaded by this process.
+    """
+    if model_name not in _models:
+        from deepmultilingualpunctuation import PunctuationModel
+
+        _models[model_name] = PunctuationModel(
+            model=resolve("punctuation", model_name)
+        )
+    return _models[model_name]
+
+
+@dataclass
+class PunctuationStats:
+    transcripts: int = 0
+    words: int = 0
+    tokens: int = 0
+    seconds: float = 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+
+def chunk_words(words: list[str], chunk_size: int) -> list[tuple[list[str], int]]:
+    """
+    Splits words into chunks of chunk_size, each overlapping the next, as
+    PunctuationModel.predict does.
+
+    :return: each chunk, and the number of its words whose labels are kept
+    """
+    overlap = CHUNK_OVERLAP if len(words) > chunk_size else 0
+    chunks = [
+        words[i : i + chunk_size] for i in range(0, len(words), chunk_size - overlap)
+    ]
+    # If the last chunk is within the overlap, it is already labelled by the one before
+    if chunks and len(chunks[-1]) <= overlap:
+        chunks.pop()
+    return [
+        (chunk, len(chunk) if i == len(chunks) - 1 else len(chunk) - overlap)
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def label_words(chunk: list[str], kept: int, result: list[dict]) -> list[list]:
+    """
+    Labels each word with the last punctuation predicted for its subword tokens.
+
+    :param chunk: the words of the chunk
+    :param kept: the number of words whose labels are kept
+    :param result: the tokens predicted by the model, with their character offsets
+    :return: the word, label and score of each kept word
+    """
+    labelled = []
+    char_index = 0
+    result_index = 0
+    score = 0.0
+    for word in chunk[:kept]:
+        char_index += len(word) + 1
+        label = 0
+        while result_index < len(result) and char_index > result[result_index]["end"]:
+            label = result[result_index]["entity"]
+            score = result[result_index]["score"]
+            result_index += 1
+        labelled.append([word, label, score])
+    return labelled
+
+
+def apply_punctuation(word_speaker_mapping: list[dict], labelled_words: list[list]):
+    """
+    Appends the predicted sentence-ending punctuation to the words which lack it.
+    """
+    for word_dict, labelled in zip(word_speaker_mapping, labelled_words):
+        word = word_dict["word"]
+        if (
+            word
+            and labelled[1] in ENDING_PUNCTS
+            and (word[-1] not in MODEL_PUNCTS or ACRONYM_RE.fullmatch(word))
+        ):
+            word += labelled[1]
+            if word.endswith(".."):
+                word = word.rstrip(".")
+            word_dict["word"] = word
+
+
+class PunctuationRestorer:
+    """
+    Restores the sentence-ending punctuation of transcripts with a punctuation model.
+    """
+
+    def __init__(
+        self,
+        model_name: str = PUNCTUATION_MODEL,
+        chunk_size: int = 230,
+        batch_size: int = 8,
+        num_threads: Optional[int] = None,
+        model=None,
+    ):
+        """
+        :param chunk_size: the number of words run through the model at a time, which
+            must fit in its maximum sequence length
+        :param batch_size: the number of chunks run through the model together
+        :param num_threads: the number of threads used by torch on the CPU, or None for
+            its default
+        :param model: the punctuation model; defaults to the model_name, loaded once
+            per process
+        """
+        if num_threads:
+            import torch
+
+            torch.set_num_threads(num_threads)
+        self.model = model or load_punctuation_model(model_name)
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.stats = PunctuationStats()
+
+    def predict(self, transcripts: list[list[str]]) -> list[list[list]]:
+        """
+        Predicts the punctuation following each word of several transcripts, running the
+        chunks of every transcript through the model in batches.
+
+        :param transcripts: the words of each transcript
+        :return: the word, label and score of each word of each transcript
+        """
+        start = time.perf_counter()
+        chunks = [chunk_words(words, self.chunk_size) for words in transcripts]
+        texts = [" ".join(chunk) for transcript in chunks for chunk, _ in transcript]
+        results = iter(
+            self.model.pipe(texts, batch_size=self.batch_size) if texts else []
+        )
+
+        labelled = []
+        texts = iter(texts)
+        for words, transcript in zip(transcripts, chunks):
+            transcript_labels = []
+            for chunk, kept in transcript:
+                result = next(results)
+                assert len(next(texts)) == result[-1]["end"], (
+                    "chunk size too large, text got clipped"
+                )
+                self.stats.tokens += len(result)
+                transcript_labels.extend(label_words(chunk, kept, result))
+            assert len(transcript_labels) == len(words)
+            labelled.append(transcript_labels)
+
+        self.stats.transcripts += len(transcripts)
+        self.stats.words += sum(map(len, transcripts))
+        self.stats.seconds += time.perf_counter() - start
+        return labelled
+
+    def restore(self, word_speaker_mappings: list[list[dict]]) -> None:
+        """
+        Restores the punctuation of several transcripts in place.
+
+        :param word_speaker_mappings: the words of each transcript, see
+            helpers.get_words_speaker_mapping
+        """
+        labelled = self.predict(
+            [[word_dict["word"] for word_dict in wsm] for wsm in word_speaker_mappings]
+        )
+        for wsm, labelled_words in zip(word_speaker_mappings, labelled):
+            apply_punctuation(wsm, labelled_words)
@@ -0,0 +1,159 @@
+"""
+A cheap estimate of whether a recording has a single speaker, made before diarization.
+
+Speech is found with the Silero VAD model bundled with faster-whisper, and windows of
+it, spread across the recording, are embedded with the small TitaNet speaker model.
+When the embeddings of every window are close to their mean, the recording is taken
+to have a single speaker, and the MSDD diarization, which embeds the whole recording at
+several scales with the large TitaNet model, can be skipped.
+
+The threshold has not been calibrated on a labelled set of recordings, so diarize.py
+only makes the estimate with --speaker-estimation.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from model_cache import SPEAKER_ESTIMATION_MODEL, resolve
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class SpeakerEstimate:
+    single_speaker: bool
+    windows: int
+    # The similarity to the mean embedding, at the quantile used for the decision
+    similarity: Optional[float] = None
+
+
+def speech_windows(
+    speech: list[dict],
+    window_seconds: float = 3.0,
+    max_windows: int = 60,
+    min_seconds: float = 1.0,
+    sample_rate: int = SAMPLE_RATE,
+) -> list[tuple[int, int]]:
+    """
+    Cuts the speech segments into windows of window_seconds, keeping at most max_windows
+    of them, evenly spread across the recording. Segments shorter than a window, such as
+    brief questions, and the remainder at the end of a segment, are kept as shorter
+    windows when they last at least min_seconds.
+
+    :param speech: the start and end sample of each speech segment
+    :return: the start and end sample of each window
+    """
+    window = int(window_seconds * sample_rate)
+    min_window = int(min_seconds * sample_rate)
+    windows = []
+    for segment in speech:
+        for start in range(segment["start"], segment["end"], window):
+            end = min(start + window, segment["end"])
+            if end - start >= min_window:
+                windows.append((start, end))
+    if len(windows) > max_windows:
+        kept = np.linspace(0, len(windows) - 1, max_windows).round().astype(int)
+        windows = [windows[i] for i in kept]
+    return windows
+
+
+def centroid_similarity(embeddings: np.ndarray) -> np.ndarray:
+    """
+    :return: the cosine similarity of each embedding to the mean of the embeddings
+    """
+    normalised = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    centroid = normalised.mean(axis=0)
+    centroid /= np.linalg.norm(centroid)
+    return normalised @ centroid
+
+
+def load_speaker_model(
+    model_name: str = SPEAKER_ESTIMATION_MODEL, device: str = "cpu"
+):
+    """
+    Loads a NeMo speaker embedding model for inference, from the model cache if it is
+    there.
+    """
+    from nemo.collections.asr.models import EncDecSpeakerLabelModel
+
+    path = resolve("nemo", model_name)
+    if path.endswith(".nemo"):
+        model = EncDecSpeakerLabelModel.restore_from(path, map_location=device)
+    else:
+        model = EncDecSpeakerLabelModel.from_pretrained(model_name, map_location=device)
+    model.eval()
+    return model
+
+
+def embed_windows(
+    audio: np.ndarray,
+    windows: list[tuple[int, int]],
+    device: str = "cpu",
+    model_name: str = SPEAKER_ESTIMATION_MODEL,
+    batch_size: int = 16,
+    model=None,
+) -> np.ndarray:
+    """
+    Embeds each window of the waveform with a NeMo speaker model. Windows of different
+    lengths are padded to the longest of their batch.
+
+    :param model: the speaker model; defaults to model_name, loaded for this call only
+    :return: an embedding for each window
+    """
+    import torch
+
+    loaded = model is None
+    if loaded:
+        model = load_speaker_model(model_name, device)
+
+    embeddings = []
+    with torch.inference_mode():
+        for i in range(0, len(windows), batch_size):
+            batch_windows = windows[i : i + batch_size]
+            lengths = np.array([end - start for start, end in batch_windows])
+            batch = np.zeros((len(batch_windows), lengths.max()), dtype=np.float32)
+            for row, (start, end) in enumerate(batch_windows):
+                batch[row, : end - start] = audio[start:end]
+            _, batch_embeddings = model.forward(
+                input_signal=torch.from_numpy(batch).to(device),
+                input_signal_length=torch.from_numpy(lengths).to(device),
+            )
+            embeddings.append(batch_embeddings.float().cpu().numpy())
+
+    if loaded:
+        del model
+        torch.cuda.empty_cache()
+    return np.concatenate(embeddings) if embeddings else np.zeros((0, 0), np.float32)
+
+
+def estimate_speakers(
+    audio: np.ndarray,
+    device: str = "cpu",
+    threshold: float = 0.6,
+    quantile: float = 0.0,
+    min_windows: int = 3,
+    **window_options,
+) -> SpeakerEstimate:
+    """
+    Estimates whether a 16 kHz mono waveform has a single speaker. Recordings with too
+    little speech to tell are taken to have several.
+
+    :param threshold: the similarity to the mean embedding that all but a quantile of
+        the windows must reach for the recording to have a single speaker
+    :param quantile: the fraction of windows which may fall below the threshold. By
+        default every window must reach it, as the few windows of an interviewer's
+        brief questions would otherwise be discarded as outliers
+    :param window_options: passed to #speech_windows
+    """
+    from chunked_transcription import find_speech
+
+    windows = speech_windows(find_speech(audio), **window_options)
+    if len(windows) < min_windows:
+        return SpeakerEstimate(False, len(windows))
+
+    similarity = float(
+        np.quantile(centroid_similarity(embed_windows(audio, windows, device)), quantile)
+    )
+    return SpeakerEstimate(similarity >= threshold, len(windows), similarity)
@@ -0,0 +1,392 @@
+"""
+Building blocks for diarizing long recordings in bounded memory.
+
+The audio is read a window at a time, straight from ffmpeg or a memory-mapped .npy file,
+so the whole waveform is never held at once. Windows are cut at silences, as in
+chunked_transcription, and passed through stages running in their own threads, joined by
+bounded queues, so a stage which falls behind holds back the reader rather than letting
+windows pile up in memory.
+
+Speakers are found by embedding short segments of speech in each window and assigning
+the embeddings to small clusters as they arrive, keeping only the running sum of each
+cluster. Once the whole recording is read, the small clusters are merged into speakers.
+"""
+
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from queue import Empty, Full, Queue
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+
+from chunked_transcription import SAMPLE_RATE, Window
+
+
+def read_blocks(path: str, block_samples: int) -> Iterator[np.ndarray]:
+    """
+    Reads the audio of a media file as 16 kHz mono float32 samples, a block at a time.
+    A .npy file of such samples is memory-mapped rather than decoded.
+
+    :param block_samples: the number of samples in each block, except perhaps the last
+    """
+    if path.endswith(".npy"):
+        samples = np.load(path, mmap_mode="r")
+        for start in range(0, len(samples), block_samples):
+            yield np.asarray(samples[start : start + block_samples], dtype=np.float32)
+        return
+
+    process = subprocess.Popen(
+        [
+            "ffmpeg", "-nostdin", "-v", "error", "-threads", "0", "-i", path,
+            "-vn", "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    data = None
+    try:
+        block_bytes = block_samples * 4
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype=np.float32)
+    finally:
+        # Stops ffmpeg if the blocks were not all read
+        if process.poll() is None and data:
+            process.kill()
+        process.stdout.close()
+        error = process.stderr.read()
+        process.stderr.close()
+        return_code = process.wait()
+
+    if return_code != 0:
+        raise RuntimeError(
+            f"Could not decode {path}: {error.decode(errors='replace').strip()}"
+        )
+
+
+def read_windows(
+    blocks: Iterable[np.ndarray],
+    window_seconds: float = 30.0,
+    overlap_seconds: float = 2.0,
+    find_speech: Optional[Callable[[np.ndarray], list[dict]]] = None,
+) -> Iterator[tuple[Window, np.ndarray]]:
+    """
+    Splits a stream of samples into windows of at most window_seconds, each extended by
+    an overlap on both sides, as chunked_transcription.plan_windows does for a whole
+    waveform. Only the samples of the current window are held.
+
+    :param blocks: the samples, a block at a time, see #read_blocks
+    :param find_speech: finds the speech segments of the samples it is given, which are
+        used to cut each window in the middle of its latest silence; defaults to the
+        Silero VAD model
+    :return: each window and its samples, including the overlaps
+    """
+    if find_speech is None:
+        from chunked_transcription import find_speech
+
+    window = int(window_seconds * SAMPLE_RATE)
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    blocks = iter(blocks)
+
+    # The samples held, which start at buffer_start
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0
+    core_start = 0
+    finished = False
+    index = 0
+    while True:
+        while not finished and buffer_start + len(buffer) < core_start + window + overlap:
+            block = next(blocks, None)
+            if block is None:
+                finished = True
+            else:
+                buffer = np.concatenate((buffer, block))
+        total = buffer_start + len(buffer)
+        if core_start >= total:
+            return
+
+        core_end = core_start + window
+        if core_end >= total:
+            core_end = total
+        else:
+            # Silences in the second half of the window, as seen by the VAD
+            region_start = core_start + window // 2
+            region = buffer[region_start - buffer_start : core_end - buffer_start]
+            speech = find_speech(region)
+            cuts = [
+                region_start + (previous["end"] + following["start"]) // 2
+                for previous, following in zip(speech, speech[1:])
+            ]
+            if speech:
+                # Silence at either end of the region is a cut as well
+                if speech[0]["start"] > 0:
+                    cuts.insert(0, region_start + speech[0]["start"] // 2)
+                if speech[-1]["end"] < len(region):
+                    cuts.append(region_start + (speech[-1]["end"] + len(region)) // 2)
+            if cuts:
+                core_end = cuts[-1]
+
+        start = max(0, core_start - overlap)
+        end = min(total, core_end + overlap)
+        yield (
+            Window(index, start, end, core_start, core_end),
+            buffer[start - buffer_start : end - buffer_start].copy(),
+        )
+
+        index += 1
+        core_start = core_end
+        keep_from = max(buffer_start, core_start - overlap)
+        buffer = buffer[keep_from - buffer_start :]
+        buffer_start = keep_from
+
+
+def core_speech_segments(
+    window: Window,
+    speech: list[dict],
+    segment_seconds: float = 1.5,
+    min_seconds: float = 0.5,
+) -> list[tuple[int, int]]:
+    """
+    Splits the speech found in a window's samples into segments of at most
+    segment_seconds to be embedded, keeping only the speech within the window's core
+    region so that no segment is embedded twice.
+
+    :param speech: the start and end sample of each speech segment, relative to the
+        window's start
+    :return: the start and end sample of each segment, relative to the window's start
+    """
+    segment = int(segment_seconds * SAMPLE_RATE)
+    shortest = int(min_seconds * SAMPLE_RATE)
+    core_start = window.core_start - window.start
+    core_end = window.core_end - window.start
+
+    segments = []
+    for part in speech:
+        start = max(part["start"], core_start)
+        end = min(part["end"], core_end)
+        for segment_start in range(start, end, segment):
+            segment_end = min(segment_start + segment, end)
+            if segment_end - segment_start >= shortest:
+                segments.append((segment_start, segment_end))
+    return segments
+
+
+def _normalise(embeddings: np.ndarray) -> np.ndarray:
+    return embeddings / np.maximum(
+        np.linalg.norm(embeddings, axis=-1, keepdims=True), 1e-12
+    )
+
+
+class SpeakerClusterer:
+    """
+    Clusters speaker embeddings as they arrive, in memory which does not grow with the
+    number of embeddings beyond a label and the bounds of each segment.
+
+    Each embedding joins the most similar of at most max_clusters small clusters, or
+    starts a new one when none is similar enough. #speaker_turns then merges the small
+    clusters into speakers, most similar first.
+    """
+
+    def __init__(self, cluster_threshold: float = 0.7, max_clusters: int = 256):
+        """
+        :param cluster_threshold: the cosine similarity to a small cluster's mean which an
+            embedding must reach to join it
+        :param max_clusters: the number of small clusters, after which each embedding
+            joins the most similar
+        """
+        self.cluster_threshold = cluster_threshold
+        self.max_clusters = max_clusters
+        self.sums = None
+        self.counts = []
+        self.labels = []
+        self.segments = []
+
+    def add(self, embeddings: np.ndarray, segments: list[tuple[int, int]]) -> None:
+        """
+        :param embeddings: an embedding for each segment
+        :param segments: the start and end sample of each segment, in the recording
+        """
+        for embedding, segment in zip(_normalise(np.asarray(embeddings, np.float64)), segments):
+            if self.sums is None:
+                self.sums = np.zeros((self.max_clusters, len(embedding)))
+            clusters = len(self.counts)
+            label = clusters
+            if clusters:
+                similarity = _normalise(self.sums[:clusters]) @ embedding
+                best = int(np.argmax(similarity))
+                if similarity[best] >= self.cluster_threshold or clusters == self.max_clusters:
+                    label = best
+            if label == clusters:
+                self.counts.append(0)
+            self.sums[label] += embedding
+            self.counts[label] += 1
+            self.labels.append(label)
+            self.segments.append(segment)
+
+    def speakers(
+        self, num_speakers: Optional[int] = None, threshold: float = 0.5
+    ) -> list[int]:
+        """
+        Merges the small clusters into speakers, repeatedly joining the two whose means
+        are most similar.
+
+        :param num_speakers: the number of speakers, if known
+        :param threshold: otherwise, the similarity below which clusters are not merged
+        :return: the speaker of each small cluster, numbered by their first segment
+        """
+        clusters = len(self.counts)
+        if clusters == 0:
+            return []
+        sums = self.sums[:clusters].copy()
+        members = [[i] for i in range(clusters)]
+        active = list(range(clusters))
+        target = max(1, num_speakers or 1)
+        while len(active) > target:
+            means = _normalise(sums[active])
+            similarity = means @ means.T
+            np.fill_diagonal(similarity, -np.inf)
+            a, b = np.unravel_index(np.argmax(similarity), similarity.shape)
+            if num_speakers is None and similarity[a, b] < threshold:
+                break
+            keep, merged = active[min(a, b)], active[max(a, b)]
+            sums[keep] += sums[merged]
+            members[keep].extend(members[merged])
+            active.remove(merged)
+
+        speaker_of_cluster = [0] * clusters
+        for cluster in active:
+            for member in members[cluster]:
+                speaker_of_cluster[member] = cluster
+
+        # Number the speakers in the order they are first heard
+        numbering = {}
+        for label in self.labels:
+            numbering.setdefault(speaker_of_cluster[label], len(numbering))
+        return [numbering[cluster] for cluster in speaker_of_cluster]
+
+    def speaker_turns(
+        self, num_speakers: Optional[int] = None, threshold: float = 0.5
+    ) -> list[list[int]]:
+        """
+        :return: the start and end, in milliseconds, and speaker of each turn, joining
+            consecutive segments of the same speaker, as read from an MSDD rttm file
+        """
+        speakers = self.speakers(num_speakers, threshold)
+        turns = []
+        for (start, end), label in zip(self.segments, self.labels):
+            speaker = speakers[label]
+            start_ms, end_ms = start * 1000 // SAMPLE_RATE, end * 1000 // SAMPLE_RATE
+            if turns and turns[-1][2] == speaker:
+                turns[-1][1] = end_ms
+            else:
+                turns.append([start_ms, end_ms, speaker])
+        return turns
+
+
+_DONE = object()
+
+
+class Pipeline:
+    """
+    Runs a source and stages in their own threads, joined by bounded queues. An error in
+    any thread stops the others, and is raised by #run.
+    """
+
+    def __init__(self, queue_size: int = 2):
+        """
+        :param queue_size: the number of items each queue holds before its producer
+            waits, which bounds the items in flight
+        """
+        self.queue_size = queue_size
+        self.busy_seconds = defaultdict(float)
+        self._stop = threading.Event()
+        self._errors = []
+        self._threads = []
+
+    def queue(self) -> Queue:
+        return Queue(self.queue_size)
+
+    def _put(self, outbox: Queue, item) -> None:
+        while not self._stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def _get(self, inbox: Queue):
+        while not self._stop.is_set():
+            try:
+                return inbox.get(timeout=0.1)
+            except Empty:
+                pass
+        return _DONE
+
+    def _start(self, name: str, target: Callable[[], None], outboxes) -> None:
+        def run():
+            try:
+                target()
+            except BaseException as error:
+                self._errors.append(error)
+                self._stop.set()
+            finally:
+                for outbox in outboxes:
+                    self._put(outbox, _DONE)
+
+        self._threads.append(threading.Thread(target=run, name=name, daemon=True))
+
+    def source(self, name: str, items: Iterable, outboxes: list[Queue]) -> None:
+        """
+        Adds a thread which puts each item into every one of the outboxes.
+        """
+
+        def produce():
+            items_iter = iter(items)
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                item = next(items_iter, _DONE)
+                self.busy_seconds[name] += time.perf_counter() - start
+                if item is _DONE:
+                    return
+                for outbox in outboxes:
+                    self._put(outbox, item)
+
+        self._start(name, produce, outboxes)
+
+    def stage(
+        self,
+        name: str,
+        work: Callable,
+        inbox: Queue,
+        outboxes: Optional[list[Queue]] = None,
+    ) -> None:
+        """
+        Adds a thread which calls work on each item of the inbox, in order, and puts its
+        results into the outboxes, if any.
+        """
+        outboxes = outboxes or []
+
+        def consume():
+            while True:
+                item = self._get(inbox)
+                if item is _DONE:
+                    return
+                start = time.perf_counter()
+                result = work(item)
+                self.busy_seconds[name] += time.perf_counter() - start
+                for outbox in outboxes:
+                    self._put(outbox, result)
+
+        self._start(name, consume, outboxes)
+
+    def run(self) -> None:
+        for thread in self._threads:
+            thread.start()
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
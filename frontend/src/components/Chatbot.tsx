@@ -10,7 +10,12 @@ interface Message {
   isUser: boolean;
 }
 
-const Chatbot: FC = () => {
+interface ChatbotProps {
+  // The project the chats belong to, which scopes the chat history
+  project?: string;
+}
+
+const Chatbot: FC<ChatbotProps> = ({ project }) => {
   const [isOpen, setIsOpen] = useState(true);
   const [isHoveringClosed, setIsHoveringClosed] = useState(false);
   const [messages, setMessages] = useState<Message[]>([
@@ -27,7 +32,7 @@ const Chatbot: FC = () => {
   useEffect(() => {
     const loadHistory = async () => {
       try {
-        const history = await fetchHistory();
+        const history = await fetchHistory(project);
         if (history && history.length > 0) {
           setMessages(history);
         }
@@ -36,7 +41,7 @@ const Chatbot: FC = () => {
       }
     };
     loadHistory();
-  }, []);
+  }, [project]);
 
   /**
    * Handles sending a message to the chatbot service
@@ -53,7 +58,7 @@ const Chatbot: FC = () => {
 
     try {
       
-      const response = await fetchChat(inputValue, key);
+      const response = await fetchChat(inputValue, key, project);
       setMessages(prev => [...prev, {key: key, content: response, isUser: false }]);
     } catch (error) {
       setMessages(prev => [
@@ -51,7 +51,7 @@ const ProjectPage = () => {
             <main className="flex-1 p-6">
                 <RichTextEditor initialContent={ selectedFileContent } fileKey={ selectedFileKey ?? undefined }/>
             </main>
-            <Chatbot/>
+            <Chatbot project={ projectName }/>
         </div>
     );
 };
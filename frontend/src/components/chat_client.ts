@@ -24,22 +24,42 @@ const instance = axios.create({
 
   
 
+  /**
+   * Returns the id of this browser's chat session, creating it on first use, so that chats can be told apart
+   * from those of other users
+   * 
+   * @function getSession
+   * @returns {string} The session id
+   */
+  const getSession = (): string => {
+    let session = localStorage.getItem('chatSession');
+    if (!session) {
+      session = crypto.randomUUID();
+      localStorage.setItem('chatSession', session);
+    }
+    return session;
+  };
+
   /**
    * Sends a user message to the chatbot API and returns the AI response
    * 
    * @async
    * @function fetchChat
    * @param {string} message - The user's message to send to the chatbot
+   * @param {number} key - The key the chat is stored under
+   * @param {string} [project] - The project the chat belongs to, if any
    * @returns {Promise<string>} The AI's response text
    * @throws {Error} When the API request fails or returns an error
    * 
    */
-  export const fetchChat = async (message: string, key: number): Promise<string> => {
+  export const fetchChat = async (message: string, key: number, project?: string): Promise<string> => {
     try {
       const response = await instance.post('/chat',
         {
           message: message,
-          key: key
+          key: key,
+          project: project,
+          session: getSession()
         },
       );
       console.log(response)
@@ -54,12 +74,14 @@ const instance = axios.create({
    * Obtains all of the users previous chat messages
    * @async
    * @function fetchHistory
+   * @param {string} [project] - Only obtains the chat messages of this project, if provided
    * @returns 
    * @throws {Error} When the API request fails or returns an error
    */
-  export const fetchHistory = async (): Promise<{key: number; content: string; isUser: boolean }[]> => {
+  export const fetchHistory = async (project?: string): Promise<{key: number; content: string; isUser: boolean }[]> => {
   try {
-    const response = await instance.get('/chathistory'); // use GET, history is retrieval not mutation
+    // use GET, history is retrieval not mutation
+    const response = await instance.get('/chathistory', { params: { project: project } });
     return response.data.history;
   } catch (error: any) {
     console.error('Error getting chat history: ', error);
@@ -0,0 +1,63 @@
+"""
+Load-tests a running backend by sending concurrent chat and chat history requests.
+
+Start the backend first, e.g. with ``gunicorn -c gunicorn.conf.py wsgi:app`` from the backend directory, then run
+from the repository root:
+
+    python -m test.benchmark_chat_load --url http://localhost:5001 --concurrency 16 --requests 64
+
+Note that each /chat request is stored in the chat history.
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def send_chat(url: str, index: int) -> float:
+    body = json.dumps({"message": f"What did the interviewees say about studying? ({index})", "key": time.time() * 1000})
+    request = urllib.request.Request(
+        f"{url}/chat", data=body.encode(), headers={"Content-Type": "application/json"}, method="POST"
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def get_chat_history(url: str, _: int) -> float:
+    start = time.perf_counter()
+    with urllib.request.urlopen(f"{url}/chathistory") as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run(name: str, function, url: str, concurrency: int, requests: int) -> None:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(lambda index: function(url, index), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name}: {requests} requests, concurrency {concurrency}, {elapsed:.2f}s total, "
+          f"{requests / elapsed:.2f} requests/s")
+    print(f"  latency p50 {statistics.median(latencies):.3f}s, p95 {p95:.3f}s, max {latencies[-1]:.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--skip-chat", action="store_true", help="only load-test /chathistory")
+    args = parser.parse_args()
+
+    run("/chathistory", get_chat_history, args.url, args.concurrency, args.requests)
+    if not args.skip_chat:
+        run("/chat", send_chat, args.url, args.concurrency, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmarks chunked long-audio transcription on the CPU, reporting the real-time factor (processing time divided by
+audio duration, lower is faster) for each number of worker processes. A single worker is the baseline: it is
+equivalent to transcribing the whole file in one job. Requires faster-whisper and ffmpeg, as installed in the
+diarization environment.
+
+Run from the repository root with:
+    python -m test.benchmark_chunked_transcription --audio interview.mp3 --workers 1 2 4 --cpu-threads 2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization")))
+
+from backend.upload.media_decoder import load_media
+from chunked_transcription import transcribe_chunked
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--audio", required=True, help="an audio or video file, ideally several minutes long")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--cpu-threads", type=int, default=2, help="CTranslate2 threads per worker")
+    parser.add_argument("--whisper-model", default="base.en")
+    parser.add_argument("--window-seconds", type=float, default=60.0)
+    args = parser.parse_args()
+
+    audio = load_media(args.audio)
+    print(f"{os.path.basename(args.audio)}: {audio.duration:.1f}s of audio, {os.cpu_count()} CPUs, "
+          f"{args.cpu_threads} threads per worker, model {args.whisper_model}")
+
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        transcript = transcribe_chunked(
+            audio.samples, args.whisper_model, workers=workers, cpu_threads=args.cpu_threads, language="en",
+            window_seconds=args.window_seconds
+        )
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+
+        # Includes starting the workers and loading a model in each, as a real upload would
+        print(f"  {workers} worker(s): {elapsed:7.1f}s, real-time factor {elapsed / audio.duration:.3f}, "
+              f"speed-up {baseline / elapsed:.2f}x, {transcript.windows} windows, {len(transcript.words)} words")
+
+
+if __name__ == "__main__":
+    main()
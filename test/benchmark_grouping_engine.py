@@ -0,0 +1,47 @@
+"""
+Benchmarks the single-pass GroupingEngine against the multi-pass Classifier.
+
+Run from the repository root with: python -m test.benchmark_grouping_engine
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.chat.triple_extractor_components.classsifier import Classifier
+from backend.chat.triple_extractor_components.grouping_engine import GroupingEngine
+from test.test_grouping_engine import random_sentence
+
+
+SENTENCES = 5000
+REPEATS = 5
+
+
+def best_of(function, sentences) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for tagged in sentences:
+            function(tagged)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    rng = random.Random(3170)
+    sentences = [random_sentence(rng, rng.randint(5, 40)) for _ in range(SENTENCES)]
+    engine = GroupingEngine("John Smith")
+
+    classifier_time = best_of(lambda tagged: Classifier(tagged, True, "Josh", "John Smith").get_subjects(), sentences)
+    engine_time = best_of(engine.get_subjects, sentences)
+
+    print(f"Sentences: {SENTENCES}, best of {REPEATS} runs")
+    print(f"Classifier:     {classifier_time:.3f}s ({SENTENCES / classifier_time:,.0f} sentences/s)")
+    print(f"GroupingEngine: {engine_time:.3f}s ({SENTENCES / engine_time:,.0f} sentences/s)")
+    print(f"Speedup:        {classifier_time / engine_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
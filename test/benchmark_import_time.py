@@ -0,0 +1,77 @@
+"""
+Profiles the cold-start import time of the backend with ``python -X importtime``, and fails if the app module takes
+longer than the budget to import or imports any of the heavy model libraries, which should only be loaded by the
+component warm-up.
+
+Run from the repository root with: python -m test.benchmark_import_time [--budget 2.0] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend"))
+
+# Libraries that must not be imported when the app module is imported
+DEFERRED_MODULES = ["torch", "spacy", "sentence_transformers", "transformers", "whisper", "moviepy", "nltk"]
+
+
+def profile_imports(module: str) -> list[tuple[str, int, int]]:
+    """
+    Imports a module in a fresh interpreter.
+
+    :param module: the module to import
+    :return: the (module, self microseconds, cumulative microseconds) of each import
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}:\n{result.stderr}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two spaces per level, after a single separating space
+        imports.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget", type=float, default=2.0, help="maximum import time in seconds")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest top-level imports to list")
+    args = parser.parse_args()
+
+    imports = profile_imports(args.module)
+    total = next(cumulative for name, _, cumulative in imports if name == args.module) / 1e6
+
+    # Imports made directly by the module are indented by one level
+    top_level = [
+        (name.strip(), self_us, cumulative) for name, self_us, cumulative in imports
+        if name.startswith("  ") and not name.startswith("    ")
+    ]
+    print(f"Importing {args.module} took {total:.3f}s (budget {args.budget:.3f}s)")
+    print("Slowest imports:")
+    for name, _, cumulative in sorted(top_level, key=lambda entry: entry[2], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1e3:9.1f}ms  {name}")
+
+    imported = {name.strip().split(".")[0] for name, _, _ in imports}
+    eager = [module for module in DEFERRED_MODULES if module in imported]
+
+    failures = []
+    if total > args.budget:
+        failures.append(f"import took {total:.3f}s, over the {args.budget:.3f}s budget")
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
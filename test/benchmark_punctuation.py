@@ -0,0 +1,56 @@
+"""
+Benchmarks punctuation restoration, reporting tokens per second when the model is run on one chunk at a time, as
+PunctuationModel.predict does, and when the chunks of several transcripts are batched. Requires the
+whisper-diarization environment, and downloads the punctuation model on first use.
+
+Run from the repository root with:
+    python -m test.benchmark_punctuation --transcripts 4 --words 5000 --batch-sizes 1 4 8 16 --threads 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization")))
+
+from punctuation import PunctuationRestorer, load_punctuation_model
+
+WORDS = "so we talked about the project and then the interview went well but it was long".split()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="kredor/punctuate-all")
+    parser.add_argument("--transcripts", type=int, default=4)
+    parser.add_argument("--words", type=int, default=5000, help="words in each transcript")
+    parser.add_argument("--chunk-size", type=int, default=230)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    transcripts = [[rng.choice(WORDS) for _ in range(args.words)] for _ in range(args.transcripts)]
+
+    start = time.perf_counter()
+    load_punctuation_model(args.model)
+    print(f"Loaded {args.model} in {time.perf_counter() - start:.1f}s, reused by every restorer below")
+
+    model = load_punctuation_model(args.model)
+    start = time.perf_counter()
+    for words in transcripts:
+        model.predict(words, chunk_size=args.chunk_size)
+    print(f"  PunctuationModel.predict: {time.perf_counter() - start:7.2f}s")
+
+    for batch_size in args.batch_sizes:
+        restorer = PunctuationRestorer(
+            args.model, chunk_size=args.chunk_size, batch_size=batch_size, num_threads=args.threads
+        )
+        restorer.predict(transcripts)
+        stats = restorer.stats
+        print(f"  batch size {batch_size:3d}:          {stats.seconds:7.2f}s, {stats.tokens_per_second:8.0f} tokens/s, "
+              f"{stats.words / stats.seconds:8.0f} words/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmarks mapping the words of a long transcript to speakers and sentences, comparing the vectorised word mapping,
+linear punctuation realignment and incremental sentence mapping in helpers.py against the implementations they
+replaced. Requires the whisper-diarization environment.
+
+Run from the repository root with:
+    python -m test.benchmark_speaker_mapping --hours 3 --turns-per-minute 30
+"""
+import argparse
+import random
+import time
+
+from test.test_speaker_mapping import (
+    generate_transcript, helpers, reference_realigned_ws_mapping_with_punctuation, reference_sentences_speaker_mapping,
+    reference_words_speaker_mapping
+)
+
+# Mostly plain words, so sentences run to a realistic length
+WORDS = ["so", "the", "we", "talked", "about", "it", "and", "then", "Monash", "interview", "really,"]
+ENDINGS = ["right.", "yes?", "okay!", "Mr.", "U.S.", "3."]
+
+
+def timed(function, *args, repeat: int = 3):
+    """
+    :return: the function's result, and the fastest of its timings
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--words-per-minute", type=int, default=150)
+    parser.add_argument("--sentence-words", type=int, default=25, help="mean number of words in a sentence")
+    parser.add_argument("--turns-per-minute", type=float, default=4.0, help="higher for dense cross-talk")
+    args = parser.parse_args()
+
+    words = int(args.hours * 60 * args.words_per_minute)
+    turns = max(1, int(args.hours * 60 * args.turns_per_minute))
+    wrd_ts, spk_ts = generate_transcript(words, turns)
+    rng = random.Random(0)
+    for wrd_dict in wrd_ts:
+        wrd_dict["text"] = rng.choice(ENDINGS if rng.random() < 1 / args.sentence_words else WORDS)
+    print(f"{words} words, {turns} speaker turns")
+
+    reference_wsm, reference_seconds = timed(reference_words_speaker_mapping, wrd_ts, spk_ts)
+    wsm, seconds = timed(helpers.get_words_speaker_mapping, wrd_ts, spk_ts)
+    assert wsm == reference_wsm
+    print(f"  words to speakers:   {reference_seconds:7.3f}s before, {seconds:7.3f}s after, "
+          f"{reference_seconds / seconds:.1f}x faster")
+
+    reference_realigned, reference_seconds = timed(reference_realigned_ws_mapping_with_punctuation, wsm)
+    realigned, seconds = timed(helpers.get_realigned_ws_mapping_with_punctuation, wsm)
+    assert realigned == reference_realigned
+    print(f"  realignment:         {reference_seconds:7.3f}s before, {seconds:7.3f}s after, "
+          f"{reference_seconds / seconds:.1f}x faster")
+    wsm = realigned
+
+    reference_ssm, reference_seconds = timed(reference_sentences_speaker_mapping, wsm, spk_ts)
+    ssm, seconds = timed(helpers.get_sentences_speaker_mapping, wsm, spk_ts)
+    assert ssm == reference_ssm
+    print(f"  words to sentences:  {reference_seconds:7.3f}s before, {seconds:7.3f}s after, "
+          f"{reference_seconds / seconds:.1f}x faster, {len(ssm)} sentences")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Profiles the peak memory of diarizing recordings of increasing length, to check that the windowed pipeline of
+diarize_streaming.py does not grow with the length of the recording, while loading the whole waveform, as diarize.py
+does, grows linearly.
+
+By default the models are replaced with cheap stand-ins, so only the memory of the audio, the queues and the speaker
+clustering is measured, with tracemalloc. With --scripts, diarize.py and diarize_streaming.py are run on each
+recording instead, and their peak resident memory is reported, which requires the whisper-diarization environment.
+
+Run from the repository root with:
+    python -m test.benchmark_streaming_memory --minutes 10 30 60 120
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+WHISPER_DIARIZATION = os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization"))
+sys.path.insert(0, WHISPER_DIARIZATION)
+
+from chunked_transcription import SAMPLE_RATE, plan_windows
+from streaming import Pipeline, SpeakerClusterer, core_speech_segments, read_blocks, read_windows
+
+
+def write_recording(path: str, minutes: float, seed: int = 0) -> None:
+    """
+    Writes a .npy file of bursts of noise separated by silences, a minute at a time, standing in for speech.
+    """
+    rng = np.random.default_rng(seed)
+    samples = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(int(minutes * 60 * SAMPLE_RATE),))
+    for start in range(0, len(samples), 60 * SAMPLE_RATE):
+        minute = samples[start:start + 60 * SAMPLE_RATE]
+        minute[:] = rng.normal(0, 0.1, len(minute))
+        # Silences of a second every four seconds or so
+        for silence in range(3 * SAMPLE_RATE, len(minute), 4 * SAMPLE_RATE):
+            minute[silence:silence + SAMPLE_RATE] = 0
+    samples.flush()
+    del samples
+
+
+def energy_speech(samples: np.ndarray, frame: int = 480) -> list[dict]:
+    """
+    Stands in for the VAD, taking frames with any energy to be speech.
+    """
+    frames = len(samples) // frame
+    loud = np.abs(samples[:frames * frame]).reshape(frames, frame).max(axis=1) > 0.01
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], loud.astype(np.int8), [0]))))
+    return [{"start": int(start) * frame, "end": int(end) * frame} for start, end in zip(edges[::2], edges[1::2])]
+
+
+def whole_file(path: str) -> int:
+    """
+    Loads the whole waveform and splits it into windows, as diarize.py holds it.
+    """
+    audio = np.load(path)
+    windows = plan_windows(energy_speech(audio), len(audio), 30.0, 2.0)
+    return len(windows)
+
+
+def streamed(path: str, queue_size: int) -> int:
+    """
+    Runs the windows through the stages of diarize_streaming.py, with the models replaced by stand-ins.
+    """
+    rng = np.random.default_rng(0)
+    speakers = rng.standard_normal((2, 192))
+    clusterer = SpeakerClusterer()
+    windows = []
+
+    def transcribe(item):
+        window, samples = item
+        windows.append(window.index)
+        return window, samples, "", "en"
+
+    def embed(item):
+        window, samples = item
+        segments = core_speech_segments(window, energy_speech(samples))
+        embeddings = speakers[np.arange(len(segments)) % 2] + rng.normal(0, 0.3, (len(segments), 192))
+        clusterer.add(embeddings, [(window.start + start, window.start + end) for start, end in segments])
+
+    pipeline = Pipeline(queue_size=queue_size)
+    transcribe_inbox, align_inbox, embed_inbox = pipeline.queue(), pipeline.queue(), pipeline.queue()
+    pipeline.source("read", read_windows(read_blocks(path, SAMPLE_RATE), 30.0, 2.0, energy_speech),
+                    [transcribe_inbox, embed_inbox])
+    pipeline.stage("transcribe", transcribe, transcribe_inbox, [align_inbox])
+    pipeline.stage("align", lambda item: None, align_inbox)
+    pipeline.stage("diarize", embed, embed_inbox)
+    pipeline.run()
+    clusterer.speaker_turns()
+    return len(windows)
+
+
+def peak_traced(function, *args) -> tuple[float, float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    windows = function(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20, seconds, windows
+
+
+def peak_resident(script: str, path: str, extra: list[str]) -> tuple[float, float]:
+    """
+    Runs a diarization script on the recording, returning its peak resident memory in MiB and its running time.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, script, "-a", path, *extra], cwd=WHISPER_DIARIZATION,
+                               stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    if status != 0:
+        raise RuntimeError(f"{os.path.basename(script)} failed on {path}")
+    # ru_maxrss is in kilobytes on Linux
+    return usage.ru_maxrss / 1024, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 30, 60, 120])
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--scripts", action="store_true",
+                        help="run diarize.py and diarize_streaming.py rather than the stand-ins")
+    parser.add_argument("--device", default="cpu")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for minutes in args.minutes:
+            path = os.path.join(directory, f"recording_{minutes:g}.npy")
+            write_recording(path, minutes)
+            print(f"{minutes:g} minutes ({os.path.getsize(path) / 2 ** 20:.0f} MiB of samples):")
+
+            if args.scripts:
+                common = ["--device", args.device, "--num-speakers", "2"]
+                for script, extra in (
+                    ("diarize.py", ["--no-stem"]),
+                    ("diarize_streaming.py", ["--queue-size", str(args.queue_size)]),
+                ):
+                    resident, seconds = peak_resident(os.path.join(WHISPER_DIARIZATION, script), path, common + extra)
+                    print(f"  {script:22s} peak resident {resident:8.0f} MiB in {seconds:7.1f}s")
+                continue
+
+            for name, function, function_args in (
+                ("whole file", whole_file, (path,)),
+                ("streamed", streamed, (path, args.queue_size)),
+            ):
+                peak, seconds, windows = peak_traced(function, *function_args)
+                print(f"  {name:10s} peak traced {peak:8.1f} MiB in {seconds:6.2f}s, {windows} windows")
+
+
+if __name__ == "__main__":
+    main()
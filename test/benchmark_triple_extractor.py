@@ -0,0 +1,74 @@
+"""
+Benchmarks per-transcript subject extraction in BasicTripleExtractor, comparing one tagging call per response with a
+single batched tagging call for the whole transcript. Requires the NLTK tokenizer and tagger data.
+
+Run from the repository root with: python -m test.benchmark_triple_extractor
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.chat.basic_triple_extractor import BasicTripleExtractor
+from backend.chat.triple_extractor_components.classsifier import Classifier
+
+
+INTERVIEW = "How has AI influenced your learning experience? It’s made studying faster — I can get summaries of long " \
+    "readings in minutes. But sometimes I feel like I’m skipping the real depth of the material. Can you describe a " \
+    "time when AI was especially helpful or frustrating? Helpful when I used an AI writing tool to brainstorm essay " \
+    "ideas — it gave me perspectives I hadn’t thought of. Frustrating when it gave me wrong references, and I wasted " \
+    "time checking them. How do you feel about relying on AI tools for assignments? I feel guilty if I use it too " \
+    "much. It’s like I’m not building the skill myself, even though it helps me finish on time. "
+
+TRANSCRIPT_REPEATS = [1, 10, 50]
+REPEATS = 5
+
+
+def per_response(extractor: BasicTripleExtractor, text: str) -> int:
+    """
+    Extracts subjects the way a per-response implementation would, tagging each response separately.
+    """
+    pairs = extractor._get_question_response_pair(text)
+    mentions = 0
+    for response in pairs.values():
+        if response.strip():
+            mentions += len(Classifier(response, False, "John", "Josh").get_subjects())
+    return mentions
+
+
+def batched(extractor: BasicTripleExtractor, text: str) -> int:
+    triples = extractor.get_triples(text, "Josh", "John")
+    return sum(1 for _, predicate, _ in triples if predicate == "mentions")
+
+
+def best_of(function, *args) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    extractor = BasicTripleExtractor()
+    # Warm up the tagger, so model loading is not counted
+    batched(extractor, INTERVIEW)
+
+    for repeats in TRANSCRIPT_REPEATS:
+        # Numbering the questions keeps them distinct, so every response is kept
+        text = "".join(INTERVIEW.replace("?", f" {index}?") for index in range(repeats))
+        responses = len(extractor._get_question_response_pair(text))
+
+        per_response_time = best_of(per_response, extractor, text)
+        batched_time = best_of(batched, extractor, text)
+
+        print(f"Transcript with {responses} responses ({len(text):,} characters), "
+              f"{batched(extractor, text)} mentions")
+        print(f"  Per response: {per_response_time * 1000:8.1f}ms ({responses / per_response_time:,.0f} responses/s)")
+        print(f"  Batched:      {batched_time * 1000:8.1f}ms ({responses / batched_time:,.0f} responses/s)")
+
+
+if __name__ == "__main__":
+    main()
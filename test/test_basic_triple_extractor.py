@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.chat.basic_triple_extractor import BasicTripleExtractor
+
+
+# Pre-tagged responses, so the tests do not depend on the NLTK tagger data being installed. They include tags which
+# have no word type, such as EX, UH, NNPS, PDT, FW, SYM and quotes.
+TAGGED = {
+    "there are um lots of Monash Students here.": [
+        ("there", "EX"), ("are", "VBP"), ("um", "UH"), ("lots", "NNS"), ("of", "IN"), ("Monash", "NNP"),
+        ("Students", "NNPS"), ("here", "RB"), (".", "."),
+    ],
+    "all the units cost $ 5 per week.": [
+        ("all", "PDT"), ("the", "DT"), ("units", "NNS"), ("cost", "VBP"), ("$", "$"), ("5", "CD"), ("per", "IN"),
+        ("week", "NN"), (".", "."),
+    ],
+    "``ad hoc'' : it was fine + more.": [
+        ("``", "``"), ("ad", "FW"), ("hoc", "FW"), ("''", "''"), (":", ":"), ("it", "PRP"), ("was", "VBD"),
+        ("fine", "JJ"), ("+", "SYM"), ("more", "RBS"), (".", "."),
+    ],
+}
+
+
+def tag_sentences(sentences):
+    return [TAGGED[sentence.strip()] for sentence in sentences]
+
+
+class TestBasicTripleExtractor(unittest.TestCase):
+    """
+    Tests the question and response triples, with the tagger replaced by pre-tagged responses.
+    """
+
+    def setUp(self):
+        patcher = mock.patch("chat.triple_extractor_components.grouping_engine.tag_sentences", tag_sentences)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.extractor = BasicTripleExtractor()
+
+    def test_mentions_with_unrecognised_tags(self):
+        """
+        Test that responses containing tags outside of the word types still produce their mentions triples.
+        """
+        text = ("Who studies there? there are um lots of Monash Students here. "
+                "What do units cost? all the units cost $ 5 per week. "
+                "How was it? ``ad hoc'' : it was fine + more.")
+
+        triples = self.extractor.get_triples(text, "Josh", "Sam")
+
+        mentions = {}
+        for subject, predicate, obj in triples:
+            if predicate == "mentions":
+                mentions.setdefault(subject.strip(), []).append(obj)
+        self.assertEqual(
+            {
+                "there are um lots of Monash Students here.": ["lots Monash Students"],
+                "all the units cost $ 5 per week.": ["units", "5 week"],
+                # Mid-sentence words equal to their upper case are subjects, as in the classifier, so '' is one
+                "``ad hoc'' : it was fine + more.": ["''"],
+            },
+            mentions
+        )
+        self.assertIn(("Sam", "answered", "Who studies there?"), triples)
+        self.assertIn((" How was it?", "hasResponse", " ``ad hoc'' : it was fine + more."), triples)
+        self.assertIn((" ``ad hoc'' : it was fine + more.", "answeredBy", "Sam"), triples)
+
+
+if __name__ == "__main__":
+    unittest.main()
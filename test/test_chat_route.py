@@ -0,0 +1,88 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.chat.bot import Chatbot
+
+
+class Retriever:
+    """
+    Stands in for the database client, returning fixed context for any query.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.queries = []
+
+    def search(self, query):
+        self.queries.append(query)
+        return self.context
+
+
+class ChatCollection:
+    def __init__(self):
+        self.documents = {}
+
+    def add_document(self, key, content):
+        self.documents[key] = content
+
+
+class TestChatRoute(unittest.TestCase):
+    """
+    Tests the /chat route, with the model, retriever and chat history replaced by stand-ins.
+    """
+
+    def setUp(self):
+        self.retriever = Retriever(["Interviewees said studying was enjoyable."])
+        self.collection = ChatCollection()
+        self.bot = Chatbot(self.retriever, self.collection)
+
+        self.client = mock.Mock()
+        self.client.chat_with_model_context_injection.return_value = "They enjoyed studying."
+        self.client.chat_with_model.return_value = "I don't know."
+        self.bot.client = self.client
+
+        app = Flask(__name__)
+        self.bot.register_routes(app)
+        self.app = app.test_client()
+
+    def test_chat_with_context(self):
+        """
+        Test that a chat message is answered with the retrieved context and stored in the chat history.
+        """
+        response = self.app.post("/chat", json={"message": "What about studying?", "key": "1700000000000",
+                                                "project": "interviews", "session": "abc"})
+
+        self.assertEqual(200, response.status_code, response.get_json())
+        self.assertEqual({"response": "They enjoyed studying."}, response.get_json())
+        self.client.chat_with_model_context_injection.assert_called_once_with(
+            ["Interviewees said studying was enjoyable."], "What about studying?"
+        )
+        self.assertEqual(["What about studying?"], self.retriever.queries)
+        self.assertEqual(
+            {"question": "What about studying?", "response": "They enjoyed studying.", "project": "interviews",
+             "session": "abc"},
+            self.collection.documents["1700000000000"]
+        )
+
+    def test_chat_without_context(self):
+        """
+        Test that the model is asked directly when there is no context, and that a message is required.
+        """
+        self.retriever.context = []
+
+        response = self.app.post("/chat", json={"message": "Hello", "key": "1"})
+        self.assertEqual(200, response.status_code, response.get_json())
+        self.assertEqual({"response": "I don't know."}, response.get_json())
+
+        response = self.app.post("/chat", json={"key": "2"})
+        self.assertEqual(400, response.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
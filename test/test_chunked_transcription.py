@@ -0,0 +1,62 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization")))
+
+from chunked_transcription import SAMPLE_RATE, plan_windows, stitch_words
+
+
+def seconds(value: float) -> int:
+    return int(value * SAMPLE_RATE)
+
+
+class TestChunkedTranscription(unittest.TestCase):
+    """
+    Tests the window planning and stitching of chunked transcription, which do not need the models.
+    """
+
+    def test_windows_cut_at_silences(self):
+        """
+        Test that windows are cut in the middle of the latest silence in their second half, and cover the audio.
+        """
+        speech = [
+            {"start": seconds(0), "end": seconds(20)},
+            {"start": seconds(22), "end": seconds(45)},
+            {"start": seconds(47), "end": seconds(70)},
+            {"start": seconds(71), "end": seconds(100)},
+        ]
+        windows = plan_windows(speech, seconds(100), window_seconds=60, overlap_seconds=2)
+
+        self.assertEqual([0, seconds(46)], [window.core_start for window in windows])
+        self.assertEqual([seconds(46), seconds(100)], [window.core_end for window in windows])
+        self.assertEqual(seconds(48), windows[0].end)
+        self.assertEqual(seconds(44), windows[1].start)
+
+    def test_windows_without_silence_cut_at_full_length(self):
+        """
+        Test that continuous speech is cut at the window length, with overlaps clamped to the audio.
+        """
+        windows = plan_windows([{"start": 0, "end": seconds(130)}], seconds(130), window_seconds=60, overlap_seconds=2)
+
+        self.assertEqual([(0, seconds(60)), (seconds(60), seconds(120)), (seconds(120), seconds(130))],
+                         [(window.core_start, window.core_end) for window in windows])
+        self.assertEqual(0, windows[0].start)
+        self.assertEqual(seconds(130), windows[-1].end)
+
+    def test_overlapping_words_kept_once(self):
+        """
+        Test that a word heard by both windows around a cut is only kept from the window whose core holds it.
+        """
+        windows = plan_windows([{"start": 0, "end": seconds(100)}], seconds(100), window_seconds=60, overlap_seconds=2)
+        first = [{"word": " one", "start": 58.0, "end": 59.0}, {"word": " two", "start": 59.6, "end": 60.6}]
+        second = [{"word": " two", "start": 59.7, "end": 60.5}, {"word": " three", "start": 61.0, "end": 61.5}]
+
+        words = stitch_words(windows, [first, second])
+
+        self.assertEqual(" one two three", "".join(word["word"] for word in words))
+        self.assertEqual(59.7, words[1]["start"])
+
+
+if __name__ == "__main__":
+    unittest.main()
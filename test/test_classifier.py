@@ -1,5 +1,41 @@
-import backend.chat.triple_extractor_components.classsifier as clf
+import os
+import sys
 import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+import backend.chat.triple_extractor_components.classsifier as clf
+
+
+# A small lexicon standing in for the perceptron tagger, so the tagging tests do not need the NLTK data
+LEXICON = {
+    "the": "DT", "dog": "NN", "likes": "VBZ", "red": "JJ", "apples": "NNS", "i": "PRP", "study": "VBP", "at": "IN",
+    "monash": "NNP", "you": "PRP", "said": "VBD", "cats": "NNS", "chase": "VBP", "mice": "NNS", ".": ".", "?": ".",
+    "there": "EX", "are": "VBP", "three": "CD", "units": "NNS",
+}
+
+
+def tokenize(sentence):
+    return sentence.replace(".", " .").replace("?", " ?").split()
+
+
+class LexiconTagger:
+    """
+    Tags words from the lexicon, counting the calls made to it.
+    """
+
+    def __init__(self):
+        self.tag_calls = 0
+        self.tag_sents_calls = 0
+
+    def tag(self, words):
+        self.tag_calls += 1
+        return [(word, LEXICON.get(word.lower(), "NN")) for word in words]
+
+    def tag_sents(self, sentences):
+        self.tag_sents_calls += 1
+        return [[(word, LEXICON.get(word.lower(), "NN")) for word in words] for words in sentences]
 
 class TestChatbot(unittest.TestCase):
     """
@@ -33,6 +69,104 @@ class TestChatbot(unittest.TestCase):
         """
         Clean up the test environment by closing the Neo4j driver.
         """
-        
 
 
+class TestTagging(unittest.TestCase):
+    """
+    Tests the shared tagging functions and the batched classifier, with the tagger and tokenizer replaced by
+    stand-ins.
+    """
+
+    def setUp(self):
+        self.tagger = LexiconTagger()
+        for patcher in (
+            mock.patch.object(clf, "get_tagger", return_value=self.tagger),
+            mock.patch.object(clf, "word_tokenize", tokenize),
+            mock.patch.object(clf, "_resources_ready", True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        clf.retag_word.cache_clear()
+        self.addCleanup(clf.retag_word.cache_clear)
+
+    def test_tag_sentences(self):
+        """
+        Test that many sentences are tagged in a single call to the tagger, in the order they were provided.
+        """
+        tagged = clf.tag_sentences(["the dog likes red apples.", "", "i study at Monash?"])
+
+        self.assertEqual(1, self.tagger.tag_sents_calls)
+        self.assertEqual([("the", "DT"), ("dog", "NN"), ("likes", "VBZ"), ("red", "JJ"), ("apples", "NNS"),
+                          (".", ".")], tagged[0])
+        self.assertEqual([], tagged[1])
+        self.assertEqual([("i", "PRP"), ("study", "VBP"), ("at", "IN"), ("Monash", "NNP"), ("?", ".")], tagged[2])
+
+    def test_retag_word_cached(self):
+        """
+        Test that a word is only tagged once, however many times it is re-tagged.
+        """
+        self.assertEqual("DT", clf.retag_word("the"))
+        self.assertEqual("DT", clf.retag_word("the"))
+        self.assertEqual("EX", clf.retag_word("there"))
+        self.assertEqual(2, self.tagger.tag_calls)
+        self.assertEqual(1, clf.retag_word.cache_info().hits)
+
+        # Sentence-initial capitalised words are re-tagged in lower case, through the cache
+        self.assertEqual(clf.WordType.IGNORE, clf.classify_word("The", "NNP", sentence_start=True))
+        self.assertEqual(clf.WordType.SUBJECT, clf.classify_word("Monash", "NNP", sentence_start=False))
+        self.assertEqual(2, self.tagger.tag_calls)
+
+    def test_baseline_classification(self):
+        """
+        Test that words are classified as they were before the tagging functions were shared: mid-sentence words
+        equal to their upper case, punctuation included, are subjects, and unrecognised tags are rejected.
+        """
+        for word in ["Monash", "'s", "''", "--", "..."]:
+            with self.subTest(word=word):
+                self.assertEqual(clf.WordType.SUBJECT, clf.classify_word(word, "POS", sentence_start=False))
+        self.assertIsNone(clf.classify_word("um", "UH", sentence_start=False))
+
+        classifier = clf.Classifier([("there", "EX"), ("are", "VBP"), ("dogs", "NNS")], True, "Josh", "John Smith")
+        with mock.patch.object(clf.nltk.help, "upenn_tagset") as upenn_tagset, \
+                self.assertRaisesRegex(ValueError, r"Unrecognized POS tag: EX \| word: there"):
+            classifier.classify_sentence()
+        upenn_tagset.assert_called_once_with("EX")
+
+    def test_batch_matches_per_sentence(self):
+        """
+        Test that subjects drawn from a batch of sentences match those drawn from each sentence on its own.
+        """
+        sentences = ["The dog likes red apples.", "you said cats chase mice.", "i study three units.",
+                     "I study at Monash?", ""]
+        classifier = clf.Classifier("", False, "Josh", "John Smith")
+        self.tagger.tag_sents_calls = 0
+
+        batch = classifier.get_subjects_batch(sentences)
+        self.assertEqual(1, self.tagger.tag_sents_calls)
+
+        per_sentence = [clf.Classifier(sentence, False, "Josh", "John Smith").get_subjects() for sentence in sentences]
+        self.assertEqual(per_sentence, batch)
+        self.assertEqual(["dog", "red apples"], batch[0])
+        self.assertEqual([], batch[-1])
+
+    def test_ensure_nltk_resources(self):
+        """
+        Test that missing resources are downloaded, and the check only made once per process.
+        """
+        available = {"tokenizers/punkt_tab", "taggers/averaged_perceptron_tagger_eng"}
+
+        def find(resource_path):
+            if resource_path not in available:
+                raise LookupError(resource_path)
+
+        with mock.patch.object(clf, "_resources_ready", False), \
+                mock.patch.object(clf.nltk.data, "find", side_effect=find) as found, \
+                mock.patch.object(clf.nltk, "download") as download:
+            clf.ensure_nltk_resources()
+            clf.ensure_nltk_resources()
+
+        self.assertEqual(len(clf.NLTK_RESOURCES), found.call_count)
+        self.assertEqual(
+            [mock.call(package, quiet=True) for path, package in clf.NLTK_RESOURCES if path not in available],
+            download.call_args_list
+        )
@@ -0,0 +1,96 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.startup.ComponentRegistry import ComponentRegistry
+
+
+class TestComponentRegistry(unittest.TestCase):
+
+    def test_lazy_component_built_on_first_use(self):
+        """
+        Test that a component is only built when first used, and only once.
+        """
+        built = []
+        registry = ComponentRegistry()
+        registry.register("items", lambda: built.append(1) or ["a", "b"])
+
+        items = registry.lazy("items")
+        self.assertEqual([], built)
+        self.assertFalse(registry.is_ready())
+
+        self.assertEqual(1, items.index("b"))
+        self.assertEqual(0, items.index("a"))
+        self.assertEqual([1], built)
+        self.assertTrue(registry.is_ready())
+        self.assertEqual("ready", registry.get_status()["items"]["state"])
+
+    def test_concurrent_access_builds_once(self):
+        """
+        Test that callers waiting on an in-progress build share its result.
+        """
+        built = []
+
+        def factory():
+            built.append(1)
+            time.sleep(0.1)
+            return object()
+
+        registry = ComponentRegistry()
+        registry.register("slow", factory)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("slow"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([1], built)
+        self.assertEqual(1, len(set(map(id, results))))
+
+    def test_failed_component_is_retried(self):
+        """
+        Test that a failure is reported and the component is rebuilt on the next access.
+        """
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("database unavailable")
+            return "connected"
+
+        registry = ComponentRegistry()
+        registry.register("database", factory)
+
+        registry.warm_up()
+        status = registry.get_status()["database"]
+        self.assertEqual("failed", status["state"])
+        self.assertEqual("database unavailable", status["error"])
+
+        self.assertEqual("connected", registry.get("database"))
+        self.assertEqual("ready", registry.get_status()["database"]["state"])
+
+    def test_warm_up_in_registration_order(self):
+        """
+        Test that the background warm-up builds every component in order.
+        """
+        order = []
+        registry = ComponentRegistry()
+        for name in ["mongo", "vectors", "whisper"]:
+            registry.register(name, lambda name=name: order.append(name))
+
+        registry.start_warm_up().join()
+
+        self.assertEqual(["mongo", "vectors", "whisper"], order)
+        self.assertTrue(registry.is_ready())
+        self.assertIsNotNone(registry.get_status()["whisper"]["load_seconds"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.editor.DocumentEditor import DocumentEditor
+from backend.mongodb.DocumentStore import DocumentStore
+from backend.outbox.GraphOutbox import GraphOutbox
+from backend.outbox.OutboxDatabaseClient import OutboxDatabaseClient
+
+TEST_DATABASE = "Test_Document_Editor"
+
+
+class RekeyingDatabase:
+    """
+    A graph database which records the rekeys made to it.
+    """
+
+    def __init__(self):
+        self.rekeys: list[tuple[str, str]] = []
+
+    def rekey_nodes(self, rekeys):
+        self.rekeys.extend(rekeys)
+
+
+class TestDocumentEditor(unittest.TestCase):
+    """
+    Tests the document editing routes, with the graph database replaced by a stand-in.
+
+    Requirements:
+        - mongodb running at MONGO_URI
+    """
+
+    def setUp(self):
+        self.store = DocumentStore()
+        self.store.client().drop_database(TEST_DATABASE)
+        self.collection = self.store.create_database(TEST_DATABASE).create_collection("Project")
+        self.database = RekeyingDatabase()
+
+        app = Flask(__name__)
+        DocumentEditor(self.store.create_database(TEST_DATABASE), self.database).register_routes(app)
+        self.app = app.test_client()
+
+    def tearDown(self):
+        self.store.client().drop_database(TEST_DATABASE)
+
+    def test_update_records_one_entry(self):
+        """
+        Test that updating a document through the outbox records a single entry replacing its content in the graph.
+        """
+        self.collection.add_document("a.txt", "old")
+        outbox = GraphOutbox(self.store.create_database(TEST_DATABASE))
+        app = Flask(__name__)
+        DocumentEditor(
+            self.store.create_database(TEST_DATABASE), OutboxDatabaseClient(outbox, self.database)
+        ).register_routes(app)
+
+        response = app.test_client().patch("/edit/a.txt", json={"project": "Project", "content": "new"})
+
+        self.assertEqual(200, response.status_code, response.get_json())
+        self.assertEqual("new", self.collection.find_document("a.txt")["content"])
+        self.assertEqual(
+            [("store", "a.txt", "new")],
+            [(entry["operation"], entry["file_id"], entry["content"]) for entry in outbox.pending(10)]
+        )
+
+    def test_rename_dir(self):
+        """
+        Test that renaming a directory renames its documents and rekeys them in the graph.
+        """
+        for key in ["dir/a.txt", "dir/b.txt", "other/c.txt"]:
+            self.collection.add_document(key, key)
+
+        response = self.app.patch("/rename-dir/dir", json={"project": "Project", "content": "renamed"})
+
+        self.assertEqual(200, response.status_code, response.get_json())
+        self.assertEqual(["renamed/a.txt", "renamed/b.txt"], self.collection.matching_keys("renamed/"))
+        self.assertEqual([("dir/a.txt", "renamed/a.txt"), ("dir/b.txt", "renamed/b.txt")], self.database.rekeys)
+
+    def test_rename_dir_partial_failure(self):
+        """
+        Test that when a later batch of renames fails, the graph is rekeyed for exactly the documents renamed before
+        the failure, so the two stores agree.
+        """
+        keys = [f"dir/{index:02}.txt" for index in range(25)]
+        for key in keys:
+            self.collection.add_document(key, key)
+        # Added after the directory name is allocated, so the rename of dir/22.txt collides with it
+        original_update_dir_name = DocumentStore.Collection.update_dir_name
+
+        def update_dir_name(collection, dir_name):
+            allocated = original_update_dir_name(collection, dir_name)
+            collection.add_document(f"{allocated}/22.txt", "taken")
+            return allocated
+
+        with mock.patch.object(DocumentStore, "BATCH_SIZE", 10), \
+                mock.patch.object(DocumentStore.Collection, "update_dir_name", update_dir_name):
+            response = self.app.patch("/rename-dir/dir", json={"project": "Project", "content": "moved"})
+
+        self.assertEqual(500, response.status_code)
+        renamed = [key for key in self.collection.matching_keys("moved/") if key != "moved/22.txt"]
+        self.assertEqual(22, len(renamed))
+        self.assertEqual(renamed, [new_key for _, new_key in self.database.rekeys])
+        self.assertEqual(keys[22:], self.collection.matching_keys("dir/"))
+
+
+if __name__ == "__main__":
+    unittest.main()
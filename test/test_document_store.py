@@ -0,0 +1,330 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.mongodb.ChatStore import ChatStore
+from backend.mongodb.DocumentStore import DocumentStore
+from backend.mongodb.KeyIndex import KEY_INDEX_NAME, prefix_range
+
+TEST_DATABASE = "Test_Document_Store"
+
+
+class TestDocumentStore(unittest.TestCase):
+    """
+    Tests the MongoDB document store.
+
+    Requirements:
+        - mongodb running at MONGO_URI
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.store = DocumentStore()
+        cls.store.client().drop_database(TEST_DATABASE)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.store.client().drop_database(TEST_DATABASE)
+
+    def setUp(self):
+        self.database = self.store.create_database(TEST_DATABASE)
+
+    def test_shared_client(self):
+        """
+        Test that all stores share a single client, and its connection pool.
+        """
+        self.assertIs(self.store.client(), DocumentStore().client())
+        self.assertIs(self.store.client(), ChatStore().client())
+
+    def test_collection_handles_cached(self):
+        """
+        Test that collections are created once and their handles reused.
+        """
+        created = self.database.create_collection("Cached")
+        self.assertIs(created, self.database.create_collection("Cached"))
+        self.assertIs(created, self.database.get_collection("Cached"))
+        self.assertIn("Cached", self.database.get_collection_names())
+
+    def test_missing_collection(self):
+        """
+        Test that retrieving a collection which does not exist neither returns nor creates it.
+        """
+        self.assertIsNone(self.database.get_collection("Missing"))
+        self.assertNotIn("Missing", self.database.get_collection_names())
+
+    def test_collection_created_elsewhere(self):
+        """
+        Test that a collection created by another client is found.
+        """
+        self.database.get_collection_names()
+        self.store.client()[TEST_DATABASE].create_collection("External")
+
+        collection = self.database.get_collection("External")
+        self.assertIsNotNone(collection)
+        collection.add_document("file.txt", "content")
+        self.assertEqual("content", collection.find_document("file.txt")["content"])
+
+    def test_delete_collection(self):
+        """
+        Test that deleting a collection invalidates its cached handle.
+        """
+        collection = self.database.create_collection("Deleted")
+        collection.add_document("file.txt", "content")
+
+        self.database.delete_collection("Deleted")
+        self.assertIsNone(self.database.get_collection("Deleted"))
+
+        recreated = self.database.create_collection("Deleted")
+        self.assertIsNot(collection, recreated)
+        self.assertIsNone(recreated.find_document("file.txt"))
+
+    def test_collection_dropped_elsewhere(self):
+        """
+        Test that a collection dropped by another worker process is not returned from the cache, and is recreated
+        with its key index rather than implicitly by the next write.
+        """
+        collection = self.database.create_collection("Dropped")
+        collection.add_document("file.txt", "content")
+
+        self.store.create_database(TEST_DATABASE).delete_collection("Dropped")
+        self.assertIsNone(self.database.get_collection("Dropped"))
+        self.assertNotIn("Dropped", self.database.get_collection_names())
+
+        recreated = self.database.create_collection("Dropped")
+        self.assertIsNot(collection, recreated)
+        self.assertIsNone(recreated.find_document("file.txt"))
+        indexes = self.store.client()[TEST_DATABASE]["Dropped"].index_information()
+        self.assertTrue(indexes[KEY_INDEX_NAME]["unique"])
+
+    def test_key_index(self):
+        """
+        Test that collections are created with a unique index on document keys.
+        """
+        collection = self.database.create_collection("Indexed")
+        indexes = self.store.client()[TEST_DATABASE]["Indexed"].index_information()
+        self.assertTrue(indexes[KEY_INDEX_NAME]["unique"])
+
+        collection.add_document("a.txt", "first")
+        with self.assertRaises(KeyError):
+            collection.add_document("a.txt", "second")
+
+        collection.add_document("b.txt", "other")
+        with self.assertRaises(KeyError):
+            collection.rename_document("b.txt", "a.txt")
+        self.assertEqual("other", collection.find_document("b.txt")["content"])
+
+    def test_duplicate_keys_without_index(self):
+        """
+        Test that duplicate keys are still refused when the key index cannot be built, due to legacy duplicates.
+        """
+        legacy = self.store.client()[TEST_DATABASE]["Legacy"]
+        legacy.insert_many([{"key": "a.txt", "content": "first"}, {"key": "a.txt", "content": "second"}])
+
+        collection = self.database.get_collection("Legacy")
+        self.assertNotIn(KEY_INDEX_NAME, legacy.index_information())
+
+        with self.assertRaises(KeyError):
+            collection.add_document("a.txt", "third")
+        collection.add_document("b.txt", "other")
+        with self.assertRaises(KeyError):
+            collection.rename_document("b.txt", "a.txt")
+        with self.assertRaises(KeyError):
+            collection.rename_documents([("b.txt", "c.txt"), ("c.txt", "a.txt")])
+        self.assertEqual("other", collection.find_document("c.txt")["content"])
+        self.assertEqual(2, legacy.count_documents({"key": "a.txt"}))
+
+    def test_prefix_queries(self):
+        """
+        Test that prefix queries match literal prefixes, including characters with special meaning in a regex.
+        """
+        collection = self.database.create_collection("Prefixes")
+        for key in ["dir (1)/a.txt", "dir (1)/b.txt", "dir (1)_2/c.txt", "dir (10)/d.txt", "dir/e.txt"]:
+            collection.add_document(key, key)
+
+        self.assertEqual(
+            ["dir (1)/a.txt", "dir (1)/b.txt"],
+            [document["key"] for document in collection.matching_documents("dir (1)/")]
+        )
+        self.assertEqual("dir (1)_1", collection.update_dir_name("dir (1)"))
+        self.assertEqual("dir (2)", collection.update_dir_name("dir (2)"))
+        self.assertEqual("dir/e.txt_1", collection.update_document_name("dir/e.txt"))
+        self.assertEqual("new.txt", collection.update_document_name("new.txt"))
+
+    def test_allocate_document_names(self):
+        """
+        Test that a batch of names is allocated without clashing with existing names, or with each other.
+        """
+        collection = self.database.create_collection("Allocated")
+        # notes.txt_1 predates the name counters
+        for key in ["notes.txt", "notes.txt_1", "a.txt"]:
+            collection.add_document(key, key)
+
+        allocated = collection.allocate_document_names(["notes.txt", "new.txt", "new.txt", "a.txt", "notes.txt"])
+        self.assertEqual(["notes.txt_2", "new.txt", "new.txt_1", "a.txt_1", "notes.txt_3"], allocated)
+        for name in allocated:
+            collection.add_document(name, name)
+
+        self.assertEqual("notes.txt_4", collection.update_document_name("notes.txt"))
+        self.assertEqual("b.txt", collection.update_document_name("b.txt"))
+
+    def test_counters_hidden(self):
+        """
+        Test that the internal name counter collection is not listed as a project, and is cleared with its
+        collection.
+        """
+        collection = self.database.create_collection("Counted")
+        collection.add_document("x.txt", "x")
+        collection.update_document_name("x.txt")
+
+        self.assertNotIn(DocumentStore.NAME_COUNTERS, self.database.get_collection_names())
+        self.assertIsNone(self.database.get_collection(DocumentStore.NAME_COUNTERS))
+
+        self.database.delete_collection("Counted")
+        self.assertEqual("x.txt", self.database.create_collection("Counted").update_document_name("x.txt"))
+        self.database.create_collection("Counted").add_document("x.txt", "x")
+        self.assertEqual("x.txt_1", self.database.create_collection("Counted").update_document_name("x.txt"))
+
+    def test_list_documents(self):
+        """
+        Test that documents are listed a page at a time in key order, without content unless requested.
+        """
+        collection = self.database.create_collection("Listed")
+        for key in ["c.txt", "a.txt", "b/x.txt", "b/é.txt"]:
+            collection.add_document(key, f"content of {key}")
+
+        first = list(collection.list_documents(limit=2))
+        self.assertEqual([{"key": "a.txt", "size": 16}, {"key": "b/x.txt", "size": 18}], first)
+
+        second = list(collection.list_documents(after=first[-1]["key"], limit=2))
+        self.assertEqual(["b/é.txt", "c.txt"], [document["key"] for document in second])
+        self.assertEqual(19, second[0]["size"])
+
+        self.assertEqual([], list(collection.list_documents(after="c.txt", limit=2)))
+        self.assertEqual(
+            "content of c.txt", list(collection.list_documents(after="b/é.txt", include_content=True))[0]["content"]
+        )
+
+    def test_bulk_remove_and_rename(self):
+        """
+        Test that the documents of a directory are renamed and removed in bulk.
+        """
+        collection = self.database.create_collection("Bulk")
+        keys = [f"dir/{index:03}.txt" for index in range(25)]
+        for key in keys + ["dir.txt", "other/a.txt"]:
+            collection.add_document(key, key)
+
+        self.assertEqual(keys, collection.matching_keys("dir/"))
+
+        renames = [(key, "moved/" + key[len("dir/"):]) for key in keys]
+        self.assertEqual(25, collection.rename_documents(renames))
+        self.assertEqual([], collection.matching_keys("dir/"))
+        self.assertEqual("dir/000.txt", collection.find_document("moved/000.txt")["content"])
+
+        with self.assertRaises(KeyError):
+            collection.rename_documents([("moved/001.txt", "other/a.txt")])
+
+        self.assertEqual(25, collection.remove_documents(collection.matching_keys("moved/")))
+        self.assertEqual(["dir.txt", "other/a.txt"], [document["key"] for document in collection.matching_documents("")])
+
+    def test_rename_partial_failure(self):
+        """
+        Test that when a later batch of renames fails, the renames already committed are reported to on_renamed, so
+        another store can be kept in step.
+        """
+        collection = self.database.create_collection("Partial")
+        keys = [f"dir/{index:02}.txt" for index in range(25)]
+        for key in keys + ["moved/22.txt"]:
+            collection.add_document(key, key)
+
+        reported = []
+        renames = [(key, "moved/" + key[len("dir/"):]) for key in keys]
+        with mock.patch.object(DocumentStore, "BATCH_SIZE", 10), self.assertRaises(KeyError):
+            collection.rename_documents(renames, on_renamed=reported.append)
+
+        self.assertEqual([10, 10, 2], [len(batch) for batch in reported])
+        self.assertEqual(renames[:22], [rename for batch in reported for rename in batch])
+        self.assertEqual([new_key for _, new_key in renames[:22]] + ["moved/22.txt"], collection.matching_keys("moved/"))
+        self.assertEqual(keys[22:], collection.matching_keys("dir/"))
+
+
+class TestChatStore(unittest.TestCase):
+    """
+    Tests the MongoDB chat store.
+
+    Requirements:
+        - mongodb running at MONGO_URI
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.store = ChatStore()
+        cls.store.client().drop_database(TEST_DATABASE)
+        cls.collection = cls.store.create_database(TEST_DATABASE).create_collection("Chats")
+        for key in range(10):
+            cls.collection.add_document(float(key), {
+                "question": f"q{key}", "response": f"r{key}", "project": "odd" if key % 2 else "even", "session": "s"
+            })
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.store.client().drop_database(TEST_DATABASE)
+
+    def test_list_chats(self):
+        """
+        Test that chats are listed oldest first, with pages taken from the most recent chats.
+        """
+        self.assertEqual([float(key) for key in range(10)], [chat["key"] for chat in self.collection.list_chats()])
+        self.assertEqual([8.0, 9.0], [chat["key"] for chat in self.collection.list_chats(limit=2)])
+        self.assertEqual([6.0, 7.0], [chat["key"] for chat in self.collection.list_chats(before=8.0, limit=2)])
+        self.assertEqual([], list(self.collection.list_chats(before=0.0, limit=2)))
+
+    def test_duplicate_keys_without_index(self):
+        """
+        Test that duplicate chat keys are still refused when the key index cannot be built, due to legacy duplicates.
+        """
+        legacy = self.store.client()[TEST_DATABASE]["LegacyChats"]
+        legacy.insert_many([{"key": 1.0, "question": "q", "response": "r"} for _ in range(2)])
+
+        collection = self.store.create_database(TEST_DATABASE).create_collection("LegacyChats")
+        with self.assertRaises(KeyError):
+            collection.add_document(1.0, {"question": "q", "response": "r"})
+        self.assertEqual(2, legacy.count_documents({"key": 1.0}))
+
+    def test_list_scoped_chats(self):
+        """
+        Test that chats can be listed for a single project, a single session or both, each served by an index.
+        """
+        indexes = self.store.client()[TEST_DATABASE]["Chats"].index_information()
+        self.assertEqual([("project", 1), ("key", 1)], indexes[ChatStore.PROJECT_INDEX_NAME]["key"])
+        self.assertEqual([("session", 1), ("key", 1)], indexes[ChatStore.SESSION_INDEX_NAME]["key"])
+
+        self.assertEqual([6.0, 8.0], [chat["key"] for chat in self.collection.list_chats(limit=2, project="even")])
+        self.assertEqual([8.0, 9.0], [chat["key"] for chat in self.collection.list_chats(limit=2, session="s")])
+
+        chats = list(self.collection.list_chats(limit=3, project="odd", session="s"))
+        self.assertEqual([5.0, 7.0, 9.0], [chat["key"] for chat in chats])
+        self.assertEqual({"key": 9.0, "question": "q9", "response": "r9"}, chats[-1])
+        self.assertEqual([], list(self.collection.list_chats(project="odd", session="other")))
+
+
+class TestPrefixRange(unittest.TestCase):
+
+    def test_prefix_range(self):
+        """
+        Test that the range bounds contain exactly the strings starting with the prefix.
+        """
+        keys = ["", "a", "a/", "a/b", "a/\U0010ffff", "a0", "a\U0010ffff", "ab", "b", "\ud7ff", "\ue000"]
+        for prefix in ["", "a", "a/", "a\U0010ffff", "\ud7ff", "\U0010ffff"]:
+            bounds = prefix_range(prefix)
+            matched = [
+                key for key in keys
+                if key >= bounds["$gte"] and ("$lt" not in bounds or key < bounds["$lt"])
+            ]
+            self.assertEqual([key for key in keys if key.startswith(prefix)], matched, prefix)
+
+
+if __name__ == "__main__":
+    unittest.main()
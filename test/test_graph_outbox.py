@@ -0,0 +1,199 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.chat.database_client.database_client import RemovalReport
+from backend.mongodb.DocumentStore import DocumentStore
+from backend.outbox.GraphOutbox import GraphOutbox
+from backend.outbox.OutboxApplier import OutboxApplier
+from backend.outbox.OutboxDatabaseClient import OutboxDatabaseClient
+
+TEST_DATABASE = "Test_Graph_Outbox"
+
+
+class RecordingDatabase:
+    """
+    A graph database which keeps the entries of each file in memory, and records the calls made to it.
+    """
+
+    def __init__(self):
+        self.entries: dict[str, str] = {}
+        self.calls: list[tuple] = []
+        self.poisoned: set[str] = set()
+
+    def store_entries(self, entries, file_id):
+        self.calls.append(("store", file_id))
+        if file_id in self.poisoned:
+            raise ValueError(f"Cannot store {file_id}")
+        self.entries[file_id] = entries
+
+    def remove_nodes_by_file_ids(self, file_ids):
+        self.calls.append(("remove", list(file_ids)))
+        removed = sum(self.entries.pop(file_id, None) is not None for file_id in file_ids)
+        return RemovalReport(removed, 0)
+
+    def rekey_nodes(self, rekeys):
+        self.calls.append(("rekey", list(rekeys)))
+        if any(file_id in self.poisoned for file_id, _ in rekeys):
+            raise ValueError("Cannot rekey")
+        moved = {new_id: self.entries.pop(file_id) for file_id, new_id in rekeys if file_id in self.entries}
+        self.entries.update(moved)
+
+    def search(self, query):
+        return [query]
+
+
+class TestGraphOutbox(unittest.TestCase):
+    """
+    Tests the graph outbox and its applier.
+
+    Requirements:
+        - mongodb running at MONGO_URI
+    """
+
+    def setUp(self):
+        self.store = DocumentStore()
+        self.store.client().drop_database(TEST_DATABASE)
+        self.outbox = GraphOutbox(self.store.create_database(TEST_DATABASE))
+        self.database = RecordingDatabase()
+        self.client = OutboxDatabaseClient(self.outbox, self.database)
+        self.applier = OutboxApplier(self.outbox, self.database, batch_size=100, max_attempts=2)
+
+    def tearDown(self):
+        self.store.client().drop_database(TEST_DATABASE)
+
+    def test_writes_are_deferred(self):
+        """
+        Test that writes are only recorded until the applier runs, while searches are made directly.
+        """
+        self.client.store_entries("hello", "a.txt")
+        self.assertIsNone(self.client.remove_node_by_file_id("b.txt"))
+        self.assertEqual([], self.database.calls)
+        self.assertEqual(["query"], self.client.search("query"))
+        self.assertEqual(2, self.outbox.get_lag()["pending"])
+
+    def test_applied_in_order(self):
+        """
+        Test that entries are applied in the order they were recorded, with consecutive removals combined.
+        """
+        self.client.store_entries("one", "a.txt")
+        self.client.store_entries("two", "a.txt")
+        self.client.rekey_node("a.txt", "b.txt")
+        self.client.store_entries("three", "c.txt")
+        self.client.remove_node_by_file_id("c.txt")
+        self.client.remove_nodes_by_file_ids(["d.txt", "e.txt"])
+
+        self.assertTrue(self.outbox.acquire_lease(self.applier.owner, 60))
+        self.assertEqual(6, self.applier.apply_pending())
+
+        self.assertEqual({"b.txt": "two"}, self.database.entries)
+        self.assertEqual(("remove", ["c.txt", "d.txt", "e.txt"]), self.database.calls[-1])
+
+        lag = self.outbox.get_lag()
+        self.assertEqual(0, lag["pending"])
+        self.assertEqual(6, lag["applied"])
+
+    def test_dependent_rekeys_not_combined(self):
+        """
+        Test that a rekey of a file renamed by the previous rekey is applied after it.
+        """
+        self.database.entries["a.txt"] = "content"
+        self.client.rekey_node("a.txt", "b.txt")
+        self.client.rekey_node("b.txt", "c.txt")
+        self.client.rekey_node("x.txt", "y.txt")
+
+        self.assertTrue(self.outbox.acquire_lease(self.applier.owner, 60))
+        self.applier.apply_pending()
+
+        self.assertEqual({"c.txt": "content"}, self.database.entries)
+        self.assertEqual(
+            [("rekey", [("a.txt", "b.txt")]), ("rekey", [("b.txt", "c.txt"), ("x.txt", "y.txt")])],
+            self.database.calls
+        )
+
+    def test_replay_is_idempotent(self):
+        """
+        Test that replaying applied entries, e.g. after a crash before they were completed, gives the same result.
+        """
+        entries = []
+        self.client.store_entries("one", "a.txt")
+        self.client.rekey_node("a.txt", "b.txt")
+        entries.extend(self.outbox.pending(10))
+
+        self.assertTrue(self.outbox.acquire_lease(self.applier.owner, 60))
+        self.applier.apply_pending()
+        for entry in entries:
+            entry.pop("_id")
+            self.store.client()[TEST_DATABASE][GraphOutbox.COLLECTION].insert_one(
+                {"_id": entry["created_at"], **entry}
+            )
+        self.applier.apply_pending()
+
+        self.assertEqual({"b.txt": "one"}, self.database.entries)
+
+    def test_poison_entry_dead_lettered(self):
+        """
+        Test that an entry which keeps failing is retried up to the maximum attempts, then dead-lettered so the
+        entries after it are applied.
+        """
+        self.database.poisoned.add("bad.txt")
+        self.client.store_entries("poison", "bad.txt")
+        self.client.store_entries("fine", "a.txt")
+        self.assertTrue(self.outbox.acquire_lease(self.applier.owner, 60))
+
+        with self.assertRaises(ValueError):
+            self.applier.apply_pending()
+        self.assertEqual({}, self.database.entries)
+        self.assertEqual(2, self.outbox.get_lag()["pending"])
+
+        self.assertEqual(2, self.applier.apply_pending())
+        self.assertEqual({"a.txt": "fine"}, self.database.entries)
+
+        status = self.applier.get_status()
+        self.assertEqual(0, status["pending"])
+        self.assertEqual(1, status["dead_lettered"])
+        self.assertEqual(1, status["dead_lettered_by_process"])
+        self.assertEqual(1, len(status["dead_letters"]))
+        dead_letter = status["dead_letters"][0]
+        self.assertEqual(("store", "bad.txt", 2, "Cannot store bad.txt"),
+                         (dead_letter["operation"], dead_letter["file_id"], dead_letter["attempts"],
+                          dead_letter["last_error"]))
+        self.assertNotIn("content", dead_letter)
+
+    def test_poison_entry_in_combined_run(self):
+        """
+        Test that when a combined run fails, only the entry causing the failure is charged and dead-lettered.
+        """
+        self.database.entries.update({"a.txt": "one", "c.txt": "two"})
+        self.database.poisoned.add("bad.txt")
+        self.client.rekey_node("a.txt", "b.txt")
+        self.client.rekey_node("bad.txt", "worse.txt")
+        self.client.rekey_node("c.txt", "d.txt")
+        self.assertTrue(self.outbox.acquire_lease(self.applier.owner, 60))
+
+        with self.assertRaises(ValueError):
+            self.applier.apply_pending()
+        self.assertEqual({"b.txt": "one", "c.txt": "two"}, self.database.entries)
+        self.assertEqual([1, 0], [entry["attempts"] for entry in self.outbox.pending(10)])
+
+        self.applier.apply_pending()
+        self.assertEqual({"b.txt": "one", "d.txt": "two"}, self.database.entries)
+        self.assertEqual(["bad.txt"], [entry["rekeys"][0][0] for entry in self.outbox.dead_letters(10)])
+
+    def test_lease_held_by_one_applier(self):
+        """
+        Test that only one applier holds the lease until it expires or is released.
+        """
+        self.assertTrue(self.outbox.acquire_lease("first", 60))
+        self.assertTrue(self.outbox.acquire_lease("first", 60))
+        self.assertFalse(self.outbox.acquire_lease("second", 60))
+        self.assertEqual("first", self.outbox.get_lag()["leader"])
+
+        self.outbox.release_lease("first")
+        self.assertTrue(self.outbox.acquire_lease("second", 60))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import random
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.chat.triple_extractor_components.classsifier import Classifier
+from backend.chat.triple_extractor_components.grouping_engine import GroupingEngine
+
+
+# Pre-tagged sentences, so the tests do not depend on the NLTK tagger data being installed. Sentence-initial words
+# are kept in lower case, as capitalised ones are re-tagged by the classifier.
+GOLDEN = [
+    (
+        [("the", "DT"), ("dog", "NN"), ("likes", "VBZ"), ("red", "JJ"), ("apples", "NNS"), (".", ".")],
+        ["dog", "red apples"],
+    ),
+    (
+        [("i", "PRP"), ("like", "VBP"), ("to", "TO"), ("run", "VB"), ("in", "IN"), ("the", "DT"), ("park", "NN"),
+         (".", ".")],
+        ["to", "park"],
+    ),
+    (
+        [("you", "PRP"), ("said", "VBD"), ("your", "PRP$"), ("dogs", "NNS"), ("chase", "VBP"), ("ducks", "NNS"),
+         (".", ".")],
+        ["John Smith", "John Smith dogs", "ducks"],
+    ),
+    (
+        [("leo", "NN"), ("is", "VBZ"), ("a", "DT"), ("german", "JJ"), ("shepherd", "NN"), (",", ","), ("and", "CC"),
+         ("Ella", "NNP"), ("is", "VBZ"), ("a", "DT"), ("big", "JJ"), ("friendly", "JJ"), ("labrador", "NN"),
+         (".", ".")],
+        ["leo", "german shepherd", "Ella", "friendly labrador"],
+    ),
+    (
+        [("it", "PRP"), ("sits", "VBZ"), ("on", "NN"), ("the", "DT"), ("Monash", "NNP"), ("Clayton", "NNP"),
+         ("campus", "NN"), (".", "."), ("they", "PRP"), ("study", "VBP"), ("3", "CD"), ("units", "NNS"), ("?", ".")],
+        ["Monash Clayton campus", "3 units"],
+    ),
+    (
+        [("what", "WP"), ("questions", "NNS"), ("was", "VBD"), ("Josh", "NNP"), ("asked", "VBN"), ("?", ".")],
+        ["questions", "Josh"],
+    ),
+    (
+        [("data", "NNS"), ("quality", "NN"), ("and", "CC"), ("reproducibility", "NN"), ("matter", "VBP"),
+         ("very", "RB"), ("much", "RB")],
+        ["data quality", "reproducibility"],
+    ),
+    ([], []),
+]
+
+TAGS = ["NN", "NNS", "NNP", "CD", "JJ", "JJS", "VBP", "VBG", "VBZ", "VB", "TO", "MD", "VBN", "VBD", ",", ".", "CC",
+        "WRB", "DT", "RB", "RP", "WP", "POS", "WDT", "IN", "PRP", "PRP$"]
+WORDS = ["dog", "on", "you", "i", "it", "my", "they", "park", "red", "run", "the", "and", "Leo", "Park", "very"]
+
+
+def random_sentence(rng: random.Random, length: int) -> list[tuple[str, str]]:
+    """
+    Generates a random tagged sentence. Capitalised words are only placed mid-sentence.
+    """
+    tagged = []
+    sentence_start = True
+    for _ in range(length):
+        word = rng.choice(WORDS)
+        if sentence_start:
+            word = word.lower()
+        tag = rng.choice(TAGS)
+        tagged.append((word, tag))
+        sentence_start = tag == "."
+    return tagged
+
+
+def classifier_subjects(tagged: list[tuple[str, str]], interviewer: str = "John Smith") -> list[str]:
+    return Classifier(tagged, True, "Josh", interviewer).get_subjects()
+
+
+def classifier_groups(tagged: list[tuple[str, str]], interviewer: str = "John Smith") -> list[tuple]:
+    return Classifier(tagged, True, "Josh", interviewer).get_grouped_2_sentence()
+
+
+class TestGroupingEngine(unittest.TestCase):
+    """
+    Checks that the single-pass GroupingEngine matches the multi-pass Classifier output.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = GroupingEngine("John Smith")
+
+    def test_golden_subjects(self):
+        """
+        Test that both implementations produce the recorded subjects.
+        """
+        for tagged, expected in GOLDEN:
+            with self.subTest(sentence=" ".join(word for word, _ in tagged)):
+                self.assertEqual(expected, classifier_subjects(tagged))
+                self.assertEqual(expected, self.engine.get_subjects(tagged))
+
+    def test_random_equivalence(self):
+        """
+        Test that grouped output matches the classifier on randomly generated sentences.
+        """
+        rng = random.Random(3170)
+        for _ in range(2000):
+            tagged = random_sentence(rng, rng.randint(0, 25))
+            expected = [(text, word_type) for text, word_type in classifier_groups(tagged)]
+            actual = [(group.text, group.word_type) for group in self.engine.group(tagged)]
+            self.assertEqual(expected, actual, tagged)
+
+    def test_unrecognised_tag(self):
+        """
+        Test that words with POS tags outside of the word types are ignored, rather than rejecting the sentence as
+        the classifier does.
+        """
+        self.assertEqual([], self.engine.get_subjects([("um", "UH")]))
+        tagged = [("there", "EX"), ("are", "VBP"), ("dogs", "NNS"), ("and", "CC"), ("um", "UH"), ("Friends", "NNPS"),
+                  (".", "."), ("$", "$"), ("5", "CD"), (".", ".")]
+        self.assertEqual(["dogs", "Friends", "5"], self.engine.get_subjects(tagged))
+        with mock.patch("nltk.help.upenn_tagset"), self.assertRaisesRegex(ValueError, "Unrecognized POS tag: EX"):
+            classifier_subjects(tagged)
+
+    def test_shared_between_threads(self):
+        """
+        Test that one engine can be used from many threads at once.
+        """
+        rng = random.Random(5)
+        sentences = [random_sentence(rng, 20) for _ in range(200)]
+        expected = [classifier_subjects(tagged) for tagged in sentences]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            actual = list(pool.map(self.engine.get_subjects, sentences))
+
+        self.assertEqual(expected, actual)
+
+
+if __name__ == "__main__":
+    unittest.main()
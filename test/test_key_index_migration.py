@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.mongodb.DocumentStore import DocumentStore
+from backend.mongodb.KeyIndex import KEY_INDEX_NAME
+from backend.mongodb.KeyIndexMigration import migrate_database
+from backend.outbox.GraphOutbox import GraphOutbox
+
+TEST_DATABASE = "Test_Key_Index_Migration"
+
+
+class TestKeyIndexMigration(unittest.TestCase):
+    """
+    Tests the migration back-filling the unique key index.
+
+    Requirements:
+        - mongodb running at MONGO_URI
+    """
+
+    def setUp(self):
+        self.client = DocumentStore().client()
+        self.client.drop_database(TEST_DATABASE)
+        self.database = self.client[TEST_DATABASE]
+
+    def tearDown(self):
+        self.client.drop_database(TEST_DATABASE)
+
+    def test_internal_collections_skipped(self):
+        """
+        Test that internal collections, whose documents have no key, are left unindexed without failing the migration.
+        """
+        self.database["Project"].insert_many([{"key": "a.txt", "content": "a"}, {"key": "b.txt", "content": "b"}])
+        self.database[DocumentStore.NAME_COUNTERS].insert_many([
+            {"_id": "Project", "documents": {"a%2Etxt": 1}}, {"_id": "Other", "documents": {"b%2Etxt": 2}}
+        ])
+        self.database["__graph_outbox"].insert_many([{"_id": 1, "operation": "store"}, {"_id": 2, "operation": "remove"}])
+
+        self.assertEqual([], migrate_database(self.database, rename=False, dry_run=False))
+
+        self.assertIn(KEY_INDEX_NAME, self.database["Project"].index_information())
+        self.assertNotIn(KEY_INDEX_NAME, self.database[DocumentStore.NAME_COUNTERS].index_information())
+        self.assertNotIn(KEY_INDEX_NAME, self.database["__graph_outbox"].index_information())
+
+    def test_duplicates_reported(self):
+        """
+        Test that a project with duplicate keys is reported, and indexed once its duplicates are renamed.
+        """
+        self.database["Project"].insert_many([{"key": "a.txt", "content": "1"}, {"key": "a.txt", "content": "2"}])
+
+        self.assertEqual(["Project"], migrate_database(self.database, rename=False, dry_run=False))
+        self.assertEqual([], migrate_database(self.database, rename=True, dry_run=False))
+        self.assertEqual(["a.txt", "a.txt_1"], sorted(document["key"] for document in self.database["Project"].find()))
+
+    def test_renamed_documents_stored(self):
+        """
+        Test that renamed documents, and the duplicates they were renamed from, are recorded to be stored in the graph
+        database again under their own keys.
+        """
+        self.database["Project"].insert_many([
+            {"key": "a.txt", "content": "1"}, {"key": "a.txt", "content": "2"}, {"key": "a.txt", "content": "3"}
+        ])
+        outbox = GraphOutbox(DocumentStore().create_database(TEST_DATABASE))
+
+        self.assertEqual([], migrate_database(self.database, rename=True, dry_run=False, outbox=outbox))
+
+        self.assertEqual(
+            [("store", "a.txt", "1"), ("store", "a.txt_1", "2"), ("store", "a.txt_2", "3")],
+            [(entry["operation"], entry["file_id"], entry["content"]) for entry in outbox.pending(10)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
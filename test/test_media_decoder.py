@@ -0,0 +1,79 @@
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.upload.media_decoder import DecodedAudio, SAMPLE_RATE, load_media, save_samples
+
+
+def write_tone(path: str, seconds: float, rate: int = 44100, channels: int = 2) -> None:
+    """
+    Writes a 440 Hz tone as a 16-bit PCM wav file.
+    """
+    frames = int(seconds * rate)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        samples = (int(16000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(frames))
+        wav.writeframes(b"".join(struct.pack("<h", sample) * channels for sample in samples))
+
+
+class TestMediaDecoder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "requires ffmpeg")
+    def test_decodes_to_16khz_mono(self):
+        """
+        Test that a stereo 44.1 kHz file is decoded in one pass to 16 kHz mono float32 samples.
+        """
+        path = os.path.join(self.directory, "tone.wav")
+        write_tone(path, 1.5)
+
+        audio = load_media(path)
+
+        self.assertEqual(SAMPLE_RATE, audio.sample_rate)
+        self.assertEqual(np.float32, audio.samples.dtype)
+        self.assertEqual(1, audio.samples.ndim)
+        self.assertAlmostEqual(1.5, audio.duration, places=2)
+        self.assertAlmostEqual(1.5 * SAMPLE_RATE, len(audio.samples), delta=SAMPLE_RATE * 0.01)
+        self.assertLessEqual(np.abs(audio.samples).max(), 1.0)
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "requires ffmpeg")
+    def test_rejects_files_without_audio(self):
+        """
+        Test that a file with no audio track is rejected.
+        """
+        path = os.path.join(self.directory, "notes.mp4")
+        with open(path, "w") as file:
+            file.write("not media")
+
+        with self.assertRaises(ValueError):
+            load_media(path)
+
+    def test_saved_samples_round_trip(self):
+        """
+        Test that saved samples load back unchanged, alongside the media file.
+        """
+        samples = np.linspace(-1, 1, SAMPLE_RATE, dtype=np.float32)
+        path = save_samples(DecodedAudio(samples, SAMPLE_RATE, 1.0), os.path.join(self.directory, "interview.mp4"))
+
+        self.assertEqual(os.path.join(self.directory, "interview.npy"), str(path))
+        np.testing.assert_array_equal(samples, np.load(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
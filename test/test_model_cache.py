@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization")))
+
+from model_cache import MSDD_CONFIG, MSDD_CONFIG_DIR, Artefact, ModelCache, path_sha256
+
+
+class TestModelCache(unittest.TestCase):
+    """
+    Tests the local model cache with the MSDD config, the one artefact which is fetched without the network.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ModelCache(self.directory.name, offline=False)
+        self.config = Artefact("config", MSDD_CONFIG)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_warm_fetches_and_verifies(self):
+        """
+        Test that warming fetches and records each artefact, and that a modified artefact fails verification and
+        is fetched again by the next warm-up.
+        """
+        reports = self.cache.warm([self.config], load=False)
+
+        path = self.cache.path(self.config)
+        self.assertTrue(reports[0].verified)
+        self.assertIsNone(reports[0].error)
+        self.assertEqual(os.path.getsize(path), reports[0].bytes)
+        self.assertEqual(path, self.cache.resolve(self.config))
+        self.assertTrue(self.cache.check([self.config], load=False)[0].verified)
+
+        with open(path, "a") as f:
+            f.write("# modified\n")
+        self.assertFalse(self.cache.verify(self.config))
+        self.assertEqual("missing or modified since it was fetched",
+                         self.cache.check([self.config], load=False)[0].error)
+
+        self.assertTrue(self.cache.warm([self.config], load=False)[0].verified)
+        self.assertEqual(path_sha256(os.path.join(MSDD_CONFIG_DIR, MSDD_CONFIG))[0], path_sha256(path)[0])
+
+    def test_resolve_uncached(self):
+        """
+        Test that uncached models are resolved by name, or refused when offline, while the MSDD config falls back
+        to the copy kept with the pipeline.
+        """
+        whisper = Artefact("whisper", "medium.en")
+        self.assertEqual("medium.en", self.cache.resolve(whisper))
+        self.assertEqual(os.path.join(MSDD_CONFIG_DIR, MSDD_CONFIG), self.cache.resolve(self.config))
+
+        offline = ModelCache(self.directory.name, offline=True)
+        with self.assertRaisesRegex(FileNotFoundError, "model_cache.py warm"):
+            offline.resolve(whisper)
+        self.assertEqual(os.path.join(MSDD_CONFIG_DIR, MSDD_CONFIG), offline.resolve(self.config))
+
+        nemo_path = self.cache.path(Artefact("nemo", "titanet_large"))
+        self.assertTrue(nemo_path.endswith(os.path.join("nemo", "titanet_large.nemo")))
+        punctuation_path = self.cache.path(Artefact("punctuation", "kredor/punctuate-all"))
+        self.assertEqual("kredor--punctuate-all", os.path.basename(punctuation_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.chat.database_client.neo4j_data_access import Neo4jDataAccess
+
+
+class TestNeo4jDataAccess(unittest.TestCase):
+    """
+    Tests the Neo4j data access layer. Creating a driver does not connect to the server, so no server is needed.
+    """
+
+    def test_shared_per_uri(self):
+        """
+        Test that clients of the same URI share a data access, and its driver.
+        """
+        data_access = Neo4jDataAccess.shared("bolt://localhost:7687")
+        self.assertIs(data_access, Neo4jDataAccess.shared("bolt://localhost:7687"))
+        self.assertIsNot(data_access, Neo4jDataAccess.shared("bolt://localhost:7688"))
+        self.assertIs(data_access.driver, data_access.driver)
+
+    def test_driver_recreated_after_close(self):
+        """
+        Test that closing the data access, e.g. by one client's close_driver, does not break the other clients.
+        """
+        data_access = Neo4jDataAccess("bolt://localhost:7687", ("neo4j", "password"))
+        driver = data_access.driver
+        data_access.close()
+        self.assertIsNot(driver, data_access.driver)
+        data_access.close()
+
+    def test_failed_query_recorded(self):
+        """
+        Test that a query which cannot reach the server is recorded as a failure.
+        """
+        data_access = Neo4jDataAccess("bolt://localhost:1", ("neo4j", "password"), acquisition_timeout=1,
+                                      max_retry_time=0)
+        with self.assertRaises(Exception):
+            data_access.read("test.read", "RETURN 1")
+        metrics = data_access.get_metrics()["test.read"]
+        self.assertEqual(1, metrics["calls"])
+        self.assertEqual(1, metrics["failures"])
+        data_access.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.chat.database_client.neo4j_schema import (
+    create_relationship_file_id_index, get_relationship_types, quote_name, rekey_batches, rekey_embeddings,
+    rekey_relationships, slugify_reltype
+)
+
+
+class RecordingDataAccess:
+    """
+    Records the queries run through it, answering reads with fixed records.
+    """
+
+    def __init__(self, records=None):
+        self.records = records or []
+        self.queries = []
+
+    def read(self, name, query, parameters=None):
+        self.queries.append((name, query, parameters))
+        return self.records
+
+    def run(self, name, query, parameters=None):
+        self.queries.append((name, query, parameters))
+
+
+class RecordingTransaction:
+    def __init__(self):
+        self.queries = []
+
+    def run(self, query, **parameters):
+        self.queries.append((query, parameters))
+
+
+class TestNeo4jSchema(unittest.TestCase):
+    """
+    Tests the Cypher shared by the graph clients, without a Neo4j server.
+    """
+
+    def test_names(self):
+        """
+        Test that names are quoted with any backticks escaped, and predicates slugified into relationship types.
+        """
+        self.assertEqual("`HAS_RESPONSE`", quote_name("HAS_RESPONSE"))
+        self.assertEqual("`a``b`", quote_name("a`b"))
+        self.assertEqual("HAS_RESPONSE", slugify_reltype(" has response "))
+        self.assertEqual("ANSWERED_BY", slugify_reltype("answered-by"))
+
+    def test_relationship_file_id_index(self):
+        """
+        Test that relationship types are read from the database, and each given a quoted file_id index.
+        """
+        data_access = RecordingDataAccess([{"relationshipType": "MENTIONS"}, {"relationshipType": "ODD`TYPE"}])
+        self.assertEqual(["MENTIONS", "ODD`TYPE"], get_relationship_types(data_access))
+
+        create_relationship_file_id_index(data_access, "ODD`TYPE")
+        name, query, _ = data_access.queries[-1]
+        self.assertEqual("schema.create_relationship_file_id_index", name)
+        self.assertIn("CREATE INDEX `rel_odd_type_file_id_index` IF NOT EXISTS", query)
+        self.assertIn("FOR ()-[r:`ODD``TYPE`]-() ON (r.file_id)", query)
+
+    def test_rekey(self):
+        """
+        Test that rekeys are batched, and run as one query for embeddings and one per relationship type.
+        """
+        batches = rekey_batches([("a", "b"), ("b", "c"), ("d", "e")], 2)
+        self.assertEqual([[{"old": "a", "new": "b"}, {"old": "b", "new": "c"}], [{"old": "d", "new": "e"}]], batches)
+
+        tx = RecordingTransaction()
+        rekey_embeddings(tx, batches[0])
+        rekey_relationships(tx, ["MENTIONS", "ANSWERED"], batches[0])
+
+        self.assertEqual(3, len(tx.queries))
+        self.assertIn("MATCH (e:Embedding {file_id: rekey.old})", tx.queries[0][0])
+        self.assertIn("MATCH ()-[r:`MENTIONS`]->()", tx.queries[1][0])
+        self.assertIn("MATCH ()-[r:`ANSWERED`]->()", tx.queries[2][0])
+        self.assertTrue(all(parameters == {"rekeys": batches[0]} for _, parameters in tx.queries))
+
+
+if __name__ == "__main__":
+    unittest.main()
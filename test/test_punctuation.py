@@ -0,0 +1,115 @@
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization")))
+
+from punctuation import PunctuationRestorer
+
+
+class WordPipeline:
+    """
+    Stands in for the punctuation model's token classification pipeline, treating each word as a token and
+    labelling the words which end in a vowel or punctuation as ending a sentence.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts, batch_size=1):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        self.calls.append(len(texts))
+        results = [
+            [
+                {"entity": "." if match.group()[-1] in "aeiou.," else "0", "score": 0.9, "end": match.end()}
+                for match in re.finditer(r"\S+", text)
+            ]
+            for text in texts
+        ]
+        return results[0] if single else results
+
+
+class WordModel:
+    def __init__(self):
+        self.pipe = WordPipeline()
+
+
+def reference_predict(model, words, chunk_size=230):
+    """
+    PunctuationModel.predict, which runs the model on one chunk at a time.
+    """
+    overlap = 5
+    if len(words) <= chunk_size:
+        overlap = 0
+
+    batches = [words[i:i + chunk_size] for i in range(0, len(words), chunk_size - overlap)]
+    if len(batches[-1]) <= overlap:
+        batches.pop()
+
+    tagged_words = []
+    for batch in batches:
+        if batch == batches[-1]:
+            overlap = 0
+        text = " ".join(batch)
+        result = model.pipe(text)
+        assert len(text) == result[-1]["end"], "chunk size too large, text got clipped"
+
+        char_index = 0
+        result_index = 0
+        for word in batch[:len(batch) - overlap]:
+            char_index += len(word) + 1
+            label = 0
+            while result_index < len(result) and char_index > result[result_index]["end"]:
+                label = result[result_index]['entity']
+                score = result[result_index]['score']
+                result_index += 1
+            tagged_words.append([word, label, score])
+
+    assert len(tagged_words) == len(words)
+    return tagged_words
+
+
+class TestPunctuation(unittest.TestCase):
+    """
+    Tests batched punctuation restoration, with a stand-in for the punctuation model.
+    """
+
+    def test_batched_predictions_match_per_chunk(self):
+        """
+        Test that the chunks of several transcripts, predicted together, are labelled as when each transcript is
+        predicted one chunk at a time.
+        """
+        rng = random.Random(0)
+        vocabulary = ["so", "we", "talked", "idea", "then", "Monash", "uni", "data"]
+        transcripts = [[rng.choice(vocabulary) for _ in range(length)] for length in (1, 12, 230, 231, 236, 700)]
+
+        model = WordModel()
+        restorer = PunctuationRestorer(chunk_size=20, batch_size=4, model=model)
+        labelled = restorer.predict(transcripts)
+
+        self.assertEqual([reference_predict(WordModel(), words, 20) for words in transcripts], labelled)
+        # Every chunk is run through the model in a single call
+        self.assertEqual(1, len(model.pipe.calls))
+        self.assertEqual(sum(map(len, transcripts)), restorer.stats.words)
+        self.assertGreater(restorer.stats.tokens, restorer.stats.words)
+
+    def test_restored_punctuation(self):
+        """
+        Test that sentence-ending punctuation is only added to words without punctuation.
+        """
+        words = ["we", "visited", "the", "Monash", "uni", "idea,", "hello..."]
+        wsm = [{"word": word, "speaker": 0} for word in words]
+
+        PunctuationRestorer(model=WordModel()).restore([wsm])
+
+        self.assertEqual(
+            ["we.", "visited", "the.", "Monash", "uni.", "idea,", "hello..."],
+            [word_dict["word"] for word_dict in wsm]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
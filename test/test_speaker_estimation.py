@@ -0,0 +1,107 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization")))
+
+import chunked_transcription
+import speaker_estimation
+from speaker_estimation import SAMPLE_RATE, centroid_similarity, estimate_speakers, speech_windows
+
+
+def embeddings_around(centres, count, noise, seed=0):
+    """
+    Generates count embeddings, taking turns between the given speaker centres, with gaussian noise.
+    """
+    rng = np.random.default_rng(seed)
+    centres = np.asarray(centres, dtype=float)
+    return centres[np.arange(count) % len(centres)] + rng.normal(0, noise, (count, centres.shape[1]))
+
+
+class TestSpeakerEstimation(unittest.TestCase):
+    """
+    Tests the parts of the single-speaker estimate which do not need the speaker model.
+    """
+
+    def test_speech_windows(self):
+        """
+        Test that speech is cut into windows, keeping short segments and remainders which are long enough, spread
+        evenly across the recording when there are too many.
+        """
+        speech = [
+            {"start": 0, "end": 7 * SAMPLE_RATE},
+            # Shorter than a window
+            {"start": 10 * SAMPLE_RATE, "end": 12 * SAMPLE_RATE},
+            {"start": 20 * SAMPLE_RATE, "end": 26 * SAMPLE_RATE + SAMPLE_RATE // 2},
+            # Too short to embed
+            {"start": 30 * SAMPLE_RATE, "end": 30 * SAMPLE_RATE + SAMPLE_RATE // 2},
+        ]
+        window = 3 * SAMPLE_RATE
+
+        windows = speech_windows(speech, window_seconds=3)
+        self.assertEqual([(0, window), (window, 2 * window), (2 * window, 7 * SAMPLE_RATE),
+                          (10 * SAMPLE_RATE, 12 * SAMPLE_RATE), (20 * SAMPLE_RATE, 23 * SAMPLE_RATE),
+                          (23 * SAMPLE_RATE, 26 * SAMPLE_RATE)], windows)
+
+        speech = [{"start": 0, "end": 1000 * SAMPLE_RATE}]
+        windows = speech_windows(speech, window_seconds=1, max_windows=10)
+        self.assertEqual(10, len(windows))
+        self.assertEqual((0, SAMPLE_RATE), windows[0])
+        self.assertEqual((999 * SAMPLE_RATE, 1000 * SAMPLE_RATE), windows[-1])
+
+    def test_centroid_similarity_separates_speakers(self):
+        """
+        Test that windows of a single speaker are all close to their mean, and those of two speakers are not.
+        """
+        rng = np.random.default_rng(1)
+        first, second = rng.normal(size=(2, 192))
+
+        single = centroid_similarity(embeddings_around([first], 40, noise=0.5))
+        several = centroid_similarity(embeddings_around([first, second], 40, noise=0.5))
+
+        self.assertEqual((40,), single.shape)
+        self.assertGreater(np.quantile(single, 0.05), 0.6)
+        self.assertLess(np.quantile(several, 0.05), 0.6)
+
+        # Unaffected by the scale of each embedding
+        scaled = embeddings_around([first], 40, noise=0.5) * np.arange(1, 41)[:, None]
+        np.testing.assert_allclose(single, centroid_similarity(scaled))
+
+
+    def test_brief_second_speaker(self):
+        """
+        Test that an interviewer asking a couple of brief questions, shorter than a window, is still heard as a second
+        speaker, while the same recording with a single voice is estimated to have one.
+        """
+        rng = np.random.default_rng(2)
+        interviewee, interviewer = rng.normal(size=(2, 192))
+        question_starts = [10 * SAMPLE_RATE, 40 * SAMPLE_RATE]
+        speech = [
+            {"start": 0, "end": 10 * SAMPLE_RATE},
+            {"start": 10 * SAMPLE_RATE, "end": 11 * SAMPLE_RATE + SAMPLE_RATE // 2},
+            {"start": 12 * SAMPLE_RATE, "end": 40 * SAMPLE_RATE},
+            {"start": 40 * SAMPLE_RATE, "end": 41 * SAMPLE_RATE + SAMPLE_RATE // 2},
+            {"start": 42 * SAMPLE_RATE, "end": 70 * SAMPLE_RATE},
+        ]
+
+        def estimate(second_voice):
+            def embed(audio, windows, device="cpu", **kwargs):
+                voices = [second_voice if start in question_starts else interviewee for start, _ in windows]
+                return np.asarray(voices) + rng.normal(0, 0.3, (len(windows), 192))
+
+            with mock.patch.object(chunked_transcription, "find_speech", return_value=speech), \
+                    mock.patch.object(speaker_estimation, "embed_windows", embed):
+                return estimate_speakers(np.zeros(70 * SAMPLE_RATE, dtype=np.float32))
+
+        two_speakers = estimate(interviewer)
+        self.assertEqual(26, two_speakers.windows)
+        self.assertFalse(two_speakers.single_speaker)
+
+        self.assertTrue(estimate(interviewee).single_speaker)
+
+
+if __name__ == "__main__":
+    unittest.main()
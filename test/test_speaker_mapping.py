@@ -0,0 +1,219 @@
+import os
+import random
+import sys
+import unittest
+
+import nltk
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization")))
+
+try:
+    import helpers
+except ImportError:
+    # helpers needs the diarization environment, e.g. omegaconf
+    helpers = None
+
+
+def reference_words_speaker_mapping(wrd_ts, spk_ts, word_anchor_option="start"):
+    """
+    The word to speaker mapping before it was vectorised, walking the words and turns together.
+    """
+    s, e, sp = spk_ts[0]
+    turn_idx = 0
+    wrd_spk_mapping = []
+    for wrd_dict in wrd_ts:
+        ws, we, wrd = int(wrd_dict["start"] * 1000), int(wrd_dict["end"] * 1000), wrd_dict["text"]
+        wrd_pos = helpers.get_word_ts_anchor(ws, we, word_anchor_option)
+        while wrd_pos > float(e):
+            turn_idx += 1
+            turn_idx = min(turn_idx, len(spk_ts) - 1)
+            s, e, sp = spk_ts[turn_idx]
+            if turn_idx == len(spk_ts) - 1:
+                e = helpers.get_word_ts_anchor(ws, we, option="end")
+        wrd_spk_mapping.append({"word": wrd, "start_time": ws, "end_time": we, "speaker": sp})
+    return wrd_spk_mapping
+
+
+def reference_sentences_speaker_mapping(word_speaker_mapping, spk_ts):
+    """
+    The sentence mapping before sentence breaks were detected incrementally, checking the whole sentence so far for
+    every word.
+    """
+    sentence_checker = nltk.tokenize.PunktSentenceTokenizer().text_contains_sentbreak
+    s, e, spk = spk_ts[0]
+    prev_spk = spk
+
+    snts = []
+    snt = {"speaker": f"Speaker {spk}", "start_time": s, "end_time": e, "text": ""}
+    for wrd_dict in word_speaker_mapping:
+        wrd, spk = wrd_dict["word"], wrd_dict["speaker"]
+        s, e = wrd_dict["start_time"], wrd_dict["end_time"]
+        if spk != prev_spk or sentence_checker(snt["text"] + " " + wrd):
+            snts.append(snt)
+            snt = {"speaker": f"Speaker {spk}", "start_time": s, "end_time": e, "text": ""}
+        else:
+            snt["end_time"] = e
+        snt["text"] += wrd + " "
+        prev_spk = spk
+
+    snts.append(snt)
+    return snts
+
+
+def reference_realigned_ws_mapping_with_punctuation(word_speaker_mapping, max_words_in_sentence=50):
+    """
+    The punctuation realignment before it was made linear, scanning a window either side of every speaker change.
+    """
+    is_word_sentence_end = lambda words, x: x >= 0 and words[x][-1] in helpers.sentence_ending_punctuations
+
+    def get_first_word_idx_of_sentence(word_idx, word_list, speaker_list, max_words):
+        left_idx = word_idx
+        while (
+            left_idx > 0
+            and word_idx - left_idx < max_words
+            and speaker_list[left_idx - 1] == speaker_list[left_idx]
+            and not is_word_sentence_end(word_list, left_idx - 1)
+        ):
+            left_idx -= 1
+        return left_idx if left_idx == 0 or is_word_sentence_end(word_list, left_idx - 1) else -1
+
+    def get_last_word_idx_of_sentence(word_idx, word_list, max_words):
+        right_idx = word_idx
+        while (
+            right_idx < len(word_list) - 1
+            and right_idx - word_idx < max_words
+            and not is_word_sentence_end(word_list, right_idx)
+        ):
+            right_idx += 1
+        return right_idx if right_idx == len(word_list) - 1 or is_word_sentence_end(word_list, right_idx) else -1
+
+    wsp_len = len(word_speaker_mapping)
+    words_list = [line_dict["word"] for line_dict in word_speaker_mapping]
+    speaker_list = [line_dict["speaker"] for line_dict in word_speaker_mapping]
+
+    k = 0
+    while k < len(word_speaker_mapping):
+        if k < wsp_len - 1 and speaker_list[k] != speaker_list[k + 1] and not is_word_sentence_end(words_list, k):
+            left_idx = get_first_word_idx_of_sentence(k, words_list, speaker_list, max_words_in_sentence)
+            right_idx = (
+                get_last_word_idx_of_sentence(k, words_list, max_words_in_sentence - k + left_idx - 1)
+                if left_idx > -1
+                else -1
+            )
+            if min(left_idx, right_idx) == -1:
+                k += 1
+                continue
+
+            spk_labels = speaker_list[left_idx: right_idx + 1]
+            mod_speaker = max(set(spk_labels), key=spk_labels.count)
+            if spk_labels.count(mod_speaker) < len(spk_labels) // 2:
+                k += 1
+                continue
+
+            speaker_list[left_idx: right_idx + 1] = [mod_speaker] * (right_idx - left_idx + 1)
+            k = right_idx
+
+        k += 1
+
+    realigned_list = []
+    for line_dict, speaker in zip(word_speaker_mapping, speaker_list):
+        line_dict = line_dict.copy()
+        line_dict["speaker"] = speaker
+        realigned_list.append(line_dict)
+    return realigned_list
+
+
+# Words exercising Punkt's heuristics: sentence-final punctuation, abbreviations, initials, numbers, ellipses and
+# quotes, followed by capitalised and lower case words
+VOCABULARY = [
+    "the", "The", "interview", "Monash", "so", "So", "well,", "yes.", "No.", "right?", "really!", "Mr.", "Dr.",
+    "J.", "e.g.", "3.", "1990.", "...", "so...", "\"quoted.\"", "(aside)", "okay.)", "U.S.", "-", "", " spaced",
+    "what?!", "end.", "etc.", "'tis", "a.m.", "i.e.,",
+]
+# Words from the vocabulary which are never empty, as the realignment before it was made linear could not handle them
+NON_EMPTY_VOCABULARY = [word for word in VOCABULARY if word]
+
+
+def generate_transcript(
+    words: int, turns: int, seed: int = 0, vocabulary: list[str] = VOCABULARY
+) -> tuple[list[dict], list[list]]:
+    """
+    Generates words with timestamps in seconds, and speaker turns in milliseconds, as produced by the diarize
+    scripts.
+    """
+    rng = random.Random(seed)
+    wrd_ts = []
+    time = 0.0
+    for _ in range(words):
+        time += rng.uniform(0.0, 0.4)
+        duration = rng.uniform(0.05, 0.6)
+        wrd_ts.append({"text": rng.choice(vocabulary), "start": time, "end": time + duration})
+
+    end_ms = int(time * 1000) + 1000
+    boundaries = sorted(rng.sample(range(1, end_ms), turns - 1)) if turns > 1 else []
+    edges = [0] + boundaries + [end_ms]
+    spk_ts = [[start, end, rng.randrange(3)] for start, end in zip(edges, edges[1:])]
+    return wrd_ts, spk_ts
+
+
+@unittest.skipIf(helpers is None, "requires the whisper-diarization environment")
+class TestSpeakerMapping(unittest.TestCase):
+    """
+    Tests that the vectorised word to speaker mapping, the linear punctuation realignment and the incremental
+    sentence mapping give the same results as the helpers they replaced.
+    """
+
+    def test_words_speaker_mapping_equivalent(self):
+        for seed in range(20):
+            wrd_ts, spk_ts = generate_transcript(500, random.Random(seed).randint(1, 60), seed)
+            # Turns ending before the words, as when diarization ends early
+            spk_ts_short = [[s // 2, e // 2, spk] for s, e, spk in spk_ts]
+            for turns in (spk_ts, spk_ts_short):
+                for anchor in ("start", "mid", "end"):
+                    self.assertEqual(
+                        reference_words_speaker_mapping(wrd_ts, turns, anchor),
+                        helpers.get_words_speaker_mapping(wrd_ts, turns, anchor)
+                    )
+
+    def test_overlapping_turns_equivalent(self):
+        """
+        Test turns which end before the turn preceding them, which are mapped sequentially.
+        """
+        wrd_ts, spk_ts = generate_transcript(300, 10)
+        spk_ts[3][1] = spk_ts[6][1]
+        self.assertEqual(
+            reference_words_speaker_mapping(wrd_ts, spk_ts), helpers.get_words_speaker_mapping(wrd_ts, spk_ts)
+        )
+
+    def test_realignment_equivalent(self):
+        """
+        Test realigning transcripts with frequent speaker changes, from sentences of a few words to sentences longer
+        than the realignment limit.
+        """
+        for seed in range(30):
+            rng = random.Random(seed)
+            words = 400
+            wrd_ts, spk_ts = generate_transcript(words, rng.randint(2, 200), seed, NON_EMPTY_VOCABULARY)
+            # Sentence ends become rarer with each seed
+            for wrd_dict in wrd_ts:
+                if wrd_dict["text"][-1] in helpers.sentence_ending_punctuations and rng.random() < seed / 30:
+                    wrd_dict["text"] = wrd_dict["text"][:-1] + "x"
+            wsm = helpers.get_words_speaker_mapping(wrd_ts, spk_ts)
+            for max_words in (3, 10, 50):
+                self.assertEqual(
+                    reference_realigned_ws_mapping_with_punctuation(wsm, max_words),
+                    helpers.get_realigned_ws_mapping_with_punctuation(wsm, max_words)
+                )
+
+    def test_sentences_speaker_mapping_equivalent(self):
+        for seed in range(20):
+            wrd_ts, spk_ts = generate_transcript(800, 15, seed)
+            wsm = helpers.get_words_speaker_mapping(wrd_ts, spk_ts)
+            self.assertEqual(
+                reference_sentences_speaker_mapping(wsm, spk_ts),
+                helpers.get_sentences_speaker_mapping(wsm, spk_ts)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,217 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/upload/whisper-diarization")))
+
+from chunked_transcription import SAMPLE_RATE, Window
+from streaming import Pipeline, SpeakerClusterer, core_speech_segments, read_blocks, read_windows
+
+
+def silence_at(silences):
+    """
+    Stands in for the VAD, finding speech everywhere but the given silences, in samples from the start of the
+    recording. The recording's samples are their own indices, so each call can tell where its samples start.
+    """
+    def find_speech(samples):
+        # The samples are an arange, so the first one is where they start
+        offset = int(samples[0]) if len(samples) else 0
+        speech, start = [], 0
+        for silence_start, silence_end in silences:
+            silence_start, silence_end = silence_start - offset, silence_end - offset
+            if silence_end <= 0 or silence_start >= len(samples):
+                continue
+            if silence_start > start:
+                speech.append({"start": start, "end": max(silence_start, 0)})
+            start = min(silence_end, len(samples))
+        if start < len(samples):
+            speech.append({"start": start, "end": len(samples)})
+        return speech
+
+    return find_speech
+
+
+class TestStreaming(unittest.TestCase):
+    """
+    Tests the windowed reading, speaker clustering and staging used by diarize_streaming.py.
+    """
+
+    def test_windows_cover_recording(self):
+        """
+        Test that window cores follow on from each other and cover the recording, cut at silences where there are
+        any, and that each window holds exactly its own samples.
+        """
+        total = 200 * SAMPLE_RATE + 123
+        samples = np.arange(total, dtype=np.float64)
+        # A silence in the second half of the first window, and none in the second
+        find_speech = silence_at([(24 * SAMPLE_RATE, 26 * SAMPLE_RATE)])
+        blocks = (samples[i:i + 7919] for i in range(0, total, 7919))
+
+        windows = list(read_windows(blocks, 30, 2, find_speech))
+
+        self.assertEqual(25 * SAMPLE_RATE, windows[0][0].core_end)
+        self.assertEqual(55 * SAMPLE_RATE, windows[1][0].core_end)
+        self.assertEqual(0, windows[0][0].core_start)
+        self.assertEqual(total, windows[-1][0].core_end)
+        for (previous, _), (window, _) in zip(windows, windows[1:]):
+            self.assertEqual(previous.core_end, window.core_start)
+            self.assertEqual(previous.index + 1, window.index)
+        for window, window_samples in windows:
+            self.assertLessEqual(window.core_end - window.core_start, 30 * SAMPLE_RATE)
+            self.assertEqual(max(0, window.core_start - 2 * SAMPLE_RATE), window.start)
+            np.testing.assert_array_equal(samples[window.start:window.end], window_samples)
+
+    def test_read_blocks(self):
+        """
+        Test that a .npy file of samples is read back in blocks.
+        """
+        samples = np.random.default_rng(0).standard_normal(10_000).astype(np.float32)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "samples.npy")
+            np.save(path, samples)
+            blocks = list(read_blocks(path, 3000))
+
+        self.assertEqual([3000, 3000, 3000, 1000], [len(block) for block in blocks])
+        np.testing.assert_array_equal(samples, np.concatenate(blocks))
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_read_blocks_decodes_media(self):
+        """
+        Test that other media is decoded by ffmpeg a block at a time, and that the blocks need not all be read.
+        """
+        samples = (np.sin(np.arange(3 * SAMPLE_RATE) / 20) * 16000).astype(np.int16)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "tone.wav")
+            with wave.open(path, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(SAMPLE_RATE)
+                wav.writeframes(samples.tobytes())
+
+            blocks = list(read_blocks(path, SAMPLE_RATE))
+            partial = read_blocks(path, 1000)
+            next(partial)
+            partial.close()
+
+        self.assertEqual([SAMPLE_RATE] * 3, [len(block) for block in blocks])
+        np.testing.assert_allclose(samples / 32768, np.concatenate(blocks), atol=1e-4)
+
+    def test_core_speech_segments(self):
+        """
+        Test that only the speech in a window's core is split into segments, dropping those too short to embed.
+        """
+        window = Window(1, start=10 * SAMPLE_RATE, end=50 * SAMPLE_RATE, core_start=12 * SAMPLE_RATE,
+                        core_end=48 * SAMPLE_RATE)
+        speech = [
+            # Mostly in the overlap
+            {"start": 0, "end": int(2.2 * SAMPLE_RATE)},
+            {"start": 5 * SAMPLE_RATE, "end": int(8.6 * SAMPLE_RATE)},
+            {"start": 37 * SAMPLE_RATE, "end": 40 * SAMPLE_RATE},
+        ]
+
+        segments = core_speech_segments(window, speech, segment_seconds=1.5, min_seconds=0.5)
+
+        seconds = [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in segments]
+        self.assertEqual([(5, 6.5), (6.5, 8), (8, 8.6), (37, 38)], seconds)
+
+    def test_clusterer_finds_speakers(self):
+        """
+        Test that embeddings of two speakers taking turns are merged into two speakers, numbered as first heard,
+        whether or not their number is known.
+        """
+        rng = np.random.default_rng(0)
+        first, second = rng.standard_normal((2, 192))
+        turns = [0] * 5 + [1] * 3 + [0] * 4 + [1] * 6
+        embeddings = np.array([(first, second)[speaker] for speaker in turns])
+        embeddings += rng.normal(0, 0.6, embeddings.shape)
+        second_long = 1.5 * SAMPLE_RATE
+        segments = [(int(i * second_long), int((i + 1) * second_long)) for i in range(len(turns))]
+
+        for num_speakers in (None, 2):
+            clusterer = SpeakerClusterer(cluster_threshold=0.9)
+            # Arriving a window at a time
+            for i in range(0, len(turns), 4):
+                clusterer.add(embeddings[i:i + 4], segments[i:i + 4])
+
+            self.assertGreater(len(clusterer.counts), 2)
+            self.assertEqual([[0, 7500, 0], [7500, 12000, 1], [12000, 18000, 0], [18000, 27000, 1]],
+                             clusterer.speaker_turns(num_speakers))
+
+        self.assertEqual({0}, set(clusterer.speakers(num_speakers=1)))
+        self.assertEqual([], SpeakerClusterer().speaker_turns())
+
+    def test_clusterer_bounded(self):
+        """
+        Test that the number of small clusters is capped.
+        """
+        embeddings = np.random.default_rng(1).standard_normal((100, 16))
+        clusterer = SpeakerClusterer(cluster_threshold=0.99, max_clusters=8)
+        clusterer.add(embeddings, [(i, i + 1) for i in range(100)])
+
+        self.assertEqual(8, len(clusterer.counts))
+        self.assertEqual(100, sum(clusterer.counts))
+
+    def test_pipeline_bounds_items_in_flight(self):
+        """
+        Test that items flow through the stages in order, with the reader held back by a slow stage.
+        """
+        in_flight = []
+        read = []
+        done = []
+        lock = threading.Lock()
+
+        def items():
+            for i in range(20):
+                with lock:
+                    read.append(i)
+                    in_flight.append(len(read) - len(done))
+                yield i
+
+        def slow(item):
+            threading.Event().wait(0.005)
+            return item * 2
+
+        def finish(item):
+            with lock:
+                done.append(item)
+
+        pipeline = Pipeline(queue_size=2)
+        first, second, third = pipeline.queue(), pipeline.queue(), pipeline.queue()
+        collected = []
+        pipeline.source("read", items(), [first, third])
+        pipeline.stage("slow", slow, first, [second])
+        pipeline.stage("finish", finish, second)
+        pipeline.stage("collect", collected.append, third)
+        pipeline.run()
+
+        self.assertEqual([i * 2 for i in range(20)], done)
+        self.assertEqual(list(range(20)), collected)
+        # Two queues of two, and one item in each of the stages and the reader
+        self.assertLessEqual(max(in_flight), 7)
+        self.assertIn("slow", pipeline.busy_seconds)
+
+    def test_pipeline_raises_stage_error(self):
+        """
+        Test that an error in a stage stops the pipeline, rather than leaving the reader waiting on a full queue.
+        """
+        def fail(item):
+            if item == 3:
+                raise ValueError("stage failed")
+
+        pipeline = Pipeline(queue_size=1)
+        inbox = pipeline.queue()
+        pipeline.source("read", iter(range(1000)), [inbox])
+        pipeline.stage("fail", fail, inbox)
+
+        with self.assertRaisesRegex(ValueError, "stage failed"):
+            pipeline.run()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.upload.TranscriptCache import TranscriptCache, file_sha256
+
+
+def read_repeatedly(directory: str, key: str, reads: int) -> None:
+    cache = TranscriptCache(directory, max_bytes=10_000)
+    for _ in range(reads):
+        cache.get(key)
+
+
+class TestTranscriptCache(unittest.TestCase):
+    """
+    Tests the content-addressed transcript cache.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = TranscriptCache(self.directory.name, max_bytes=10_000)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_keyed_on_content_model_and_options(self):
+        """
+        Test that the same recording under another name shares a key, unless the model or options differ.
+        """
+        paths = []
+        for name in ("first.mp3", "second.mp3"):
+            path = os.path.join(self.directory.name, name)
+            with open(path, "wb") as f:
+                f.write(b"the same recording")
+            paths.append(path)
+
+        key = TranscriptCache.key(file_sha256(paths[0]), "medium.en", {"batch_size": 2, "stemming": False})
+        self.assertEqual(key, TranscriptCache.key(file_sha256(paths[1]), "medium.en", {"stemming": False, "batch_size": 2}))
+        self.assertNotEqual(key, TranscriptCache.key(file_sha256(paths[0]), "base", {"batch_size": 2, "stemming": False}))
+        self.assertNotEqual(key, TranscriptCache.key(file_sha256(paths[0]), "medium.en", {"batch_size": 4, "stemming": False}))
+
+    def test_hit_reports_compute_saved(self):
+        """
+        Test that a stored transcript is returned, and its transcription time reported as saved by each hit.
+        """
+        key = TranscriptCache.key("abc", "medium.en")
+        self.assertIsNone(self.cache.get(key))
+
+        self.cache.put(key, {"text": "hello"}, transcribe_seconds=120.0, audio_duration=600.0)
+        self.assertEqual({"text": "hello"}, self.cache.get(key))
+        self.assertEqual({"text": "hello"}, self.cache.get(key))
+
+        report = self.cache.get_report()
+        self.assertEqual(2, report["hits"])
+        self.assertEqual(1, report["misses"])
+        self.assertEqual(240.0, report["seconds_saved"])
+        self.assertEqual(1200.0, report["audio_seconds_saved"])
+        self.assertEqual(1, report["entries"])
+
+    def test_hits_counted_across_processes(self):
+        """
+        Test that hits recorded by many processes at once are all counted.
+        """
+        key = TranscriptCache.key("abc", "medium.en")
+        self.cache.put(key, {"text": "hello"}, transcribe_seconds=1.0)
+
+        processes = [
+            multiprocessing.Process(target=read_repeatedly, args=(self.directory.name, key, 50)) for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        report = self.cache.get_report()
+        self.assertEqual(200, report["hits"])
+        self.assertEqual(200.0, report["seconds_saved"])
+        self.assertEqual(1, report["entries"])
+
+    def test_least_recently_used_evicted(self):
+        """
+        Test that the least recently used transcripts are evicted once the cache exceeds its size bound.
+        """
+        text = "x" * 3000
+        keys = [TranscriptCache.key(str(i), "medium.en") for i in range(4)]
+        # Modification times are used as the access order, so they are set apart in the past
+        stored_at = time.time() - 100
+        for i, key in enumerate(keys[:3]):
+            self.cache.put(key, {"text": text}, 1.0)
+            os.utime(os.path.join(self.directory.name, f"{key}.json"), (stored_at + i, stored_at + i))
+
+        # Reading the first transcript makes the second the least recently used
+        self.cache.get(keys[0])
+        self.cache.put(keys[3], {"text": text}, 1.0)
+
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNotNone(self.cache.get(keys[3]))
+        self.assertLessEqual(self.cache.get_report()["bytes"], 10_000)
+        self.assertEqual(1, self.cache.get_report()["evictions"])
+
+
+if __name__ == "__main__":
+    unittest.main()
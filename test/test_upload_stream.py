@@ -0,0 +1,156 @@
+import codecs
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend")))
+
+from backend.upload.UploadStream import UploadError, UploadStream, decode_text, sniff_mime_type
+
+BOUNDARY = "test-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+MP3_HEAD = b"ID3\x04\x00\x00\x00\x00\x00\x00"
+
+
+def part(name: str, content: bytes, filename: str = None) -> bytes:
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    return f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + content + b"\r\n"
+
+
+def body(*parts: bytes) -> bytes:
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+class GeneratedUpload(io.RawIOBase):
+    """
+    A request body holding a single large MP3 file, generated as it is read rather than held in memory.
+    """
+
+    def __init__(self, file_size: int):
+        self.__head = part("files[]", b"", "long.mp3")[:-2] + MP3_HEAD
+        self.__tail = b"\r\n" + body(part("project", b"Project"))
+        self.__remaining = file_size - len(MP3_HEAD)
+        self.__block = os.urandom(64 * 1024)
+        self.digest = hashlib.sha256(MP3_HEAD)
+
+    def read(self, size: int = -1) -> bytes:
+        if self.__head:
+            data, self.__head = self.__head, b""
+            return data
+        if self.__remaining > 0:
+            data = self.__block[:min(size, len(self.__block), self.__remaining)]
+            self.__remaining -= len(data)
+            self.digest.update(data)
+            return data
+        data, self.__tail = self.__tail, b""
+        return data
+
+
+class TestUploadStream(unittest.TestCase):
+    """
+    Tests receiving multipart uploads in chunks.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.upload_stream = UploadStream(self.directory.name, chunk_size=1024, max_file_bytes=100_000)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_files_staged_with_hash_and_type(self):
+        """
+        Test that files are staged with their size, hash and sniffed type, and that the form fields sent after them
+        are read.
+        """
+        audio = MP3_HEAD + bytes(range(256)) * 40
+        text = "An interview transcript\r\n--not a boundary".encode()
+        upload = body(
+            part("files[]", audio, "interview.mp3"),
+            part("files[]", text, "folder/notes.txt"),
+            part("project", b"Project")
+        )
+
+        form, files = self.upload_stream.receive(io.BytesIO(upload), CONTENT_TYPE, len(upload))
+
+        self.assertEqual({"project": "Project"}, form)
+        self.assertEqual(["interview.mp3", "folder/notes.txt"], [file.filename for file in files])
+        self.assertEqual(["audio/mpeg", "text/plain"], [file.mime_type for file in files])
+        self.assertEqual([len(audio), len(text)], [file.size for file in files])
+        for file, content in zip(files, (audio, text)):
+            self.assertEqual(hashlib.sha256(content).hexdigest(), file.sha256)
+            with open(file.path, "rb") as f:
+                self.assertEqual(content, f.read())
+
+    def test_rejected_upload_removes_staged_files(self):
+        """
+        Test that files exceeding the size limit, or whose content does not match their type, are rejected, with
+        every file staged so far removed.
+        """
+        uploads = [
+            (413, body(part("files[]", MP3_HEAD, "short.mp3"), part("files[]", MP3_HEAD * 20_000, "long.mp3"))),
+            (415, body(part("files[]", MP3_HEAD, "short.mp3"), part("files[]", b"plain text", "clip.mp3"))),
+            (415, body(part("files[]", b"\x00\x01\x02\x03" * 10, "notes.txt"))),
+        ]
+        for status, upload in uploads:
+            with self.assertRaises(UploadError) as context:
+                self.upload_stream.receive(io.BytesIO(upload), CONTENT_TYPE, None)
+            self.assertEqual(status, context.exception.status)
+            self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_memory_independent_of_upload_size(self):
+        """
+        Test that the memory allocated while receiving an upload is bounded by the chunk size, not the file size.
+        """
+        upload_stream = UploadStream(self.directory.name, chunk_size=256 * 1024, max_file_bytes=1 << 30)
+        upload = GeneratedUpload(64 * 1024 * 1024)
+
+        tracemalloc.start()
+        try:
+            _, files = upload_stream.receive(upload, CONTENT_TYPE, None)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(upload.digest.hexdigest(), files[0].sha256)
+        self.assertEqual(64 * 1024 * 1024, files[0].size)
+        self.assertLess(peak, 4 * 1024 * 1024)
+
+    def test_sniffed_types(self):
+        """
+        Test that common media containers are recognised from their leading bytes.
+        """
+        self.assertEqual("audio/wav", sniff_mime_type(b"RIFF\x24\x08\x00\x00WAVEfmt "))
+        self.assertEqual("video/mp4", sniff_mime_type(b"\x00\x00\x00\x20ftypisom"))
+        self.assertEqual("audio/mp4", sniff_mime_type(b"\x00\x00\x00\x20ftypM4A "))
+        self.assertEqual("audio/mpeg", sniff_mime_type(b"\xff\xfb\x90\x64"))
+        self.assertEqual("application/octet-stream", sniff_mime_type(b"%PDF-1.7\n\x00"))
+
+    def test_text_encodings(self):
+        """
+        Test that text with a byte order mark or in Latin-1 is recognised and decoded, not just UTF-8.
+        """
+        texts = {
+            "utf-8": "Café notes".encode("utf-8"),
+            "utf-8-sig": "Café notes".encode("utf-8-sig"),
+            "utf-16-le": codecs.BOM_UTF16_LE + "Café notes".encode("utf-16-le"),
+            "utf-16-be": codecs.BOM_UTF16_BE + "Café notes".encode("utf-16-be"),
+            "utf-32": "Café notes".encode("utf-32"),
+            "latin-1": "Café notes".encode("latin-1"),
+        }
+        for encoding, data in texts.items():
+            with self.subTest(encoding=encoding):
+                self.assertEqual("text/plain", sniff_mime_type(data[:4096]))
+                self.assertEqual("Café notes", decode_text(data))
+
+        upload = body(part("files[]", texts["utf-16-le"], "notes.txt"), part("files[]", texts["latin-1"], "old.txt"))
+        form, files = self.upload_stream.receive(io.BytesIO(upload), CONTENT_TYPE, len(upload))
+        self.assertEqual(["text/plain", "text/plain"], [file.mime_type for file in files])
+
+
+if __name__ == "__main__":
+    unittest.main()